@@ -8,6 +8,12 @@ import math
 import requests
 from typing import Optional
 import re
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from schema import create_schema
+from ingest import UPSERT # Requête paramétrée : None -> NULL (url IS NULL pour l'enrichissement)
 
 def get_image_wikipedia(object_name: str, thumbnail_width: int = 1000) -> Optional[str]:
     """
@@ -165,7 +171,7 @@ def clean_from_radians(rad_tuple):
 con = sqlite3.connect("Celestial.db")
 cur = con.cursor()
 
-cur.execute("CREATE TABLE Celestial(name, type, constellation, ra, dec, magnitude, url, catalogue)")
+create_schema(cur) # Table typée + index (voir schema.py)
 
 caldwell_ngc = load_database("Archive/caldwell.json")
 
@@ -185,17 +191,14 @@ for i in range(1, 111):
     
         magnitude = obj.magnitudes
         magnitude = get_best_mag(magnitude)
-        magnitude_sql = magnitude if magnitude is not None else "NULL"
 
         url = get_image_wikipedia(messier_name)
 
         catalogue = "Messier"
 
-        print(f"✅ {messier_name}, {obj_type}, {constellation}, {ra_final}, {dec_final}, {magnitude_sql},{url}")
+        print(f"✅ {messier_name}, {obj_type}, {constellation}, {ra_final}, {dec_final}, {magnitude},{url}")
 
-        cur.execute(f"""INSERT INTO Celestial VALUES 
-                ('{messier_name}', '{obj_type}', '{constellation}', {ra_final}, {dec_final}, {magnitude_sql}, '{url}', '{catalogue}')
-        """)
+        cur.execute(UPSERT, (messier_name, obj_type, constellation, ra_final, dec_final, magnitude, url, catalogue))
         
     except Exception as e:
         print(f"❌ Erreur sur {messier_name}: {e}")
@@ -216,7 +219,7 @@ for caldwell_id, NGC_IC_Correspondance in caldwell_ngc.items():
             constellation = get_constellation_name(data["constellation"])
             ra_final = data["ra"]
             dec_final = data["dec"]
-            magnitude_sql = data["magnitude"]
+            magnitude = data["magnitude"]
             url = data["url"]
 
         else: 
@@ -231,19 +234,16 @@ for caldwell_id, NGC_IC_Correspondance in caldwell_ngc.items():
 
             magnitude = obj.magnitudes
             magnitude = get_best_mag(magnitude)
-            magnitude_sql = magnitude if magnitude is not None else "NULL"
-
+    
             name_wikipedia = propre = re.sub(r"(\D)(\d)", r"\1 \2", ngc_ic_id)
         
             url = get_image_wikipedia(name_wikipedia)
 
         catalogue = "Caldwell"
 
-        print(f"✅ {ngc_ic_id}, {obj_type}, {constellation}, {ra_final}, {dec_final}, {magnitude_sql},{url}")
+        print(f"✅ {ngc_ic_id}, {obj_type}, {constellation}, {ra_final}, {dec_final}, {magnitude},{url}")
 
-        cur.execute(f""" INSERT INTO Celestial VALUES 
-                ('{ngc_ic_id}', '{obj_type}', '{constellation}', {ra_final}, {dec_final}, {magnitude_sql}, '{url}', '{catalogue}')
-        """)
+        cur.execute(UPSERT, (ngc_ic_id, obj_type, constellation, ra_final, dec_final, magnitude, url, catalogue))
     
     except Exception as e:
         print(f"❌ Erreur sur {ngc_ic_id}: {e}")
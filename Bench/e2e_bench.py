@@ -0,0 +1,236 @@
+"""
+Benchmark de bout en bout, déterministe et hors ligne (Gemini et Nominatim remplacés par Bench/fakes.py).
+
+  - components : micro-benchmarks de maths_altitude, get_ra_dec_constraint,
+    get_visible_solar_system_objects, get_target_utc_date, format_utc_to_local_display
+    et du graphe compilé (graph.ainvoke, sans HTTP)
+  - e2e        : POST /api/chat en ASGI (in-process), scénarios de Bench/scenarios.json,
+    à plusieurs niveaux de concurrence : débit (req/s) et latences p50 / p95 / p99
+
+Le cache LLM est neutralisé (TTL 0) pour mesurer le graphe et non le cache ; les caches de
+géocodage et de ciel restent actifs, comme en production.
+
+Usage :
+  python Bench/e2e_bench.py [--requests 200] [--concurrency 1,4,16] [--llm-latency-ms 0]
+                            [--geo-latency-ms 0] [--out bench.json]
+                            [--baseline ancien.json --tolerance 0.25]
+Avec --baseline : les p50 / p95 plus lents de plus de 'tolerance' sont listés (code de sortie 1).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Avant les imports du projet : ils lisent leur configuration dans l'environnement
+_TMP = tempfile.mkdtemp(prefix="cosmic-bench-")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_TMP, "llm.db")
+os.environ["LLM_CACHE_TTL"] = "0"
+os.environ["SESSION_DB_PATH"] = os.path.join(_TMP, "sessions.db")
+os.environ["GEOCACHE_PATH"] = os.path.join(_TMP, "geocache.db")
+os.environ["GEOCODE_RATE"] = "0" # Géocodeur factice : pas de limite de débit
+os.environ.setdefault("WARMUP", "blocking")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+START = datetime(2026, 1, 4, 21, 0, tzinfo=timezone.utc) # Nuit d'hiver à Paris : objets visibles
+PARIS = {"city": "Paris", "latitude": 48.8566, "longitude": 2.3522, "tz": "Europe/Paris"}
+
+
+def _percentile(samples, q):
+    return samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))]
+
+
+def _stats(samples_ms):
+    samples = sorted(samples_ms)
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(_percentile(samples, 0.50), 3),
+        "p95_ms": round(_percentile(samples, 0.95), 3),
+        "p99_ms": round(_percentile(samples, 0.99), 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def _measure(func, n):
+    samples = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - t0) * 1000)
+    result = _stats(samples)
+    result["ops_per_s"] = round(n / (sum(samples) / 1000), 1)
+    return result
+
+
+def install_fakes(args):
+    import geocoding
+    import graph
+    from fakes import FakeNominatim, ScriptedGemini, load_scenarios
+
+    scenarios = load_scenarios()
+    graph.llm_with_tools = ScriptedGemini(scenarios=scenarios, latency_ms=args.llm_latency_ms)
+    graph.llm_lite = ScriptedGemini(scenarios=scenarios, latency_ms=args.llm_latency_ms)
+    fake = FakeNominatim(latency_ms=args.geo_latency_ms)
+    for backend in geocoding.get_geocoder().backends:
+        if isinstance(backend, geocoding.NominatimBackend):
+            backend.client = fake
+    return scenarios
+
+
+def bench_components(n):
+    import graph
+    from astropy_function import (format_utc_to_local_display, get_ra_dec_constraint, get_target_utc_date,
+                                  get_visible_solar_system_objects, maths_altitude)
+
+    def local(i):
+        return (START + timedelta(minutes=7 * i)).astimezone(timezone(timedelta(hours=1))).strftime("%Y-%m-%d %H:%M:%S")
+
+    state = {
+        "infos": "Donne moi des amas intéressants à pointer avec une lunette",
+        "messages": [("user", "Donne moi des amas intéressants à pointer avec une lunette")],
+        "latitude": PARIS["latitude"], "longitude": PARIS["longitude"], "hour": "2026-01-04T22:00:00+01:00",
+        "final_target": [], "detected_city": "Paris", "location": PARIS,
+    }
+    loop = asyncio.new_event_loop()
+    try:
+        return {
+            "maths_altitude": _measure(lambda i: maths_altitude(83.8, -5.4, 48.85, (i % 240) / 10, 5), n * 50),
+            # Heures décalées de 7 min : la plupart des appels ratent le sky_cache (tranches de 5 min)
+            "get_ra_dec_constraint": _measure(lambda i: get_ra_dec_constraint.func("Paris", local(i), PARIS), n),
+            "get_visible_solar_system_objects": _measure(
+                lambda i: get_visible_solar_system_objects.func("Paris", local(i), PARIS), n),
+            "get_target_utc_date": _measure(lambda i: get_target_utc_date("Paris", local(i), PARIS), n * 10),
+            "format_utc_to_local_display": _measure(
+                lambda i: format_utc_to_local_display("Paris", START + timedelta(minutes=i), PARIS), n * 10),
+            "graph_ainvoke": _measure(lambda i: loop.run_until_complete(graph.graph.ainvoke(dict(state))), n),
+        }
+    finally:
+        loop.close()
+
+
+async def bench_e2e(scenarios, requests, levels):
+    import httpx
+    import main
+
+    bodies = [{
+        "message": s["question"], "city": "Paris", "hour": START.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "latitude": PARIS["latitude"], "longitude": PARIS["longitude"],
+    } for s in scenarios]
+
+    results = {}
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for level in levels:
+                samples, by_path, errors = [], {}, 0
+                queue = asyncio.Queue()
+                for i in range(requests):
+                    queue.put_nowait(bodies[i % len(bodies)])
+
+                async def worker():
+                    nonlocal errors
+                    while not queue.empty():
+                        body = queue.get_nowait()
+                        t0 = time.perf_counter()
+                        response = await client.post("/api/chat", json=body)
+                        elapsed = (time.perf_counter() - t0) * 1000
+                        if response.status_code != 200:
+                            errors += 1
+                            continue
+                        samples.append(elapsed)
+                        by_path.setdefault(response.json().get("path", "?"), []).append(elapsed)
+
+                started = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(level)))
+                wall = time.perf_counter() - started
+
+                result = _stats(samples) if samples else {"n": 0}
+                result.update({"errors": errors, "throughput_rps": round(len(samples) / wall, 2),
+                               "by_path": {path: _stats(s) for path, s in sorted(by_path.items())}})
+                results[f"c{level}"] = result
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """Latences p50 / p95 en régression de plus de 'tolerance' (fraction) par rapport à la référence."""
+    regressions = []
+
+    def walk(cur, base, path):
+        for key, value in cur.items():
+            if key not in base:
+                continue
+            if isinstance(value, dict):
+                walk(value, base[key], f"{path}.{key}" if path else key)
+            elif key in ("p50_ms", "p95_ms") and base[key] and value > base[key] * (1 + tolerance):
+                regressions.append(f"{path}.{key} : {base[key]} -> {value} ms (+{(value / base[key] - 1) * 100:.0f} %)")
+
+    walk({k: current[k] for k in ("components", "e2e")}, baseline, "")
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=ROOT, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200, help="Requêtes par niveau de concurrence")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--n", type=int, default=50, help="Itérations des micro-benchmarks")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--geo-latency-ms", type=float, default=0.0)
+    parser.add_argument("--skip-components", action="store_true")
+    parser.add_argument("--out")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    os.chdir(ROOT) # Celestial.db, static/ : chemins relatifs au dépôt
+    scenarios = install_fakes(args)
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+
+    results = {
+        "meta": {
+            "revision": _git_revision(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "components": {} if args.skip_components else bench_components(args.n),
+        "e2e": asyncio.run(bench_e2e(scenarios, args.requests, levels)),
+    }
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"⚠️ Régression {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Doublures déterministes et hors ligne pour les benchmarks :
+  - ScriptedGemini : remplace ChatGoogleGenerativeAI, rejoue des séquences d'appels d'outils
+    enregistrées (scenarios.json) puis la réponse JSON finale de l'astronome.
+  - FakeNominatim  : geocode / reverse sur data/major_cities.json (ville la plus proche en reverse).
+Une latence simulée (ms) peut être ajoutée à chaque appel pour reproduire le réseau.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from types import SimpleNamespace
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios.json")
+CITIES_PATH = os.path.join(ROOT, "data", "major_cities.json")
+
+
+def load_scenarios(path: str = SCENARIOS_PATH) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return "".join(b.get("text", "") for b in content if isinstance(b, dict))
+    return content or ""
+
+
+class ScriptedGemini(BaseChatModel):
+    """
+    Chaque scénario : {"question", "calls": [[{"name", "args"}, ...], ...], "final": {...}, "prose"}.
+    Le scénario est choisi par la question de l'utilisateur, l'étape par le nombre de résultats
+    d'outils déjà reçus dans le tour. "{sql_where}" dans les arguments est remplacé par la
+    contrainte renvoyée par get_ra_dec_constraint, comme le ferait le modèle.
+    Sans message système (prompt du vulgarisateur), renvoie le texte "prose".
+    """
+    scenarios: List[dict]
+    latency_ms: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-gemini"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _scenario(self, question: str) -> dict:
+        for scenario in self.scenarios:
+            if scenario["question"].casefold() == question.strip().casefold():
+                return scenario
+        return self.scenarios[0]
+
+    def _respond(self, messages) -> AIMessage:
+        self.calls += 1
+        humans = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        turn = messages[humans[-1]:] if humans else messages
+        question = _text(turn[0].content) if humans else ""
+        results = [m for m in turn if isinstance(m, ToolMessage)]
+        usage = {"input_tokens": sum(len(_text(m.content)) for m in messages) // 4, "output_tokens": 0}
+
+        if not any(isinstance(m, SystemMessage) for m in messages):
+            message = AIMessage(content=self._scenario(question).get("prose", "Voici quelques explications."))
+        else:
+            scenario = self._scenario(question)
+            step = len(results)
+            if step < len(scenario["calls"]):
+                sql_where = "1"
+                for m in reversed(results):
+                    if m.name == "get_ra_dec_constraint":
+                        sql_where = json.loads(m.content).get("sql_where") or "0"
+                        break
+                tool_calls = [{
+                    "id": f"call_{step}_{i}",
+                    "name": call["name"],
+                    "args": {k: v.replace("{sql_where}", sql_where) if isinstance(v, str) else v
+                             for k, v in call["args"].items()},
+                } for i, call in enumerate(scenario["calls"][step])]
+                message = AIMessage(content="", tool_calls=tool_calls)
+            else:
+                message = AIMessage(content=json.dumps(scenario["final"], ensure_ascii=False))
+        usage["output_tokens"] = len(_text(message.content)) // 4 + 10 * len(message.tool_calls)
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        message.usage_metadata = usage
+        return message
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+
+class FakeNominatim:
+    """Même interface que geopy.geocoders.Nominatim pour geocode() et reverse()."""
+
+    def __init__(self, path: str = CITIES_PATH, latency_ms: float = 0.0):
+        with open(path, encoding="utf-8") as f:
+            self.cities = json.load(f)
+        self.by_name = {c["name"].casefold(): c for c in self.cities}
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def _wait(self):
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def geocode(self, query, **kwargs):
+        self._wait()
+        city = self.by_name.get(str(query).split(",")[0].strip().casefold())
+        if city is None:
+            return None
+        return SimpleNamespace(latitude=city["lat"], longitude=city["lon"], raw={"name": city["name"]})
+
+    def reverse(self, query, **kwargs):
+        self._wait()
+        lat, lon = query
+        city = min(self.cities, key=lambda c: math.hypot(c["lat"] - lat, (c["lon"] - lon) * math.cos(math.radians(lat))))
+        return SimpleNamespace(latitude=city["lat"], longitude=city["lon"],
+                               raw={"address": {"city": city["name"], "country_code": city["country"].lower()}})
@@ -0,0 +1,100 @@
+"""
+Temps par appel des calculs Astropy du chemin des requêtes, en IERS_MODE exact puis fast :
+  - sky   : temps sidéral local + Soleil en AltAz (cœur de compute_sky_state)
+  - bodies: Soleil, Lune et planètes en AltAz (get_visible_solar_system_objects, éphéméride intégrée)
+Chaque mode tourne dans un processus neuf pour mesurer aussi le premier appel (chargement des tables).
+
+Usage : python Bench/iers_bench.py [--mode exact|fast|both] [--n 200] [--warm] [--out resultats.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _stats(samples_ms):
+    samples = sorted(samples_ms)
+    return {
+        "first_ms": round(samples_ms[0], 3),
+        "median_ms": round(statistics.median(samples[1:] or samples), 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def run_mode(mode: str, n: int, warm: bool) -> dict:
+    import iers_config
+    iers_config.configure(mode)
+    from astropy import units as u
+    from astropy.coordinates import AltAz, EarthLocation, get_sun
+    from astropy.time import Time
+    from ephemeris import BODIES, solar_system_positions
+
+    result = {"mode": mode, "warm_up": warm}
+    if warm:
+        t0 = time.perf_counter()
+        iers_config.load_tables()
+        result["load_tables_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+
+    location = EarthLocation(lat=48.85 * u.deg, lon=2.35 * u.deg)
+    start = datetime(2026, 1, 4, 21, 0, tzinfo=timezone.utc)
+    times = [start + timedelta(minutes=7 * i) for i in range(n)]
+
+    def sky(dt):
+        t = Time(dt)
+        lst = t.sidereal_time('mean', longitude=location.lon)
+        get_sun(t).transform_to(AltAz(obstime=t, location=location))
+        return lst.hour
+
+    def bodies(dt):
+        solar_system_positions(Time(dt), 48.85, 2.35, BODIES, mode="builtin")
+
+    for name, func in (("sky", sky), ("bodies", bodies)):
+        samples = []
+        for dt in times:
+            t0 = time.perf_counter()
+            func(dt)
+            samples.append((time.perf_counter() - t0) * 1000)
+        result[name] = _stats(samples)
+    result["lst_hours_sample"] = sky(start)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", default="both", choices=["exact", "fast", "both"])
+    parser.add_argument("--n", type=int, default=200)
+    parser.add_argument("--warm", action="store_true", help="Appeler iers_config.load_tables() avant de mesurer")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    if args.mode != "both":
+        print(json.dumps(run_mode(args.mode, args.n, args.warm)))
+        return
+
+    results = {}
+    for mode in ("exact", "fast"):
+        out = subprocess.run([sys.executable, __file__, "--mode", mode, "--n", str(args.n)]
+                             + (["--warm"] if args.warm else []),
+                             capture_output=True, text=True, check=True, cwd=ROOT)
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+    # Écart de temps sidéral entre les deux modes, en secondes d'arc
+    delta = abs(results["exact"]["lst_hours_sample"] - results["fast"]["lst_hours_sample"]) * 15 * 3600
+    results["lst_delta_arcsec"] = round(delta, 2)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from batch import batch_visibility, sky_states, visibility_matrix
+from catalogue import CatalogueEngine
+
+@pytest.fixture(scope="module")
+def engine():
+    return CatalogueEngine('Celestial.db')
+
+@pytest.fixture(scope="module")
+def sites():
+    rng = np.random.default_rng(0)
+    n = 40
+    return rng.uniform(-70, 70, n), rng.uniform(-180, 180, n), ["2026-01-04T22:00:00"] * n
+
+def test_matrix_matches_single_site(engine, sites):
+    lat, lon, utc = sites
+    lst, sun = sky_states(lat, lon, utc)
+    matrix = visibility_matrix(lat, lon, utc, 5, engine=engine, chunk_cells=len(engine) * 7)
+
+    for i in range(len(lat)):
+        expected = set(engine.visible_ids(lat[i], lst[i], 5).tolist()) if sun[i] <= -6 else set()
+        assert set(engine.ids[matrix[i]].tolist()) == expected
+
+def test_top_sorted_and_chunk_independent(engine, sites):
+    lat, lon, utc = sites
+    small = batch_visibility(lat, lon, utc, 5, top=5, engine=engine, chunk_cells=1)
+    large = batch_visibility(lat, lon, utc, 5, top=5, engine=engine)
+
+    assert small == large
+    night = [r for r in large if r["sun_alt"] <= -6 and r["visible_count"]]
+    assert night
+    for r in night:
+        alts = [t["alt"] for t in r["targets"]]
+        assert len(alts) == min(5, r["visible_count"]) and alts == sorted(alts, reverse=True)
+
+def test_daytime_site_sees_nothing(engine):
+    # Le Cap à midi en janvier : Soleil haut
+    res = batch_visibility([-33.9], [18.4], ["2026-01-04T12:00:00"], engine=engine)[0]
+    assert res["sun_alt"] > 60 and res["visible_count"] == 0 and res["targets"] == []
@@ -0,0 +1,93 @@
+import pytest
+import sqlite3
+import numpy as np
+from astropy_function import maths_altitude
+from catalogue import CatalogueEngine, join_targets, rewrite_visibility, visibility_prefilter
+from schema import create_schema
+
+SITES = [(48.85, 0.5), (48.85, 13.2), (-33.9, 6.0), (0.0, 23.9), (89.0, 2.0)]
+
+@pytest.fixture
+def engine():
+    return CatalogueEngine('Celestial.db')
+
+@pytest.fixture
+def db_conn():
+    conn = sqlite3.connect('Celestial.db')
+    conn.create_function("IS_VISIBLE", 5, maths_altitude)
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("lat,lst", SITES)
+def test_mask_matches_udf(engine, db_conn, lat, lst):
+    rows = db_conn.execute("SELECT rowid, ra, dec FROM Celestial").fetchall()
+    expected = {rowid for rowid, ra, dec in rows if maths_altitude(ra, dec, lat, lst, 5)}
+
+    assert set(engine.visible_ids(lat, lst, 5).tolist()) == expected
+
+def test_visible_sorted_with_altaz(engine):
+    res = engine.visible(48.85, 5.5, 5)
+
+    assert len(res["names"]) == len(res["alt"]) == len(res["az"]) > 0
+    assert np.all(res["alt"] > 5)
+    assert np.all(np.diff(res["alt"]) <= 0)
+    assert np.all((res["az"] >= 0) & (res["az"] < 360))
+
+def test_meridian_transit(engine):
+    # Au passage au méridien (HA = 0) : alt = 90 - |lat - dec|, plein Sud si dec < lat
+    lat = 48.85
+    dec = np.degrees(np.arcsin(engine.sin_dec))
+    i = int(np.argmin(dec))
+    alt, az = engine.altaz(lat, np.degrees(engine.ra_rad[i]) / 15)
+
+    assert alt[i] == pytest.approx(90 - abs(lat - dec[i]), abs=1e-6)
+    assert az[i] == pytest.approx(180, abs=1e-6)
+
+@pytest.mark.parametrize("lat,lst", SITES)
+def test_rewrite_same_rows(engine, db_conn, lat, lst):
+    query = f"SELECT name FROM Celestial WHERE IS_VISIBLE(ra,dec,{lat}, {lst}, 5) ORDER BY name"
+    sql, params = rewrite_visibility(query, engine)
+
+    assert "IS_VISIBLE" not in sql and len(sql) < len(query) + 80 # Rowids liés, pas recopiés dans le SQL
+    assert db_conn.execute(sql, params).fetchall() == db_conn.execute(query).fetchall()
+
+def test_rewrite_keeps_alias_in_joins(engine, db_conn):
+    query = ("SELECT c.name, o.name FROM Celestial AS c JOIN Celestial o ON o.constellation = c.constellation "
+             "WHERE IS_VISIBLE(c.ra, c.dec, 48.85, 13.2, 30) AND IS_VISIBLE(o.ra,o.dec,48.85,13.2,60) ORDER BY 1, 2")
+    sql, params = rewrite_visibility(query, engine)
+
+    assert "c.rowid IN" in sql and "o.rowid IN" in sql and len(params) == 2
+    assert db_conn.execute(sql, params).fetchall() == db_conn.execute(query).fetchall()
+
+@pytest.mark.parametrize("lat,lst", SITES)
+def test_prefilter_keeps_visible_rows(engine, db_conn, lat, lst):
+    where = visibility_prefilter(lat, lst, 5)
+    kept = {r[0] for r in db_conn.execute(f"SELECT rowid FROM Celestial WHERE {where}")}
+    visible = set(engine.visible_ids(lat, lst, 5).tolist())
+
+    assert visible <= kept
+    if abs(lat) < 80:
+        assert len(kept) < len(engine)
+    both = db_conn.execute(f"SELECT rowid FROM Celestial WHERE {where} AND IS_VISIBLE(ra,dec,{lat},{lst},5)")
+    assert {r[0] for r in both} == visible
+
+def test_prefilter_dense_sky():
+    # Grille serrée, y compris autour de 0/360 et des pôles : aucun objet visible ne doit être écarté
+    conn = sqlite3.connect(":memory:")
+    conn.create_function("IS_VISIBLE", 5, maths_altitude)
+    create_schema(conn)
+    ras, decs = np.meshgrid(np.arange(0, 360, 1.5), np.arange(-89.5, 90, 1.5))
+    conn.executemany("INSERT INTO Celestial(name, type, ra, dec, catalogue) VALUES (?, 'x', ?, ?, 'test')",
+                     [(f"P{i}", float(ra), float(dec)) for i, (ra, dec) in enumerate(zip(ras.ravel(), decs.ravel()))])
+    for lat, lst in [(48.85, 0.1), (-33.9, 23.95), (3.0, 12.0), (-89.0, 6.0), (65.0, 18.0)]:
+        where = visibility_prefilter(lat, lst, 5)
+        missed = conn.execute(f"SELECT COUNT(*) FROM Celestial WHERE IS_VISIBLE(ra,dec,{lat},{lst},5) AND NOT ({where})")
+        assert missed.fetchone()[0] == 0
+
+def test_join_targets_from_names():
+    joined = join_targets([{"label": "m42"}, {"label": "NGC 869"}, {"label": "Jupiter", "ra": 10.0, "dec": 3.0}])
+
+    assert joined[0]["label"] == "M42" and joined[0]["ra"] == pytest.approx(83.82, abs=0.01)
+    assert joined[0]["url"].startswith("https://")
+    assert joined[1]["label"] == "NGC869" and joined[1]["constellation"] == "Perseus"
+    assert joined[2] == {"label": "Jupiter", "ra": 10.0, "dec": 3.0}
@@ -0,0 +1,58 @@
+import sqlite3
+import threading
+import pytest
+import database
+from database import ReadOnlyPool, register_function, get_pool
+
+@pytest.fixture
+def pool():
+    return ReadOnlyPool('Celestial.db', size=2)
+
+def test_structured_rows(pool):
+    rows = pool.query("SELECT name, ra, dec FROM Celestial WHERE name = ?", ("M42",))
+    assert rows == [{"name": "M42", "ra": pytest.approx(83.82, abs=0.01), "dec": pytest.approx(-5.39, abs=0.01)}]
+
+def test_read_only(pool):
+    with pytest.raises(sqlite3.OperationalError):
+        pool.rows("DELETE FROM Celestial")
+
+def test_pool_is_bounded_and_reused(pool):
+    barrier = threading.Barrier(6)
+    errors = []
+
+    def worker():
+        try:
+            barrier.wait()
+            for _ in range(20):
+                assert pool.rows("SELECT COUNT(*) FROM Celestial")[0][0] > 0
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert pool._created <= 2
+
+def test_udf_registered_on_every_connection():
+    pool = get_pool('Celestial.db')
+    register_function("DOUBLE_IT", 1, lambda x: 2 * x)
+    try:
+        assert pool.rows("SELECT DOUBLE_IT(21)")[0][0] == 42
+    finally:
+        database._functions.pop("DOUBLE_IT")
+
+def test_compact_projection_and_cap(pool):
+    res = pool.compact("SELECT * FROM Celestial ORDER BY magnitude", max_rows=3, hidden=("url",))
+
+    assert "url" not in res["columns"] and "name" in res["columns"]
+    assert len(res["rows"]) == 3 and res["truncated"]
+    ra = res["rows"][0][res["columns"].index("ra")]
+    assert ra == round(ra, 2)
+
+def test_compact_not_truncated(pool):
+    res = pool.compact("SELECT name FROM Celestial WHERE name = 'M42'", max_rows=3)
+    assert res == {"columns": ["name"], "rows": [["M42"]], "truncated": False}
@@ -0,0 +1,38 @@
+import pytest
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import EarthLocation, SkyCoord
+from astropy.time import Time
+from ephemeris import BODIES, analytic_positions, builtin_positions, solar_system_positions
+
+# (instant UTC, latitude, longitude)
+CASES = [
+    ("2026-01-04 21:00:00", 48.85, 2.35),
+    ("2024-06-21 03:00:00", -33.9, 18.4),
+    ("2030-11-11 12:00:00", 35.7, 139.7),
+]
+TOLERANCE_ARCMIN = 5
+
+@pytest.mark.parametrize("iso,lat,lon", CASES)
+def test_analytic_matches_builtin(iso, lat, lon):
+    t = Time(iso)
+    ref = builtin_positions(t, EarthLocation(lat=lat * u.deg, lon=lon * u.deg))
+    fast = solar_system_positions(t, lat, lon, mode='analytic')
+
+    sep = SkyCoord(fast["ra"] * u.deg, fast["dec"] * u.deg).separation(
+        SkyCoord(ref["ra"] * u.deg, ref["dec"] * u.deg)).arcmin
+    d_alt = np.abs(fast["alt"] - ref["alt"]) * 60
+    d_az = np.abs((fast["az"] - ref["az"] + 180) % 360 - 180) * 60 * np.cos(np.radians(ref["alt"]))
+
+    for i, name in enumerate(BODIES):
+        assert sep[i] < TOLERANCE_ARCMIN, name
+        assert d_alt[i] < TOLERANCE_ARCMIN, name
+        assert d_az[i] < TOLERANCE_ARCMIN, name
+
+def test_analytic_vectorized_over_time():
+    jd = Time("2026-01-04 12:00:00").jd + np.arange(0, 1, 1 / 24)
+    pos = analytic_positions(jd, 48.85, 2.35)
+
+    assert pos["alt"].shape == (len(BODIES), 24)
+    one = analytic_positions(jd[5], 48.85, 2.35)
+    assert one["alt"][:, 0] == pytest.approx(pos["alt"][:, 5])
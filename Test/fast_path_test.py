@@ -0,0 +1,83 @@
+import pytest
+import numpy as np
+import sqlite3
+from datetime import datetime
+import pytz
+from fast_path import match_fast_path, run_fast_path
+from sky_cache import sky_cache
+
+PARIS = {"city": "Paris", "latitude": 48.85, "longitude": 2.35, "tz": "Europe/Paris"}
+
+@pytest.mark.parametrize("message,kind,name", [
+    ("Que voir ce soir ?", "discover", None),
+    ("what can I see tonight", "discover", None),
+    ("Est-ce que M42 est visible ?", "object", "M42"),
+    ("est-ce que C14 est visible", "object", "NGC869"),
+    ("Les nébuleuses visibles maintenant", "discover", None),
+    ("Quels objets dans Orion ?", "constellation", "Orion"),
+    ("Les galaxies visibles dans la Grande Ourse", "constellation", "Ursa Major"),
+    ("what can i see in orion", "constellation", "Orion"),
+    ("Que voir ce soir depuis mon jardin ?", "discover", None),
+    ("Que voir en ce moment ?", "discover", None),
+])
+def test_templates(message, kind, name):
+    plan = match_fast_path(message)
+    assert plan["kind"] == kind and plan["name"] == name
+
+@pytest.mark.parametrize("message", [
+    "Que voir à Tokyo ce soir ?",       # autre ville
+    "Les plus belles galaxies visibles depuis lyon",
+    "what can i see in paris tonight",
+    "what can i see in new york tonight",
+    "Que voir demain à 22h ?",          # autre heure
+    "Est-ce que Jupiter est visible ?", # planète
+    "C'est quoi M42 ?",                 # éducation
+    "Quelle est la distance de M31 ?",  # désignation sans question de visibilité
+    "Quelle est la magnitude de M13 ?",
+    "M31 est-elle plus grande que M33 ?",
+    "Est-ce que je peux voir M31 et M33 ?", # plusieurs objets
+    "Combien de galaxies sont visibles ?",  # dénombrement
+    "how many galaxies are visible tonight",
+    "Quelles nébuleuses ne sont pas visibles ?", # négation
+    "which galaxies are not visible now",
+    "Bonjour",
+])
+def test_falls_back_to_llm(message):
+    assert match_fast_path(message) is None
+
+def _sky(visible_names, sun_alt=-30):
+    conn = sqlite3.connect('Celestial.db')
+    ids = [r[0] for r in conn.execute(
+        f"SELECT rowid FROM Celestial WHERE name IN ({','.join('?' * len(visible_names))})", visible_names)]
+    conn.close()
+    return lambda lat, lon, t: {"sun_alt": sun_alt, "visible_ids": np.array(ids)}
+
+@pytest.fixture(autouse=True)
+def empty_sky_cache():
+    sky_cache.clear()
+    yield
+    sky_cache.clear()
+
+NOW = datetime(2026, 1, 4, 21, 0, tzinfo=pytz.utc)
+
+def test_object_visible():
+    res = run_fast_path(match_fast_path("M42 est visible ?"), PARIS, _sky(["M42"]), NOW)
+    assert [t["label"] for t in res["targets"]] == ["M42"]
+
+def test_object_not_visible():
+    res = run_fast_path(match_fast_path("M42 est visible ?"), PARIS, _sky(["M31"]), NOW)
+    assert res["targets"] == [] and "pas visible" in res["reply"]
+
+def test_discover_filters_type_and_visibility():
+    plan = match_fast_path("Les galaxies visibles maintenant")
+    res = run_fast_path(plan, PARIS, _sky(["M31", "M33", "M42"]), NOW)
+    assert sorted(t["label"] for t in res["targets"]) == ["M31", "M33"]
+
+def test_daytime():
+    res = run_fast_path(match_fast_path("Que voir ce soir ?"), PARIS, _sky(["M31"], sun_alt=20), NOW)
+    assert res["targets"] == [] and "Soleil" in res["reply"]
+
+def test_tonight_means_22h_local():
+    res = run_fast_path(match_fast_path("Que voir ce soir ?"), PARIS, _sky(["M31"]),
+                        datetime(2026, 1, 4, 14, 0, tzinfo=pytz.utc))
+    assert res["hour"] == "2026-01-04T22:00:00"
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from gazetteer import Gazetteer, build, get_gazetteer, unit_vectors
+
+def geonames_line(name, lat, lon, country, population, tz):
+    col = [""] * 19
+    col[1], col[4], col[5], col[8], col[14], col[17] = name, str(lat), str(lon), country, str(population), tz
+    return "\t".join(col) + "\n"
+
+@pytest.fixture(scope="module")
+def gazetteer(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    lines = [geonames_line(f"Ville{i}", float(np.degrees(np.arcsin(z))), lon, "XX", 20000 + i, "UTC")
+             for i, (z, lon) in enumerate(zip(rng.uniform(-1, 1, 3000), rng.uniform(-180, 180, 3000)))]
+    lines += [geonames_line("Gap", 44.55858, 6.07868, "FR", 42715, "Europe/Paris"),
+              geonames_line("Springfield", 39.80, -89.64, "US", 114000, "America/Chicago"),
+              geonames_line("Springfield", 37.21, -93.29, "US", 169000, "America/Chicago"),
+              geonames_line("Hameau", 44.6, 6.1, "FR", 300, "Europe/Paris")] # Sous le seuil
+    source = tmp_path_factory.mktemp("geonames") / "cities.txt"
+    source.write_text("".join(lines), encoding="utf-8")
+    out = tmp_path_factory.mktemp("gazetteer")
+    assert build(str(source), min_population=15000, out=str(out)) == 3003
+    return Gazetteer(str(out))
+
+def test_nearest_matches_brute_force(gazetteer):
+    points = np.asarray(gazetteer.points)
+    rng = np.random.default_rng(1)
+    for lat, lon in zip(rng.uniform(-89, 89, 300), rng.uniform(-180, 180, 300)):
+        i, _ = gazetteer.nearest_index(lat, lon, max_km=20000)
+        assert i == int(((points - unit_vectors(lat, lon)) ** 2).sum(axis=1).argmin())
+
+def test_nearest_entry_and_radius(gazetteer):
+    city = gazetteer.nearest(44.56, 6.08, max_km=5)
+    assert city["name"] == "Gap" and city["country"] == "FR" and city["tz"] == "Europe/Paris"
+    assert city["latitude"] == pytest.approx(44.55858) and city["distance_km"] < 1
+    assert gazetteer.nearest(44.8, 6.5, max_km=5) is None # Campagne : rien dans le rayon
+
+def test_lookup_prefers_most_populated(gazetteer):
+    assert gazetteer.lookup("springfield")["latitude"] == pytest.approx(37.21)
+    assert gazetteer.lookup("Hameau") is None
+
+def test_bundled_gazetteer():
+    city = get_gazetteer().nearest(44.56, 6.08)
+    assert (city["name"], city["country"], city["tz"]) == ("Gap", "FR", "Europe/Paris")
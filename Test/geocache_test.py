@@ -0,0 +1,35 @@
+import pytest
+from geocache import GeoCache, MISS
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeoCache(str(tmp_path / "geo.db"), ttl=100, negative_ttl=100)
+
+def test_seeded_cities(cache):
+    assert cache.get_coordinates("Paris") == pytest.approx((48.8566, 2.3522))
+    # Insensible à la casse/espaces, alias anglais inclus
+    assert cache.get_coordinates("  london ") == cache.get_coordinates("Londres")
+
+def test_miss_then_hit(cache):
+    assert cache.get_coordinates("Trifouilly-les-Oies") is MISS
+    cache.set_coordinates("Trifouilly-les-Oies", (47.0, 3.0))
+    assert cache.get_coordinates("trifouilly-les-oies") == (47.0, 3.0)
+
+def test_negative_entry_expires(tmp_path):
+    cache = GeoCache(str(tmp_path / "geo.db"), ttl=100, negative_ttl=-1)
+    cache.set_coordinates("Atlantide", None)
+    assert cache.get_coordinates("Atlantide") is MISS
+
+    cache.negative_ttl = 100
+    cache.set_coordinates("Atlantide", None)
+    assert cache.get_coordinates("Atlantide") is None
+
+def test_reverse_rounded_key(cache):
+    cache.set_city(48.85661, 2.35222, "Paris")
+    assert cache.get_city(48.8571, 2.3519) == "Paris"
+    assert cache.get_city(45.76, 4.83) is MISS
+
+def test_shared_between_instances(tmp_path):
+    path = str(tmp_path / "geo.db")
+    GeoCache(path).set_coordinates("Ouagadougou", (12.37, -1.52))
+    assert GeoCache(path).get_coordinates("Ouagadougou") == (12.37, -1.52)
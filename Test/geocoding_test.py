@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+import pytest
+from geopy.exc import GeocoderTimedOut
+from geocache import GeoCache
+import astropy_function
+from geocoding import CitiesBackend, GazetteerBackend, Geocoder, NominatimBackend, RateLimiter, place
+
+class SlowBackend:
+    """Backend distant factice : compte ses appels, échoue 'failures' fois avant de répondre."""
+    name = "fake"
+    remote = True
+
+    def __init__(self, delay=0.0, failures=0):
+        self.delay, self.failures, self.calls = delay, failures, 0
+        self._lock = threading.Lock()
+
+    def forward(self, query):
+        with self._lock:
+            self.calls += 1
+            if self.calls <= self.failures:
+                raise GeocoderTimedOut("timeout")
+        time.sleep(self.delay)
+        return (1.0, 2.0) if query != "Atlantide" else None
+
+    def reverse(self, lat, lon):
+        return self.forward("x") and place("Village", "FR")
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeoCache(str(tmp_path / "geo.db"), ttl=100, negative_ttl=100, seed_path=None)
+
+def test_concurrent_identical_lookups_are_coalesced(cache):
+    backend = SlowBackend(delay=0.2)
+    geocoder = Geocoder([backend], cache=cache, rate=0)
+
+    async def burst():
+        return await asyncio.gather(*(geocoder.aforward("Trifouilly") for _ in range(8)))
+
+    assert asyncio.run(burst()) == [(1.0, 2.0)] * 8
+    assert backend.calls == 1
+    assert geocoder.forward("trifouilly") == (1.0, 2.0) and backend.calls == 1 # Ensuite : cache
+
+def test_retries_then_negative_cache(cache):
+    backend = SlowBackend(failures=1)
+    geocoder = Geocoder([backend], cache=cache, rate=0, retries=1, backoff=0.01)
+    assert geocoder.forward("Ici") == (1.0, 2.0) and backend.calls == 2
+
+    down = Geocoder([SlowBackend(failures=10)], cache=cache, rate=0, retries=1, backoff=0.01)
+    assert down.forward("Ailleurs") is None
+    assert cache.get_coordinates("Ailleurs") is None
+
+def test_rate_limit_spaces_outbound_calls():
+    limiter = RateLimiter(rate=20)
+    started = time.monotonic()
+    threads = [threading.Thread(target=limiter.wait) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert time.monotonic() - started >= 4 / 20 - 0.01
+
+def test_local_backend_answers_before_remote(cache):
+    remote = SlowBackend()
+    geocoder = Geocoder([CitiesBackend(), remote], cache=cache, rate=0)
+    assert geocoder.reverse(48.86, 2.34) == "Paris"
+    assert geocoder.forward("Londres") == pytest.approx((51.5074, -0.1278), abs=0.01)
+    assert remote.calls == 0
+    assert geocoder.reverse(45.0, -30.0) == "Village" and remote.calls == 1 # Plein océan : backend distant
+
+def test_nominatim_backend_with_injected_client():
+    class Client:
+        def reverse(self, query, language):
+            return type("Loc", (), {"raw": {"address": {"town": "Gap"}}})()
+    assert NominatimBackend(client=Client()).reverse(44.56, 6.08) == place("Gap")
+
+class CountingLocal:
+    name, remote = "counting", False
+
+    def __init__(self):
+        self.calls = 0
+
+    def reverse(self, lat, lon):
+        self.calls += 1
+        return None
+
+def test_async_reverse_runs_local_backends_once(cache):
+    local, remote = CountingLocal(), SlowBackend()
+    geocoder = Geocoder([local, remote], cache=cache, rate=0)
+    assert asyncio.run(geocoder.areverse(45.0, -30.0)) == "Village"
+    assert local.calls == 1 and remote.calls == 1
+
+def test_local_timezone_skips_timezone_finder(cache, monkeypatch):
+    found = Geocoder([CitiesBackend()], cache=cache, rate=0).reverse_place(35.68, 139.65)
+    assert found["tz"] == "Asia/Tokyo"
+    monkeypatch.setattr(astropy_function, "get_timezone_finder", lambda: pytest.fail("TimezoneFinder consulté"))
+    location = astropy_function.resolve_location(found["city"], (35.68, 139.65), found["tz"])
+    assert location["tz"] == "Asia/Tokyo"
+
+def test_local_reverse_leaves_suburbs_to_gazetteer(cache):
+    geocoder = Geocoder([CitiesBackend(), GazetteerBackend()], cache=cache, rate=0)
+    assert geocoder.reverse(48.86, 2.34) == "Paris"
+    assert geocoder.reverse(48.8049, 2.1204) == "Versailles" # 17 km du centre de Paris
+
+def test_homonyms_are_settled_by_remote_backend(cache):
+    local, remote = CitiesBackend(), SlowBackend()
+    # "Valence" : Valencia (Espagne) dans la liste locale, Valence (Drôme) dans le gazetteer
+    geocoder = Geocoder([local, GazetteerBackend(), remote], cache=cache, rate=0)
+    assert geocoder.forward("Lyon") == local.forward("Lyon") and remote.calls == 0
+    assert geocoder.forward("Valence") == (1.0, 2.0) and remote.calls == 1
+
+    down = Geocoder([local, GazetteerBackend(), SlowBackend(failures=10)], cache=cache, rate=0, retries=0)
+    offline = Geocoder([local, GazetteerBackend()], cache=cache, rate=0)
+    assert down.forward("Vienne") == offline.forward("Vienne") == local.forward("Vienne")
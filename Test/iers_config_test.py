@@ -0,0 +1,23 @@
+import pytest
+from astropy import units as u
+from astropy.time import Time
+from astropy.utils import iers
+import iers_config
+
+def test_no_download_on_request_path():
+    assert iers.conf.auto_download is False
+    assert iers.conf.auto_max_age is None
+
+def test_zero_table_matches_bundled_sidereal_time():
+    t = Time("2026-01-04T23:00:00", scale="utc")
+    exact = t.sidereal_time("apparent", longitude=2.35 * u.deg)
+
+    with iers.earth_orientation_table.set(iers_config.zero_table()):
+        fast = Time("2026-01-04T23:00:00", scale="utc").sidereal_time("apparent", longitude=2.35 * u.deg)
+
+    # |UT1 - UTC| < 0,9 s -> moins de 14" d'écart sur le temps sidéral
+    assert abs((fast - exact).to(u.arcsec).value) < 14
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        iers_config.configure("approx")
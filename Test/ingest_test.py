@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+import ingest
+
+def dso(name, type_, con, ra, dec, mags=(None, None), messier=None):
+    return SimpleNamespace(name=name, type=type_, constellation=con, rad_coords=(ra, dec),
+                           magnitudes=mags, identifiers=(messier, None, None, None, None))
+
+OBJECTS = [
+    dso("NGC1976", "Star cluster + Nebula", "Ori", 1.4629, -0.0941, (4.0, 4.0), "M042"),
+    dso("NGC0188", "Open Cluster", "Cep", 0.2071, 1.4882, (8.1, None)),
+    dso("NGC0224", "Galaxy", "And", 0.1865, 0.7202, (4.3, 3.4), "M031"),
+    dso("NGC1982", "Duplicated record", "Ori", 1.4636, -0.0921),
+    dso("IC0002", "Galaxy", "Cet", 0.0055, -0.2397),
+]
+
+@pytest.fixture
+def con(tmp_path):
+    con = ingest.open_database(str(tmp_path / "cat.db"))
+    yield con
+    con.close()
+
+def test_openngc_rows_naming():
+    rows = {r[0]: r for r in ingest.openngc_rows(OBJECTS, caldwell={"NGC188"})}
+
+    assert set(rows) == {"M42", "NGC188", "M31", "IC2"}
+    assert rows["M42"][1:3] == ("Star_cluster_+_Nebula", "Orion") and rows["M42"][7] == "Messier"
+    assert rows["NGC188"][7] == "Caldwell" and rows["IC2"][7] == "OpenNGC"
+    assert rows["M31"][5] == 3.4 # magnitude V avant B
+
+def test_upsert_keeps_rowid_and_url(con):
+    rows = ingest.openngc_rows(OBJECTS, caldwell=set())
+    ingest.upsert_rows(con, rows, "openngc")
+    con.execute("UPDATE Celestial SET url = 'https://img/m42.jpg' WHERE name = 'M42'")
+    before = dict(con.execute("SELECT name, rowid FROM Celestial"))
+
+    ingest.upsert_rows(con, rows, "openngc")
+
+    assert dict(con.execute("SELECT name, rowid FROM Celestial")) == before
+    assert con.execute("SELECT url FROM Celestial WHERE name = 'M42'").fetchone()[0] == "https://img/m42.jpg"
+    assert ingest.is_done(con, "catalogue", "openngc")
+
+def test_wiki_title():
+    assert ingest.wiki_title("M42") == "Messier 42"
+    assert ingest.wiki_title("NGC869") == "NGC 869"
+    assert ingest.wiki_title("Coalsack_Nebula") == "Coalsack Nebula"
+
+def test_enrich_images_batches_and_resumes(con, monkeypatch):
+    ingest.upsert_rows(con, ingest.openngc_rows(OBJECTS, caldwell=set()), "openngc")
+    monkeypatch.setattr(ingest, "WIKI_BATCH", 2)
+    calls = []
+
+    def handler(request):
+        titles = request.url.params["titles"].split("|")
+        calls.append(titles)
+        query = {"normalized": [], "redirects": [], "pages": []}
+        for t in titles:
+            if t == "Messier 42":
+                query["redirects"].append({"from": t, "to": "Orion Nebula"})
+                query["pages"].append({"title": "Orion Nebula", "thumbnail": {"source": "https://img/orion.jpg"}})
+            else:
+                query["pages"].append({"title": t, "missing": True})
+        return httpx.Response(200, json={"query": query})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await ingest.enrich_images(con, concurrency=2, client=client)
+
+    assert asyncio.run(run()) == 1
+    assert len(calls) == 2 and all(len(c) <= 2 for c in calls)
+    assert con.execute("SELECT url FROM Celestial WHERE name = 'M42'").fetchone()[0] == "https://img/orion.jpg"
+
+    calls.clear()
+    asyncio.run(run()) # Tout est déjà dans le point de reprise
+    assert calls == []
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from llm_cache import LLMCache, cache_scope, embed
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        return AIMessage(content=f"réponse {self.calls}",
+                         tool_calls=[{"name": "get_ra_dec_constraint", "args": {"city": "Paris"}, "id": "1"}])
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(str(tmp_path / "llm.db"), ttl=100, max_entries=10, semantic=True, similarity=0.9)
+
+PARIS = {"latitude": 48.8566, "longitude": 2.3522}
+
+def _ask(cache, llm, text, scope="s", **kw):
+    history = [HumanMessage(content=text)]
+    return asyncio.run(cache.ainvoke(llm, "astronomer", [("system", "prompt")] + history,
+                                     key_messages=history, scope=scope, **kw))
+
+def test_exact_hit_roundtrips_tool_calls(cache):
+    llm = CountingLLM()
+    first = _ask(cache, llm, "Que voir ce soir à Paris ?")
+    second = _ask(cache, llm, "que voir ce soir a paris")
+
+    assert llm.calls == 1
+    assert second.content == first.content
+    assert second.tool_calls[0]["name"] == "get_ra_dec_constraint"
+    assert cache.stats()["hits"] == 1
+
+def test_scope_separates_entries(cache):
+    llm = CountingLLM()
+    _ask(cache, llm, "Que voir ce soir ?", scope="paris")
+    _ask(cache, llm, "Que voir ce soir ?", scope="tokyo")
+    assert llm.calls == 2
+
+def test_semantic_hit_requires_same_numbers(cache):
+    llm = CountingLLM()
+    _ask(cache, llm, "Est-ce que M42 est visible ce soir ?", question="Est-ce que M42 est visible ce soir ?")
+    _ask(cache, llm, "Est ce que M42 est bien visible ce soir", question="Est ce que M42 est bien visible ce soir")
+    assert llm.calls == 1 and cache.stats()["semantic_hits"] == 1
+
+    _ask(cache, llm, "Est-ce que M43 est visible ce soir ?", question="Est-ce que M43 est visible ce soir ?")
+    assert llm.calls == 2
+
+def test_size_bound(cache):
+    llm = CountingLLM()
+    for i in range(15):
+        _ask(cache, llm, f"question {i}")
+    assert cache.stats()["size"] == 10
+
+def test_expired_entry_is_miss(tmp_path):
+    cache, llm = LLMCache(str(tmp_path / "llm.db"), ttl=-1), CountingLLM()
+    _ask(cache, llm, "Que voir ?")
+    _ask(cache, llm, "Que voir ?")
+    assert llm.calls == 2
+
+def test_scope_buckets():
+    assert cache_scope(PARIS, "2026-01-04T22:01:00") == cache_scope(PARIS, "2026-01-04T22:14:00")
+    assert cache_scope(PARIS, "2026-01-04T22:01:00") != cache_scope(PARIS, "2026-01-04T22:16:00")
+
+def test_embedding_similarity():
+    assert float(embed("que voir ce soir") @ embed("que voir ce soir ?")) > 0.99
+    assert float(embed("que voir ce soir") @ embed("explique les trous noirs")) < 0.5
+
+def test_hit_gets_fresh_id_and_deferred_last_hit(cache):
+    llm = CountingLLM()
+    first = _ask(cache, llm, "Que voir ce soir ?")
+    second = _ask(cache, llm, "Que voir ce soir ?")
+    third = _ask(cache, llm, "Que voir ce soir ?")
+    assert llm.calls == 1 and len({first.id, second.id, third.id}) == 3
+    assert len(cache._pending_hits) == 1 # Pas d'écriture par succès : reportée au prochain put
+    _ask(cache, llm, "Autre question")
+    assert not cache._pending_hits
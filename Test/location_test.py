@@ -0,0 +1,30 @@
+import pytest
+import astropy_function
+from astropy_function import location_for, get_target_utc_date, format_utc_to_local_display
+
+TOKYO = {"city": "Tokyo", "latitude": 35.6762, "longitude": 139.6503, "tz": "Asia/Tokyo"}
+
+@pytest.fixture
+def no_geocoding(monkeypatch):
+    def _fail(city):
+        raise AssertionError(f"géocodage inattendu pour {city}")
+    monkeypatch.setattr(astropy_function, "get_coordinates", _fail)
+
+def test_location_reused_for_same_city(no_geocoding):
+    assert location_for("tokyo", TOKYO) is TOKYO
+    assert location_for(None, TOKYO) is TOKYO
+
+def test_utc_conversion_uses_resolved_tz(no_geocoding):
+    utc = get_target_utc_date("Tokyo", "2026-01-04 21:00:00", TOKYO)
+    assert utc.isoformat() == "2026-01-04T12:00:00+00:00"
+    assert format_utc_to_local_display("Tokyo", utc, TOKYO) == "2026-01-04T21:00:00+09:00"
+
+def test_other_city_is_resolved(monkeypatch):
+    monkeypatch.setattr(astropy_function, "get_coordinates", lambda city: (48.8566, 2.3522))
+    loc = location_for("Paris", TOKYO)
+    assert loc["tz"] == "Europe/Paris"
+
+@pytest.mark.parametrize("date", ["demain soir", "99999999999999999999"])
+def test_night_visibility_rejects_bad_date(no_geocoding, date):
+    result = astropy_function.get_night_visibility.func("Tokyo", date, location=TOKYO)
+    assert result["objects"] == [] and date in result["error"]
@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessageChunk
+import geocoding
+import main
+import sky_tiles
+from geocache import GeoCache
+from geocoding import CitiesBackend, Geocoder
+from session import open_checkpointer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def app_env(tmp_path, monkeypatch):
+    """Serveur isolé : sessions dans tmp_path, readiness remis à zéro."""
+    monkeypatch.setattr(main, "open_checkpointer", lambda: open_checkpointer(str(tmp_path / "sessions.db")))
+    monkeypatch.setattr(main, "readiness", {"status": "starting", "steps": {}})
+    return monkeypatch
+
+class StubGraph:
+    """Graphe factice : rejoue des (mode, chunk) comme graph.astream(stream_mode=[...]), puis lève éventuellement."""
+    checkpointer = None
+
+    def __init__(self, chunks, error=None):
+        self.chunks, self.error = chunks, error
+
+    async def astream(self, state, config=None, **kwargs):
+        for chunk in self.chunks:
+            yield chunk
+        if self.error:
+            raise self.error
+
+TARGET = [{"name": "M42", "ra": 83.82, "dec": -5.39}]
+STREAM = [
+    ("updates", {"orchest": {"intent": "astronome"}}),
+    ("updates", {"astro": {"final_target": TARGET, "hour": "2026-01-04 22:00:00"}}),
+    ("messages", (AIMessageChunk("La nébuleuse "), {"langgraph_node": "vulga"})),
+    ("messages", (AIMessageChunk("ignoré"), {"langgraph_node": "astro"})),
+    ("messages", (AIMessageChunk([{"type": "text", "text": "d'Orion"}]), {"langgraph_node": "vulga"})),
+    ("updates", {"vulga": {"vulgarisation_output": "La nébuleuse d'Orion"}}),
+]
+QUESTION = {"message": "Que voir ce soir ?", "city": "Paris", "hour": "2026-01-04 21:00:00",
+            "latitude": 48.86, "longitude": 2.34}
+
+@pytest.fixture
+def chat(tmp_path, monkeypatch):
+    """Client HTTP sans lifespan, géocodage hors ligne (villes locales, cache dans tmp_path)."""
+    cache = GeoCache(str(tmp_path / "geo.db"), seed_path=None)
+    monkeypatch.setattr(geocoding, "_geocoder", Geocoder([CitiesBackend()], cache=cache, rate=0))
+    return TestClient(main.app)
+
+def sse_events(body: str):
+    """Trames SSE -> [(event, data)] ; chaque trame est 'event: ...\ndata: ...' suivie d'une ligne vide."""
+    assert body.endswith("\n\n")
+    events = []
+    for frame in body[:-2].split("\n\n"):
+        event, data = frame.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+def test_chat_stream_targets_then_tokens_then_done(chat, monkeypatch):
+    monkeypatch.setattr(main, "graph", StubGraph(STREAM))
+    response = chat.post("/api/chat/stream", json=QUESTION)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = sse_events(response.text)
+    names = [event for event, data in events]
+    assert names == ["targets", "token", "token", "done"]
+    assert events[0][1]["targets"] == TARGET and events[0][1]["detected_city"] == "Paris"
+    assert "".join(data["text"] for event, data in events if event == "token") == "La nébuleuse d'Orion"
+    done = events[-1][1]
+    assert done["reply"] == "La nébuleuse d'Orion" and done["targets"] == TARGET and done["session_id"]
+
+def test_chat_stream_error_is_the_only_terminal_event(chat, monkeypatch):
+    monkeypatch.setattr(main, "graph", StubGraph(STREAM[:3], error=RuntimeError("quota Gemini")))
+    events = sse_events(chat.post("/api/chat/stream", json=QUESTION).text)
+    names = [event for event, data in events]
+    assert names == ["targets", "token", "error"]
+    assert events[-1][1] == {"detail": "quota Gemini"}
+
+def test_import_opens_nothing():
+    code = ("import sys, main, geocache, geocoding, llm_cache\n"
+            "assert 'astropy' not in sys.modules\n"
+            "assert geocache._geocache is None and geocoding._geocoder is None and llm_cache._llm_cache is None\n")
+    env = dict(os.environ, PYTHONPATH=ROOT, WARMUP="off")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+def test_warmup_covers_lazy_singletons(monkeypatch):
+    monkeypatch.setattr(main, "graph", None)
+    names = [name for name, step in main.warmup_steps()]
+    assert {"catalogue", "iers", "astropy", "geocoder", "llm_cache"} <= set(names)
+
+def test_blocking_warmup_ready_then_degraded(app_env):
+    app_env.setattr(main, "WARMUP", "blocking")
+    app_env.setattr(main, "warmup_steps", lambda: [("un", lambda: None), ("deux", lambda: None)])
+    with TestClient(main.app) as client:
+        response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready" and set(response.json()["steps"]) == {"un", "deux"}
+
+    def boom():
+        raise RuntimeError("tables IERS absentes")
+    app_env.setattr(main, "readiness", {"status": "starting", "steps": {}})
+    app_env.setattr(main, "warmup_steps", lambda: [("un", lambda: None), ("iers", boom)])
+    with TestClient(main.app) as client:
+        response = client.get("/healthz")
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "degraded" and body["steps"]["un"]["ok"]
+    assert body["steps"]["iers"] == {"ok": False, "error": "tables IERS absentes"}
+
+def test_background_warmup_answers_503_until_done(app_env):
+    release, done = threading.Event(), threading.Event()
+
+    def slow():
+        release.wait(5)
+    app_env.setattr(main, "WARMUP", "background")
+    app_env.setattr(main, "warmup_steps", lambda: [("lent", slow), ("fin", done.set)])
+    with TestClient(main.app) as client:
+        warming = client.get("/healthz")
+        release.set()
+        assert done.wait(5)
+        for _ in range(100): # Le statut final est posé juste après la dernière étape
+            ready = client.get("/healthz")
+            if ready.status_code == 200:
+                break
+    assert warming.status_code == 503 and warming.json()["status"] in ("starting", "warming")
+    assert ready.status_code == 200 and ready.json()["status"] == "ready"
+
+class SlowGraph:
+    """Graphe factice lent : mesure le nombre d'exécutions simultanées de ainvoke."""
+    checkpointer = None
+
+    def __init__(self, delay):
+        self.delay, self.running, self.peak = delay, 0, 0
+
+    async def ainvoke(self, state, config=None, **kwargs):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            return {**state, "vulgarisation_output": "ok"}
+        finally:
+            self.running -= 1
+
+def test_graph_slots_bound_concurrent_runs_and_healthz_stays_responsive(chat, monkeypatch):
+    slow = SlowGraph(delay=0.2)
+    monkeypatch.setattr(main, "graph", slow)
+    monkeypatch.setattr(main, "graph_slots", asyncio.Semaphore(2))
+    monkeypatch.setattr(main, "readiness", {"status": "ready", "steps": {}})
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            chats = [asyncio.create_task(client.post("/api/chat", json=QUESTION)) for _ in range(6)]
+            await asyncio.sleep(0.05) # Deux graphes en cours, quatre en attente d'un créneau
+            started = time.perf_counter()
+            health = await client.get("/healthz")
+            health_s = time.perf_counter() - started
+            in_flight = sum(not c.done() for c in chats)
+            return health, health_s, in_flight, await asyncio.gather(*chats)
+
+    health, health_s, in_flight, replies = asyncio.run(run())
+    assert health.status_code == 200 and health_s < 0.1 and in_flight == 6
+    assert all(r.status_code == 200 and r.json()["reply"] == "ok" for r in replies)
+    assert slow.peak == 2
+
+@pytest.mark.parametrize("top", [0, -3])
+def test_batch_rejects_non_positive_top(chat, top):
+    site = {"latitude": 48.85, "longitude": 2.35, "utc": "2026-01-04T21:00:00Z"}
+    response = chat.post("/api/visibility/batch", json={"sites": [site], "top": top})
+    assert response.status_code == 422
+    ok = chat.post("/api/visibility/batch", json={"sites": [site], "top": 1})
+    assert ok.status_code == 200
+
+def test_sky_etag_carries_data_version(chat, monkeypatch):
+    query = {"latitude": 48.85, "longitude": 2.35, "hour": "2026-01-04T21:00:00Z"}
+    first = chat.get("/api/sky", params=query)
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and sky_tiles.data_version() in etag
+    assert chat.get("/api/sky", params=query, headers={"If-None-Match": etag}).status_code == 304
+
+    monkeypatch.setattr(sky_tiles, "_version", "autre")
+    changed = chat.get("/api/sky", params=query, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
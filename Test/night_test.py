@@ -0,0 +1,38 @@
+import pytest
+import sqlite3
+from datetime import date, datetime
+from night import night_visibility
+
+PARIS = (48.85, 2.35, "Europe/Paris")
+
+@pytest.fixture
+def dec_of():
+    conn = sqlite3.connect('Celestial.db')
+    yield lambda name: conn.execute("SELECT dec FROM Celestial WHERE name = ?", (name,)).fetchone()[0]
+    conn.close()
+
+def test_winter_night_orion(dec_of):
+    res = night_visibility(*PARIS, date(2026, 1, 4), names=["M42"])
+    m42 = res["objects"][0]
+
+    assert m42["name"] == "M42"
+    # M42 passe au méridien vers minuit début janvier, à 90 - (lat - dec) degrés
+    transit = datetime.fromisoformat(m42["transit"])
+    assert transit.date() == date(2026, 1, 4) and transit.hour in (22, 23)
+    assert m42["max_alt"] == pytest.approx(90 - (48.85 - dec_of("M42")), abs=0.5)
+    assert datetime.fromisoformat(m42["rise"]) < transit < datetime.fromisoformat(m42["set"])
+    assert 0 < m42["hours_above"] <= res["dark_hours"]
+
+def test_summer_night_is_short():
+    winter = night_visibility(*PARIS, date(2026, 1, 4), limit=5)
+    summer = night_visibility(*PARIS, date(2026, 6, 21), limit=5)
+
+    assert summer["dark_hours"] < winter["dark_hours"]
+    assert len(summer["objects"]) == 5
+    hours = [o["hours_above"] for o in summer["objects"]]
+    assert hours == sorted(hours, reverse=True)
+
+def test_object_below_horizon_all_night():
+    res = night_visibility(*PARIS, date(2026, 6, 21), names=["M42"])
+    assert res["objects"][0]["hours_above"] == 0
+    assert res["objects"][0]["best_time"] is None
@@ -0,0 +1,49 @@
+import sqlite3
+import pytest
+from schema import SCHEMA_VERSION, dec_band, migrate, ra_zone, schema_version
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    # Même table que l'ancien peuple_base.py : aucune colonne typée
+    con = sqlite3.connect(tmp_path / "legacy.db", isolation_level=None)
+    con.execute("CREATE TABLE Celestial(name, type, constellation, ra, dec, magnitude, url, catalogue)")
+    con.executemany("INSERT INTO Celestial VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+        ("M42", "HII_Ionized_region", "Orion", 83.82, -5.39, 4.0, "https://x/m42.jpg", "Messier"),
+        ("M102", "Galaxy", "Draco", 226.62, 55.76, 7.9, "None", "Messier"),
+        ("NGC7000", "HII_Ionized_region", "Cygnus", 359.99, 90, None, "https://x/n.jpg", "Caldwell"),
+    ])
+    con.execute("DELETE FROM Celestial WHERE name = 'M42'") # rowids non contigus
+    yield con
+    con.close()
+
+def test_migration_keeps_rowids_and_types(legacy_db):
+    before = legacy_db.execute("SELECT rowid, name FROM Celestial ORDER BY rowid").fetchall()
+    assert migrate(legacy_db) == SCHEMA_VERSION
+
+    assert legacy_db.execute("SELECT rowid, name FROM Celestial ORDER BY rowid").fetchall() == before
+    assert legacy_db.execute("SELECT url FROM Celestial WHERE name = 'M102'").fetchone()[0] is None
+    assert legacy_db.execute("SELECT typeof(ra), typeof(dec) FROM Celestial WHERE name = 'NGC7000'").fetchone() == ("real", "real")
+
+def test_migration_is_idempotent(legacy_db):
+    migrate(legacy_db)
+    assert migrate(legacy_db) == SCHEMA_VERSION
+    assert schema_version(legacy_db) == SCHEMA_VERSION
+
+def test_zone_columns_match_python(legacy_db):
+    migrate(legacy_db)
+    for ra, dec, band, zone in legacy_db.execute("SELECT ra, dec, dec_band, ra_zone FROM Celestial"):
+        assert (band, zone) == (dec_band(dec), ra_zone(ra))
+
+def test_name_is_primary_key(legacy_db):
+    migrate(legacy_db)
+    with pytest.raises(sqlite3.IntegrityError):
+        legacy_db.execute("INSERT INTO Celestial(name, type, ra, dec, catalogue) VALUES ('M102', 'Galaxy', 1, 1, 'Messier')")
+
+def test_shipped_database_is_migrated():
+    con = sqlite3.connect("Celestial.db")
+    try:
+        assert schema_version(con) == SCHEMA_VERSION
+        plan = con.execute("EXPLAIN QUERY PLAN SELECT * FROM Celestial WHERE type = 'Galaxy'").fetchall()
+        assert "USING INDEX" in plan[0][-1]
+    finally:
+        con.close()
@@ -0,0 +1,55 @@
+import asyncio
+import json
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+from session import keep_latest_checkpoint, last_visibility, open_checkpointer, previous_state, prune_history
+
+def turn(i, with_tool=True):
+    call = {"id": f"c{i}", "name": "get_ra_dec_constraint", "args": {"city": "Paris", "time_input": f"2026-01-0{i} 22:00:00"}}
+    msgs = [HumanMessage(f"question {i}", id=f"h{i}")]
+    if with_tool:
+        msgs += [AIMessage("", tool_calls=[call], id=f"t{i}"),
+                 ToolMessage(json.dumps({"error": "", "sql_where": f"w{i}"}), tool_call_id=f"c{i}",
+                             name="get_ra_dec_constraint", id=f"r{i}")]
+    return msgs + [AIMessage(f"réponse {i}", id=f"a{i}")]
+
+def test_prune_drops_past_tool_steps_only():
+    messages = turn(1) + turn(2) + [HumanMessage("question 3", id="h3")]
+    removed = {m.id for m in prune_history(messages, max_tokens=10_000)}
+
+    assert removed == {"t1", "r1", "t2", "r2"}
+
+def test_prune_respects_budget_and_starts_on_question():
+    messages = sum((turn(i, with_tool=False) for i in range(1, 8)), []) + [HumanMessage("question 8", id="h8")]
+    removed = {m.id for m in prune_history(messages, max_tokens=40)}
+    kept = [m for m in messages if m.id not in removed]
+
+    assert "h8" not in removed and len(kept) < len(messages)
+    assert isinstance(kept[0], HumanMessage)
+    assert kept[-2].id == "a7" # Les échanges les plus récents restent
+
+def test_last_visibility_keeps_city_and_hour():
+    sky = last_visibility(turn(1) + turn(2))
+    assert sky == {"city": "Paris", "hour": "2026-01-02 22:00:00", "error": "", "sql_where": "w2"}
+    assert last_visibility([HumanMessage("salut")]) is None
+
+def test_session_keeps_state_and_one_checkpoint(tmp_path):
+    builder = StateGraph(MessagesState)
+    builder.add_node("echo", lambda state: {"messages": [AIMessage(f"{len(state['messages'])} messages")]})
+    builder.add_edge(START, "echo")
+    builder.add_edge("echo", END)
+
+    async def run():
+        async with open_checkpointer(str(tmp_path / "sessions.db")) as checkpointer:
+            graph = builder.compile(checkpointer=checkpointer)
+            config = {"configurable": {"thread_id": "s1"}}
+            for q in ("un", "deux", "trois"):
+                await graph.ainvoke({"messages": [("user", q)]}, config=config)
+                await keep_latest_checkpoint(checkpointer, "s1")
+            count = await (await checkpointer.conn.execute(
+                "SELECT COUNT(*) FROM checkpoints WHERE thread_id = 's1'")).fetchone()
+            return await previous_state(graph, "s1"), await previous_state(graph, "autre"), count[0]
+
+    state, other, checkpoints = asyncio.run(run())
+    assert state["messages"][-1].content == "5 messages"
+    assert other == {} and checkpoints == 1
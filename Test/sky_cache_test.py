@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+from sky_cache import SkyCache, twilight_state
+
+T0 = datetime(2026, 1, 4, 21, 0, 0, tzinfo=timezone.utc)
+
+def _compute(calls):
+    def compute(lat, lon, t):
+        calls.append((lat, lon, t))
+        return {"lat": lat, "lon": lon, "t": t}
+    return compute
+
+def test_same_cell_same_bucket_is_hit():
+    cache, calls = SkyCache(maxsize=10, bucket_seconds=300, cell_deg=0.1), []
+    a = cache.get_or_compute(48.8566, 2.3522, T0, _compute(calls))
+    b = cache.get_or_compute(48.8601, 2.3600, T0.replace(minute=4), _compute(calls))
+
+    assert a is b and len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_representative_point_is_cell_center():
+    cache, calls = SkyCache(cell_deg=0.1, bucket_seconds=300), []
+    cache.get_or_compute(48.8566, 2.3522, T0.replace(minute=2), _compute(calls))
+    lat, lon, t = calls[0]
+
+    assert (lat, lon) == (48.9, 2.4)
+    assert t == T0.replace(minute=2, second=30)
+
+def test_next_bucket_is_miss():
+    cache, calls = SkyCache(bucket_seconds=300), []
+    cache.get_or_compute(48.85, 2.35, T0, _compute(calls))
+    cache.get_or_compute(48.85, 2.35, T0.replace(minute=5), _compute(calls))
+    assert len(calls) == 2
+
+def test_lru_eviction():
+    cache, calls = SkyCache(maxsize=2), []
+    cache.get_or_compute(10, 10, T0, _compute(calls))
+    cache.get_or_compute(20, 20, T0, _compute(calls))
+    cache.get_or_compute(10, 10, T0, _compute(calls))   # 10/10 redevient le plus récent
+    cache.get_or_compute(30, 30, T0, _compute(calls))   # évince 20/20
+    cache.get_or_compute(10, 10, T0, _compute(calls))
+    assert len(calls) == 3
+    cache.get_or_compute(20, 20, T0, _compute(calls))
+    assert len(calls) == 4
+
+def test_twilight_state():
+    assert twilight_state(10) == "day"
+    assert twilight_state(-3) == "civil"
+    assert twilight_state(-10) == "nautical"
+    assert twilight_state(-15) == "astronomical"
+    assert twilight_state(-40) == "night"
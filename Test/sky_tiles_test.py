@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+import sky_tiles
+from catalogue import get_engine
+from ephemeris import local_sidereal_degrees
+from sky_tiles import compute_payload, data_version, horizontal, load_data, parse_lines, resolve_lines, sky_payload, stereographic
+
+NIGHT = datetime(2026, 1, 4, 21, 0, tzinfo=timezone.utc)
+
+def test_horizontal_matches_catalogue_engine():
+    engine = get_engine()
+    lst = float(local_sidereal_degrees(NIGHT.timestamp() / 86400 + 2440587.5, 2.35))
+    dec = np.degrees(np.arctan2(engine.sin_dec, engine.cos_dec))
+    alt, az = horizontal(48.85, lst, np.degrees(engine.ra_rad), dec)
+    ref_alt, ref_az = engine.altaz(48.85, lst / 15)
+    assert np.allclose(alt, ref_alt, atol=1e-9)
+    assert np.allclose(np.cos(np.radians(az - ref_az)), 1, atol=1e-9)
+
+def test_stereographic_zenith_and_horizon():
+    x, y = stereographic(np.array([90.0, 0.0, 0.0]), np.array([0.0, 0.0, 90.0]))
+    assert np.allclose([x[0], y[0]], 0)
+    assert np.allclose([x[1], y[1]], [0, 1])    # Nord en haut
+    assert np.allclose([x[2], y[2]], [-1, 0])   # Est à gauche
+
+def test_payload_is_above_horizon_and_columnar():
+    payload = compute_payload(48.85, 2.35, NIGHT)
+    assert payload["sun_alt"] < -18
+    for section in ("objects", "stars", "planets"):
+        columns = payload[section]
+        assert len({len(v) for v in columns.values()}) == 1
+        assert columns["alt"] and min(columns["alt"]) > 0
+    assert "M42" in payload["objects"]["name"]  # Orion, soir d'hiver
+    assert len(payload["lines"]["xy"]) == len(payload["lines"]["constellation"])
+
+def test_same_tile_for_nearby_requests():
+    sky_tiles.tile_cache.clear()
+    key1, first = sky_payload(48.85, 2.35, NIGHT)
+    key2, second = sky_payload(48.86, 2.34, NIGHT.replace(second=30))
+    assert key1 == key2 and first is second
+    assert sky_tiles.tile_cache.stats()["hits"] == 1
+
+def test_lines_from_stellarium_and_virtualsky(tmp_path):
+    stars = [[26311, 1.69, 84.05, -1.2], [26727, 1.74, 85.19, -1.94], [25930, 2.25, 83.0, -0.3]]
+    fab = tmp_path / "constellationship.fab"
+    fab.write_text("Ori 2 25930 26311 26311 26727\nUMa 1 1 2\n")
+    js = tmp_path / "lines_latin.json"
+    js.write_text('{"lines": [["Ori", 84, -1, 25930, 26311, 26311, 26727]]}')
+
+    expected = [["Ori", [[83.0, -0.3, 84.05, -1.2], [84.05, -1.2, 85.19, -1.94]]]]
+    assert resolve_lines(parse_lines(str(fab)), stars) == expected
+    assert resolve_lines(parse_lines(str(js)), stars) == expected
+
+def test_bright_stars_extracted_from_virtualsky():
+    stars = sky_tiles.extract_stars()
+    assert len(stars) > 700 and all(len(s) == 4 for s in stars)
+    assert any(s[0] == 32349 and s[1] < -1 for s in stars) # Sirius
+
+def test_data_version_follows_served_data(monkeypatch):
+    version = data_version()
+    assert data_version() == version
+    monkeypatch.setattr(sky_tiles, "_version", None)
+    monkeypatch.setattr(sky_tiles, "_data", {**load_data(), "mag": load_data()["mag"] + 0.1})
+    assert data_version() != version
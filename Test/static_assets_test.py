@@ -0,0 +1,43 @@
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from static_assets import PrecompressedStaticFiles, build
+
+SCRIPT = b"function sky() { return 'virtualsky'; }\n" * 50
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "lang").mkdir()
+    (tmp_path / "virtualsky.js").write_bytes(SCRIPT)
+    (tmp_path / "lang" / "fr.json").write_bytes(b'{"title": "Ciel"}')
+    (tmp_path / "index.html").write_text('<script src="/static/virtualsky.js"></script>')
+    return tmp_path
+
+def test_build_hashes_and_precompresses(static_dir):
+    manifest = build(str(static_dir), str(static_dir / "dist"))
+    hashed = manifest["virtualsky.js"]
+    dist = static_dir / "dist"
+
+    assert hashed.startswith("virtualsky.") and hashed != "virtualsky.js"
+    assert gzip.decompress((dist / (hashed + ".gz")).read_bytes()) == SCRIPT
+    assert (dist / "lang" / "fr.json").exists() and not (dist / "lang" / "fr.json.gz").exists() # Trop petit
+    assert f'"/static/dist/{hashed}"' in (dist / "index.html").read_text()
+    assert build(str(static_dir), str(dist)) == manifest # Reproductible
+
+def test_serves_variant_with_cache_headers(static_dir):
+    manifest = build(str(static_dir), str(static_dir / "dist"))
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir)))
+    client = TestClient(app)
+
+    hashed = client.get(f"/static/dist/{manifest['virtualsky.js']}", headers={"Accept-Encoding": "gzip"})
+    assert hashed.headers["content-encoding"] == "gzip" and hashed.content == SCRIPT
+    assert "immutable" in hashed.headers["cache-control"]
+    assert hashed.headers["content-type"].startswith("text/javascript")
+
+    plain = client.get("/static/dist/virtualsky.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.headers["cache-control"] == "no-cache"
+
+    etag = client.get("/static/dist/virtualsky.js", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    assert client.get("/static/dist/virtualsky.js", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
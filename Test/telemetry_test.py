@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.prebuilt import ToolNode
+from prometheus_client import REGISTRY
+from telemetry import TraceMiddleware, atool_span, span, timed, tool_span, trace_id_var
+
+def count(stage, name, metric="cosmic_stage_seconds_count"):
+    return REGISTRY.get_sample_value(metric, {"stage": stage, "name": name}) or 0
+
+def test_span_counts_calls_and_errors():
+    before, errors = count("test", "boom"), count("test", "boom", "cosmic_stage_errors_total")
+    with pytest.raises(ValueError):
+        with span("test", "boom"):
+            raise ValueError()
+
+    assert count("test", "boom") == before + 1
+    assert count("test", "boom", "cosmic_stage_errors_total") == errors + 1
+
+def test_timed_keeps_async_functions():
+    @timed("test")
+    async def double(x):
+        return 2 * x
+
+    assert asyncio.run(double(21)) == 42
+    assert count("test", "double") >= 1
+
+def test_tool_calls_are_timed():
+    @tool
+    def ping(text: str) -> str:
+        """Renvoie pong."""
+        return "pong"
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("tools", ToolNode([ping], wrap_tool_call=tool_span, awrap_tool_call=atool_span))
+    builder.add_edge(START, "tools")
+    builder.add_edge("tools", END)
+    call = AIMessage("", tool_calls=[{"id": "1", "name": "ping", "args": {"text": "x"}}])
+
+    before = count("tool", "ping")
+    result = asyncio.run(builder.compile().ainvoke({"messages": [call]}))
+    assert result["messages"][-1].content == "pong"
+    assert count("tool", "ping") == before + 1
+
+def test_trace_id_header_and_context():
+    app = FastAPI()
+    app.add_middleware(TraceMiddleware)
+
+    @app.get("/trace")
+    async def trace():
+        return {"trace_id": trace_id_var.get()}
+
+    client = TestClient(app)
+    given = client.get("/trace", headers={"X-Trace-Id": "abc"})
+    fresh = client.get("/trace")
+
+    assert given.headers["x-trace-id"] == given.json()["trace_id"] == "abc"
+    assert fresh.headers["x-trace-id"] == fresh.json()["trace_id"] != "abc"
+    assert count("request", "/trace") >= 2
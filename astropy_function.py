@@ -1,37 +1,69 @@
+import logging
 from datetime import datetime
-from astropy import units as u
-import sqlite3
-from geopy.geocoders import Nominatim
-from astropy.coordinates import EarthLocation, get_sun, AltAz, solar_system_ephemeris, get_body
-from astropy.time import Time
 from dateutil import parser
 from langchain_core.tools import tool
+from langgraph.prebuilt import InjectedState
+from typing import Annotated, Optional
 import math
+import threading
 from timezonefinder import TimezoneFinder
 import pytz
-from functools import lru_cache
+from catalogue import get_engine, visibility_prefilter
+from database import register_function
+from geocoding import get_geocoder
+from sky_cache import sky_cache, twilight_state
+from ephemeris import BODIES, solar_system_positions
+from night import night_visibility
+from telemetry import span, timed
 
-geolocator = Nominatim(user_agent="mon_astro_app_v1")
+log = logging.getLogger(__name__)
 
-@lru_cache(maxsize=128)
 def get_coordinates(city_name: str):
-    # print("Get Coords : ", city_name)
     """
     Prend un nom de ville (ex: 'Lyon') et renvoie (lat, lon).
     Renvoie None si introuvable.
+    Cache persistant, grandes villes hors ligne puis Nominatim : voir geocoding.py.
     """
-    try:
-        location = geolocator.geocode(city_name)
-        if location:
-            return location.latitude, location.longitude
-        return None
-    except Exception as e:
-        print(f"Erreur Geocoding : {e}")
+    return get_geocoder().forward(city_name)
+
+_tf = None
+_tf_lock = threading.Lock()
+
+def get_timezone_finder() -> TimezoneFinder:
+    """TimezoneFinder charge ses polygones à la construction (~1-2 s) : créé au premier besoin ou au warm-up."""
+    global _tf
+    if _tf is None:
+        with _tf_lock:
+            if _tf is None:
+                _tf = TimezoneFinder()
+    return _tf
+
+def resolve_location(city: str, coords=None, tz: Optional[str] = None) -> Optional[dict]:
+    """
+    Résout une fois pour toutes ville -> (lat, lon) -> fuseau horaire.
+    Le résultat est porté par l'état LangGraph ('location') et réutilisé
+    par les outils et les conversions d'heure de la même requête.
+    'tz' déjà connu (gazetteer) : TimezoneFinder n'est pas consulté.
+    Renvoie None si la ville est introuvable.
+    """
+    coords = coords or get_coordinates(city)
+    if not coords:
         return None
 
-tf = TimezoneFinder()
+    lat, lon = coords
+    tz_str = tz
+    if not tz_str:
+        with span("timezone", "timezone_at"):
+            tz_str = get_timezone_finder().timezone_at(lng=lon, lat=lat)
+    return {"city": city, "latitude": lat, "longitude": lon, "tz": tz_str or "UTC"}
+
+def location_for(city: str, location: Optional[dict] = None) -> Optional[dict]:
+    """Réutilise la localisation déjà résolue si elle correspond à la ville demandée."""
+    if location and (not city or (location.get("city") or "").casefold() == city.casefold()):
+        return location
+    return resolve_location(city)
 
-def format_utc_to_local_display(city: str, utc_dt: datetime) -> str:
+def format_utc_to_local_display(city: str, utc_dt: datetime, location: Optional[dict] = None) -> str:
     """
     Prend une date UTC et une ville, et renvoie l'heure locale formatée pour l'affichage.
     Ex: 2026-01-04 19:15 UTC -> "2026-01-04 20:15:00" (si Paris)
@@ -46,21 +78,19 @@ def format_utc_to_local_display(city: str, utc_dt: datetime) -> str:
     if utc_dt.tzinfo is None:
         utc_dt = pytz.utc.localize(utc_dt)
 
-    coords = get_coordinates(city)
-    if not coords:
+    location = location_for(city, location)
+    if not location:
         return utc_dt.strftime("%Y-%m-%d %H:%M:%S") + " (UTC)" # Fallback
     
-    lat, lon = coords
-    tz_str = tf.timezone_at(lng=lon, lat=lat)
-    target_tz = pytz.timezone(tz_str) if tz_str else pytz.utc
+    target_tz = pytz.timezone(location["tz"])
     
     local_dt = utc_dt.astimezone(target_tz)
 
-    print ("Format UTC -> Local (", city,",",utc_dt, " UTC) -> ", local_dt.isoformat())
+    log.debug("Format UTC -> Local (%s, %s UTC) -> %s", city, utc_dt, local_dt.isoformat())
     
     return local_dt.isoformat()
 
-def get_target_utc_date(city: str, user_input_str: str = "") -> datetime:
+def get_target_utc_date(city: str, user_input_str: str = "", location: Optional[dict] = None) -> datetime:
     """
     Transforme l'input du LLM en UTC.
     - Si input vide -> DateTime.now(UTC)
@@ -73,13 +103,8 @@ def get_target_utc_date(city: str, user_input_str: str = "") -> datetime:
         return now_utc
 
     # Récupération Timezone Cible
-    coords = get_coordinates(city)
-    if not coords:
-        target_tz = pytz.utc
-    else:
-        lat, lon = coords
-        tz_str = tf.timezone_at(lng=lon, lat=lat)
-        target_tz = pytz.timezone(tz_str) if tz_str else pytz.utc
+    location = location_for(city, location)
+    target_tz = pytz.timezone(location["tz"]) if location else pytz.utc
 
     # Le Default Context (Date du jour LOCALE)
     default_dt = now_utc.astimezone(target_tz)
@@ -100,10 +125,10 @@ def get_target_utc_date(city: str, user_input_str: str = "") -> datetime:
             final_utc = local_dt.astimezone(pytz.utc)
             
     except (ValueError, TypeError) as e:
-        print(f"🔥 Erreur parsing '{user_input_str}', fallback NOW.")
+        log.warning("Erreur parsing '%s', fallback NOW.", user_input_str)
         final_utc = now_utc
     
-    print("Get Target UTC (", city, ",",user_input_str,  ": LOCAL) -> ",final_utc ," ")
+    log.debug("Get Target UTC (%s, %s : LOCAL) -> %s", city, user_input_str, final_utc)
     return final_utc
 
 def maths_altitude(ra, dec, lat, lst, min_alt=0):
@@ -127,13 +152,47 @@ def maths_altitude(ra, dec, lat, lst, min_alt=0):
     except:
         return 0
     
-con = sqlite3.connect("Celestial.db")
-cur = con.cursor()
-con.create_function("IS_VISIBLE", 5, maths_altitude) 
-cur = con.cursor()
+register_function("IS_VISIBLE", 5, maths_altitude) # Repli SQLite si la requête n'est pas réécrite par rewrite_visibility
+
+MIN_ALTITUDE = 5 # degrés au-dessus de l'horizon
+
+@timed("astropy", "sky_state")
+def compute_sky_state(lat: float, lon: float, time_utc: datetime) -> dict:
+    """
+    Calcul Astropy de l'état du ciel pour un lieu et un instant :
+    LST, altitude du Soleil, crépuscule et rowids des objets visibles.
+    Appelé uniquement sur un défaut du sky_cache.
+    """
+    import iers_config # Tables IERS locales avant tout calcul Astropy (importé ici : démarrage rapide)
+    from astropy import units as u
+    from astropy.coordinates import AltAz, EarthLocation, get_sun
+    from astropy.time import Time
+
+    observation_time = Time(time_utc)
+    location = EarthLocation(lat=lat*u.deg, lon=lon*u.deg)
+
+    lst = observation_time.sidereal_time('mean', longitude=location.lon) # calcul du temps sidéral local (la valeur est l'ascension droite actuellement au zénith)
+    lst_hours = float(lst.to_value(u.hourangle))
+    log.debug("LST hours : %s", lst_hours)
+
+    sun = get_sun(observation_time)
+    sun_altaz = sun.transform_to(AltAz(obstime=observation_time, location=location))
+    sun_altitude = float(sun_altaz.alt.degree)
+    log.debug("Sun altitude : %s", sun_altitude)
+
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "lst_hours": lst_hours,
+        "lst_hms": str(lst.to_string(unit=u.hour, sep='hms')),
+        "sun_alt": sun_altitude,
+        "twilight": twilight_state(sun_altitude),
+        "visible_ids": get_engine().visible_ids(lat, lst_hours, MIN_ALTITUDE),
+    }
 
 @tool
-def get_ra_dec_constraint(city: str, time_input: str = "") -> str:
+def get_ra_dec_constraint(city: str, time_input: str = "",
+                          location: Annotated[Optional[dict], InjectedState("location")] = None) -> str:
     """
     Calcule les contraintes d'Ascension Droite (RA) et de Déclinaison (DEC) 
     pour une ville et une heure données.
@@ -141,45 +200,42 @@ def get_ra_dec_constraint(city: str, time_input: str = "") -> str:
         city: Le nom de la ville (ex: 'Lyon').
         time_input: L'heure au format 'YYYY-MM-DD HH:MM:SS'.
     """
-    coords = get_coordinates(city)
+    site = location_for(city, location)
 
-    if not coords:
+    if not site:
         return {"is_daytime": False, "observables": [], "error": f"City '{city}' not found"}
     
-    lat,lon = coords
-    time_utc = get_target_utc_date(city, time_input)
-    observation_time = Time(time_utc)
+    lat, lon = site["latitude"], site["longitude"]
+    time_utc = get_target_utc_date(city, time_input, site)
 
-    # print("LIEU : ", city, " HEURE UTC : ", observation_time)
+    # print("LIEU : ", city, " HEURE UTC : ", time_utc)
 
-    location = EarthLocation(lat=lat*u.deg, lon=lon*u.deg)
+    # Même cellule (~11 km) et même tranche de 5 min -> aucun calcul Astropy
+    sky = sky_cache.get_or_compute(lat, lon, time_utc, compute_sky_state)
 
-    lst = observation_time.sidereal_time('mean', longitude=location.lon) # calcul du temps sidéral local (la valeur est l'ascension droite actuellement au zénith)
-    lst_hours = lst.to_value(u.hourangle)
-    print("LST hours : ", lst_hours)
-
-    sun = get_sun(observation_time)
-    sun_altaz = sun.transform_to(AltAz(obstime=observation_time, location=location))
-    sun_altitude = sun_altaz.alt.degree
-    print (sun_altitude)
-    if sun_altitude > -6:
+    if sky["sun_alt"] > -6:
         # print("SUN IS THERE")
         return {
-            "error": f"The sun is at altitude={sun_altitude}, so nothing except it can be seen",
+            "error": f"The sun is at altitude={sky['sun_alt']}, so nothing except it can be seen",
             "sql_where": "",
-            "lst_hms": lst.to_string(unit=u.hour, sep='hms')
+            "lst_hms": sky["lst_hms"]
         }
 
     # print("SUN IS NOT THERE")
-    constraint = f""" IS_VISIBLE(ra,dec,{lat}, {lst_hours}, 5)"""
+    # Bornes dec / RA indexables d'abord : SQLite écarte la plupart des lignes avant le test exact
+    prefilter = visibility_prefilter(sky['latitude'], sky['lst_hours'], MIN_ALTITUDE)
+    constraint = f"""({prefilter} AND IS_VISIBLE(ra,dec,{sky['latitude']}, {sky['lst_hours']}, {MIN_ALTITUDE}))"""
     return {
     "error" : "",
     "sql_where": constraint,    
-    "lst_hms": lst.to_string(unit=u.hour, sep='hms')
+    "visible_count": len(sky["visible_ids"]),
+    "twilight": sky["twilight"],
+    "lst_hms": sky["lst_hms"]
 }
 
 @tool
-def get_visible_solar_system_objects(city: str, time_str: str):
+def get_visible_solar_system_objects(city: str, time_str: str,
+                                     location: Annotated[Optional[dict], InjectedState("location")] = None):
     """
     Simplifié : Renvoie un booléen 'is_daytime' et la liste 'observables'.
     Si il fait jour, la liste ne contient QUE le Soleil/Lune (si levés).
@@ -190,23 +246,23 @@ def get_visible_solar_system_objects(city: str, time_str: str):
     time_str: L'heure au format 'YYYY-MM-DD HH:MM:SS'
     """
 
-    coords = get_coordinates(city)
+    site = location_for(city, location)
 
-    if not coords:
+    if not site:
         return {"is_daytime": False, "observables": [], "error": f"City '{city}' not found"}
     
-    lat,lon = coords
-    time_utc = get_target_utc_date(city, time_str)
+    lat, lon = site["latitude"], site["longitude"]
+    time_utc = get_target_utc_date(city, time_str, site)
+    import iers_config # Tables IERS locales avant tout calcul Astropy (importé ici : démarrage rapide)
+    from astropy.time import Time
     t = Time(time_utc)
 
-    loc = EarthLocation(lat=lat*u.deg, lon=lon*u.deg)
-    
-    # 1. Check Soleil (Jour ou Nuit ?)
-    with solar_system_ephemeris.set('builtin'):
-        altaz_frame = AltAz(obstime=t, location=loc)
-        sun_obj = get_body('sun', t, loc).transform_to(altaz_frame)
-        sun_alt = float(sun_obj.alt.degree)
-        
+    # 1. Tous les corps en une passe (transformation AltAz unique, ou éphéméride analytique)
+    with span("astropy", "ephemeris"):
+        pos = solar_system_positions(t, lat, lon, BODIES)
+
+    # 2. Check Soleil (Jour ou Nuit ?)
+    sun_alt = float(pos["alt"][BODIES.index('sun')])
     is_daytime = sun_alt > -6
     
     if is_daytime:
@@ -216,31 +272,49 @@ def get_visible_solar_system_objects(city: str, time_str: str):
 
     observables = []
 
-    # 3. Calculs
-    with solar_system_ephemeris.set('builtin'):
-        for name in targets:
-
-            if name == 'sun':
-                alt, az = sun_alt, float(sun_obj.az.degree)
-                icrs = get_body('sun', t, loc) # Juste pour RA/Dec
-            else:
-                body = get_body(name, t, loc)
-                pos = body.transform_to(altaz_frame)
-                alt, az = float(pos.alt.degree), float(pos.az.degree)
-                icrs = body
-
-            if alt > 0:
-                observables.append({
-                    "name": name,
-                    "alt": round(alt, 1),
-                    "az": round(az, 1),
-                    "ra": round(float(icrs.ra.degree), 4),
-                    "dec": round(float(icrs.dec.degree), 4)
-                })
+    # 3. Filtrage
+    for name in targets:
+        i = BODIES.index(name)
+        alt, az = float(pos["alt"][i]), float(pos["az"][i])
+
+        if alt > 0:
+            observables.append({
+                "name": name,
+                "alt": round(alt, 1),
+                "az": round(az, 1),
+                "ra": round(float(pos["ra"][i]), 4),
+                "dec": round(float(pos["dec"][i]), 4)
+            })
 
     return {
         "is_daytime": is_daytime,
         "observables": observables
     }
 
+@tool
+def get_night_visibility(city: str, date: str = "", names: str = "",
+                         location: Annotated[Optional[dict], InjectedState("location")] = None):
+    """
+    Fenêtre de visibilité sur toute une nuit, en un seul appel (au lieu d'appeler
+    get_ra_dec_constraint à plusieurs heures). Pour "quand M31 est-il le plus haut ce soir ?",
+    "jusqu'à quelle heure voit-on M42 ?", "que voir le plus longtemps cette nuit ?".
+    Renvoie par objet : lever, passage au méridien, coucher, altitude max et heures visibles de nuit.
+    Args:
+        city: Le nom de la ville (ex: 'Lyon').
+        date: La date du soir au format 'YYYY-MM-DD' (vide = ce soir).
+        names: Noms d'objets séparés par des virgules (ex: 'M31,M42'), vide = meilleurs objets de la nuit.
+    """
+    site = location_for(city, location)
+
+    if not site:
+        return {"objects": [], "error": f"City '{city}' not found"}
+
+    try:
+        night = parser.parse(date).date() if date and date.strip() else None
+    except (ValueError, OverflowError):
+        return {"objects": [], "error": f"Invalid date '{date}', expected 'YYYY-MM-DD'"}
+    wanted = [n for n in names.split(",") if n.strip()] if names else None
+    return night_visibility(site["latitude"], site["longitude"], site["tz"], night,
+                            MIN_ALTITUDE, wanted, limit=None if wanted else 10)
+
 # print(get_visible_solar_system_objects(48.8566,2.3522,'2026-01-04 18:00:00'))
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+Visibilité en lot : plusieurs sites x instants, tout le catalogue, en un appel.
+
+- LST et altitude du Soleil : un seul calcul Astropy vectorisé (tableaux Time / EarthLocation)
+  pour toutes les paires (lat, lon, utc), au lieu d'un compute_sky_state par site.
+- Altitude des objets : diffusion NumPy (sites x objets), par blocs d'au plus BATCH_CHUNK_CELLS
+  cellules pour borner la mémoire.
+- Même critère que maths_altitude / get_ra_dec_constraint : rien n'est visible quand le Soleil
+  est au-dessus de SUN_LIMIT.
+"""
+import os
+from typing import Optional
+import numpy as np
+from catalogue import CatalogueEngine, get_engine
+from night import SUN_LIMIT
+
+BATCH_MAX_SITES = int(os.getenv("BATCH_MAX_SITES", 10000))
+BATCH_CHUNK_CELLS = int(os.getenv("BATCH_CHUNK_CELLS", 4_000_000))   # ~32 Mo de float64 par bloc
+
+
+def sky_states(lat, lon, utc):
+    """LST (heures) et altitude du Soleil (degrés) pour chaque (lat, lon, utc), en un seul appel Astropy."""
+    import iers_config # Tables IERS locales avant tout calcul Astropy (importé ici : démarrage rapide)
+    from astropy import units as u
+    from astropy.coordinates import AltAz, EarthLocation, get_sun
+    from astropy.time import Time
+
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+    times = utc if isinstance(utc, Time) else Time(utc, scale="utc")
+    times = times.reshape(-1) if times.shape else Time([times])
+    if not (len(lat) == len(lon) == len(times)):
+        raise ValueError("lat, lon et utc doivent avoir la même longueur")
+
+    location = EarthLocation(lat=lat * u.deg, lon=lon * u.deg)
+    lst_hours = times.sidereal_time("mean", longitude=location.lon).to_value(u.hourangle)
+    sun_alt = get_sun(times).transform_to(AltAz(obstime=times, location=location)).alt.degree
+    return np.asarray(lst_hours, dtype=np.float64), np.asarray(sun_alt, dtype=np.float64)
+
+
+def _chunks(n_sites: int, n_objects: int, chunk_cells: int):
+    step = max(1, chunk_cells // max(n_objects, 1))
+    for start in range(0, n_sites, step):
+        yield slice(start, min(start + step, n_sites))
+
+
+def batch_visibility(lat, lon, utc, min_alt: float = 5, top: Optional[int] = 10,
+                     engine: CatalogueEngine = None, chunk_cells: int = BATCH_CHUNK_CELLS):
+    """
+    Pour chaque site : LST, altitude du Soleil, nombre d'objets visibles et les 'top' plus hauts
+    (rowid, nom, altitude), triés par altitude décroissante. top=None : tous les visibles.
+    """
+    engine = engine or get_engine()
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    lst_hours, sun_alt = sky_states(lat, lon, utc)
+
+    results = []
+    for rows in _chunks(len(lat), len(engine), chunk_cells):
+        alt = engine.altitude_sites(lat[rows], lst_hours[rows])
+        alt[sun_alt[rows] > SUN_LIMIT] = -90.0        # Il fait jour : rien n'est visible
+        visible = alt > min_alt
+        counts = visible.sum(axis=1)
+        alt = np.where(visible, alt, -np.inf)
+
+        k = alt.shape[1] if top is None else min(top, alt.shape[1])
+        if 0 < k < alt.shape[1]:
+            best = np.argpartition(-alt, k - 1, axis=1)[:, :k]
+        else:
+            best = np.broadcast_to(np.arange(alt.shape[1]), alt.shape)[:, :k]
+        best_alt = np.take_along_axis(alt, best, axis=1)
+        order = np.argsort(-best_alt, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_alt = np.take_along_axis(best_alt, order, axis=1)
+
+        for i, site in enumerate(range(rows.start, rows.stop)):
+            n = int(min(counts[i], k))
+            results.append({
+                "lst_hours": round(float(lst_hours[site]), 4),
+                "sun_alt": round(float(sun_alt[site]), 2),
+                "visible_count": int(counts[i]),
+                "targets": [{"id": int(engine.ids[j]), "name": engine.names[j], "alt": round(float(a), 2)}
+                            for j, a in zip(best[i, :n], best_alt[i, :n])],
+            })
+    return results
+
+
+def visibility_matrix(lat, lon, utc, min_alt: float = 5, engine: CatalogueEngine = None,
+                      chunk_cells: int = BATCH_CHUNK_CELLS) -> np.ndarray:
+    """Matrice booléenne (sites, objets) dans l'ordre de engine.ids."""
+    engine = engine or get_engine()
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    lst_hours, sun_alt = sky_states(lat, lon, utc)
+
+    matrix = np.zeros((len(lat), len(engine)), dtype=bool)
+    threshold = np.sin(np.radians(min_alt))
+    for rows in _chunks(len(lat), len(engine), chunk_cells):
+        matrix[rows] = engine.sin_alt_sites(lat[rows], lst_hours[rows]) > threshold
+    matrix[sun_alt > SUN_LIMIT] = False
+    return matrix
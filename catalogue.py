@@ -0,0 +1,236 @@
+import json
+import re
+import threading
+import math
+from typing import Tuple
+import numpy as np
+from database import DB_PATH, get_pool
+from schema import DEC_BAND_DEG, DEC_BANDS
+
+
+# IS_VISIBLE(ra, dec, <lat>, <lst>, <min_alt>) tel qu'émis par get_ra_dec_constraint,
+# colonnes éventuellement préfixées par l'alias de Celestial (c.ra, c.dec) si le LLM l'a aliasée
+_NUM = r"([-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)"
+IS_VISIBLE_RE = re.compile(
+    rf"IS_VISIBLE\s*\(\s*(?:(\w+)\s*\.\s*)?ra\s*,\s*(?:\w+\s*\.\s*)?dec\s*,\s*{_NUM}\s*,\s*{_NUM}\s*,\s*{_NUM}\s*\)",
+    re.IGNORECASE,
+)
+
+
+PREFILTER_MARGIN = 0.5 # degrés de marge sur les bornes (arrondis, LST de la tranche de cache)
+
+
+def _max_hour_angle(lat: float, dec_lo: float, dec_hi: float, min_alt: float) -> float:
+    """
+    Plus grand angle horaire |H| (degrés) auquel un objet de déclinaison dans [dec_lo, dec_hi]
+    peut être au-dessus de min_alt. 180 si une partie de la bande est circumpolaire.
+    cos H > c(dec) = (sin h - sin lat sin dec) / (cos lat cos dec) ; c est monotone sur la bande
+    sauf en dec* = asin(sin lat / sin h), donc le minimum est aux bornes ou en dec*.
+    """
+    phi, h = math.radians(lat), math.radians(min_alt)
+    if abs(math.cos(phi)) < 1e-9:
+        return 180.0
+    candidates = [dec_lo, dec_hi]
+    if abs(math.sin(phi)) < abs(math.sin(h)):
+        star = math.degrees(math.asin(math.sin(phi) / math.sin(h)))
+        if dec_lo < star < dec_hi:
+            candidates.append(star)
+    c_min = 1.0
+    for dec in candidates:
+        d = math.radians(max(-89.999999, min(89.999999, dec)))
+        c = (math.sin(h) - math.sin(phi) * math.sin(d)) / (math.cos(phi) * math.cos(d))
+        c_min = min(c_min, c)
+    if c_min <= -1:
+        return 180.0
+    return math.degrees(math.acos(min(c_min, 1.0)))
+
+
+def visibility_prefilter(lat: float, lst_hours: float, min_alt: float) -> str:
+    """
+    Prédicats SQL indexables, toujours vrais pour un objet visible (sur-ensemble de IS_VISIBLE) :
+      - dec BETWEEN : un objet ne passe au-dessus de min_alt que si |lat - dec| < 90 - min_alt
+      - par bande de déclinaison (colonne dec_band) : fenêtre d'ascension droite LST ± H_max,
+        découpée en deux intervalles quand elle franchit 0/360.
+    Renvoie "0" si aucune déclinaison n'est atteignable.
+    """
+    dec_min = max(-90.0, lat - 90 + min_alt - PREFILTER_MARGIN)
+    dec_max = min(90.0, lat + 90 - min_alt + PREFILTER_MARGIN)
+    if dec_min > dec_max:
+        return "0"
+    lst_deg = (lst_hours * 15) % 360
+
+    clauses, full_bands = [], []
+    first = int((dec_min + 90) // DEC_BAND_DEG)
+    last = min(int((dec_max + 90) // DEC_BAND_DEG), DEC_BANDS - 1)
+    for band in range(first, last + 1):
+        lo = max(dec_min, band * DEC_BAND_DEG - 90)
+        hi = min(dec_max, (band + 1) * DEC_BAND_DEG - 90)
+        half = _max_hour_angle(lat, lo, hi, min_alt) + PREFILTER_MARGIN
+        if half >= 180:
+            full_bands.append(band)
+            continue
+        start = math.floor((lst_deg - half) % 360 * 10) / 10
+        end = math.ceil((lst_deg + half) % 360 * 10) / 10
+        if start <= end:
+            clauses.append(f"(dec_band = {band} AND ra BETWEEN {start:g} AND {end:g})")
+        else:
+            clauses.append(f"(dec_band = {band} AND (ra >= {start:g} OR ra <= {end:g}))")
+
+    if full_bands:
+        clauses.append(f"dec_band BETWEEN {full_bands[0]} AND {full_bands[-1]}"
+                       if full_bands == list(range(full_bands[0], full_bands[-1] + 1))
+                       else f"dec_band IN ({','.join(map(str, full_bands))})")
+
+    dec_clause = f"dec BETWEEN {math.floor(dec_min * 10) / 10:g} AND {math.ceil(dec_max * 10) / 10:g}"
+    return f"{dec_clause} AND ({' OR '.join(clauses)})"
+
+
+class CatalogueEngine:
+    """
+    Charge la table Celestial une seule fois en tableaux NumPy contigus
+    et calcule altitude/azimut de tous les objets en une seule passe.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        rows = get_pool(db_path).rows(
+            "SELECT rowid, name, ra, dec FROM Celestial WHERE ra IS NOT NULL AND dec IS NOT NULL"
+        )
+
+        self.ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.names = [r[1] for r in rows]
+        self.ra_rad = np.radians(np.array([r[2] for r in rows], dtype=np.float64))
+        dec_rad = np.radians(np.array([r[3] for r in rows], dtype=np.float64))
+        self.sin_dec = np.sin(dec_rad)
+        self.cos_dec = np.cos(dec_rad)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _sin_alt(self, lat: float, lst_hours: float):
+        lat_rad = np.radians(lat)
+        ha = np.radians(lst_hours * 15) - self.ra_rad
+        sin_alt = np.sin(lat_rad) * self.sin_dec + np.cos(lat_rad) * self.cos_dec * np.cos(ha)
+        return sin_alt, ha
+
+    @staticmethod
+    def _azimuth(lat: float, ha, sin_dec, cos_dec):
+        # Azimut compté depuis le Nord vers l'Est
+        lat_rad = np.radians(lat)
+        return np.degrees(np.arctan2(
+            -cos_dec * np.sin(ha),
+            sin_dec * np.cos(lat_rad) - cos_dec * np.sin(lat_rad) * np.cos(ha),
+        )) % 360
+
+    def altaz(self, lat: float, lst_hours: float):
+        """Renvoie (altitude, azimut) en degrés pour tout le catalogue."""
+        sin_alt, ha = self._sin_alt(lat, lst_hours)
+        alt = np.degrees(np.arcsin(np.clip(sin_alt, -1.0, 1.0)))
+        return alt, self._azimuth(lat, ha, self.sin_dec, self.cos_dec)
+
+    def altitude_grid(self, lat: float, lst_hours):
+        """Altitude (degrés) de tout le catalogue sur une série de LST : tableau (objets, instants)."""
+        lat_rad = np.radians(lat)
+        ha = np.radians(np.asarray(lst_hours, dtype=np.float64) * 15)[None, :] - self.ra_rad[:, None]
+        sin_alt = np.sin(lat_rad) * self.sin_dec[:, None] + np.cos(lat_rad) * self.cos_dec[:, None] * np.cos(ha)
+        return np.degrees(np.arcsin(np.clip(sin_alt, -1.0, 1.0)))
+
+    def sin_alt_sites(self, lat, lst_hours):
+        """sin(altitude) de tout le catalogue pour une série de sites (lat, LST) : tableau (sites, objets)."""
+        lat_rad = np.radians(np.asarray(lat, dtype=np.float64))[:, None]
+        ha = np.radians(np.asarray(lst_hours, dtype=np.float64) * 15)[:, None] - self.ra_rad[None, :]
+        return np.sin(lat_rad) * self.sin_dec[None, :] + np.cos(lat_rad) * self.cos_dec[None, :] * np.cos(ha)
+
+    def altitude_sites(self, lat, lst_hours):
+        """Altitude (degrés) de tout le catalogue pour une série de sites : tableau (sites, objets)."""
+        return np.degrees(np.arcsin(np.clip(self.sin_alt_sites(lat, lst_hours), -1.0, 1.0)))
+
+    def visible_mask(self, lat: float, lst_hours: float, min_alt: float = 0):
+        """Même critère que maths_altitude (sin(alt) > sin(min_alt)), pour tout le catalogue."""
+        sin_alt, _ = self._sin_alt(lat, lst_hours)
+        return sin_alt > np.sin(np.radians(min_alt))
+
+    def visible(self, lat: float, lst_hours: float, min_alt: float = 0):
+        """
+        Renvoie le sous-ensemble visible : rowids, noms, altitude et azimut (degrés),
+        trié par altitude décroissante.
+        """
+        sin_alt, ha = self._sin_alt(lat, lst_hours)
+        idx = np.flatnonzero(sin_alt > np.sin(np.radians(min_alt)))
+        alt = np.degrees(np.arcsin(np.clip(sin_alt[idx], -1.0, 1.0)))
+        az = self._azimuth(lat, ha[idx], self.sin_dec[idx], self.cos_dec[idx])
+        order = np.argsort(-alt)
+        idx = idx[order]
+        return {
+            "ids": self.ids[idx],
+            "names": [self.names[i] for i in idx],
+            "alt": alt[order],
+            "az": az[order],
+        }
+
+    def visible_ids(self, lat: float, lst_hours: float, min_alt: float = 0):
+        return self.ids[self.visible_mask(lat, lst_hours, min_alt)]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> CatalogueEngine:
+    """Singleton paresseux : le catalogue n'est lu qu'une fois par processus."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = CatalogueEngine()
+    return _engine
+
+
+def join_targets(targets, db_path: str = DB_PATH):
+    """
+    Le LLM ne renvoie que des noms : on rattache à chaque cible l'enregistrement complet
+    de la base (ra, dec, type, constellation, magnitude, url). Les cibles absentes de la base
+    (planètes, Lune) sont gardées telles quelles avec les coordonnées fournies par leur outil.
+    """
+    targets = [t if isinstance(t, dict) else {"label": str(t)} for t in targets or []]
+    keys = {t.get("label"): re.sub(r"\s+", "", str(t.get("label") or "")) for t in targets}
+    wanted = {k.casefold() for k in keys.values() if k}
+    if not wanted:
+        return targets
+
+    marks = ",".join("?" * len(wanted))
+    records = {r["name"].casefold(): r for r in get_pool(db_path).query(
+        "SELECT name, type, constellation, ra, dec, magnitude, url FROM Celestial "
+        f"WHERE lower(replace(name, ' ', '')) IN ({marks})", tuple(wanted))}
+
+    joined = []
+    for t in targets:
+        record = records.get(keys[t.get("label")].casefold())
+        if record is None:
+            joined.append(t)
+            continue
+        joined.append({**t, "label": record["name"], "ra": record["ra"], "dec": record["dec"],
+                       "type": record["type"], "constellation": record["constellation"],
+                       "magnitude": record["magnitude"], "url": record["url"]})
+    return joined
+
+
+def rewrite_visibility(query: str, engine: CatalogueEngine = None) -> Tuple[str, dict]:
+    """
+    Remplace chaque IS_VISIBLE(ra,dec,lat,lst,min_alt) de la requête par
+    '<alias>.rowid IN (SELECT value FROM json_each(:visible_N))', les rowids visibles
+    (calculés en une passe NumPy) étant liés en paramètre : SQLite n'appelle plus la
+    fonction Python ligne par ligne, et le texte SQL reste court quel que soit le ciel.
+    Renvoie (sql, paramètres nommés).
+    """
+    engine = engine or get_engine()
+    params = {}
+
+    def _replace(match):
+        alias = match.group(1)
+        lat, lst, min_alt = (float(g) for g in match.groups()[1:])
+        name = f"visible_{len(params)}"
+        params[name] = json.dumps(engine.visible_ids(lat, lst, min_alt).tolist())
+        rowid = f"{alias}.rowid" if alias else "rowid"
+        return f"{rowid} IN (SELECT value FROM json_each(:{name}))"
+
+    return IS_VISIBLE_RE.sub(_replace, query), params
@@ -0,0 +1,145 @@
+"""
+Accès en lecture seule au catalogue (Celestial.db), partagé par l'outil SQL, le chemin rapide et le serveur.
+
+- Connexions ouvertes en 'file:...?mode=ro&immutable=1' : aucun verrou de fichier, aucune
+  vérification de changement. Une base modifiée (schema.py, ingest.py) demande un redémarrage.
+- PRAGMA mmap_size : lecture des pages par projection mémoire plutôt que par read().
+- Pool borné de connexions réutilisées entre threads (une connexion n'est utilisée que par un
+  thread à la fois) ; les UDF enregistrées avec register_function sont ajoutées à chaque connexion.
+- Résultats structurés (liste de dict ou de tuples), pas de représentation texte.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import quote
+from telemetry import span
+
+DB_PATH = "Celestial.db"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))     # secondes d'attente d'une connexion libre
+
+_functions: Dict[str, Tuple[int, Callable]] = {}
+
+
+def register_function(name: str, n_args: int, func: Callable):
+    """UDF SQLite ajoutée à toutes les connexions du pool (existantes et futures)."""
+    _functions[name] = (n_args, func)
+    for pool in list(_pools.values()):
+        pool.reset()
+
+
+class ReadOnlyPool:
+    def __init__(self, path: str = DB_PATH, size: int = DB_POOL_SIZE, mmap_size: int = DB_MMAP_SIZE):
+        self.path = path
+        self.size = size
+        self.mmap_size = mmap_size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        uri = f"file:{quote(os.path.abspath(self.path))}?mode=ro&immutable=1"
+        con = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        con.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        con.execute("PRAGMA query_only = 1")
+        for name, (n_args, func) in _functions.items():
+            con.create_function(name, n_args, func, deterministic=True)
+        return con
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                generation = self._generation
+                try:
+                    return generation, self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=DB_POOL_TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError(f"Aucune connexion libre vers {self.path} après {DB_POOL_TIMEOUT} s")
+
+    def _release(self, item):
+        generation, con = item
+        if generation != self._generation:
+            # Connexion d'avant un register_function : on la remplace
+            con.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(item)
+
+    @contextmanager
+    def connection(self):
+        item = self._acquire()
+        try:
+            yield item[1]
+        finally:
+            self._release(item)
+
+    def rows(self, sql: str, params=()) -> List[tuple]:
+        with span("sql", "rows"), self.connection() as con:
+            return con.execute(sql, params).fetchall()
+
+    def query(self, sql: str, params=()) -> List[dict]:
+        """Lignes sous forme de dict {colonne: valeur}."""
+        with span("sql", "query"), self.connection() as con:
+            cursor = con.execute(sql, params)
+            columns = [c[0] for c in cursor.description or []]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def compact(self, sql: str, params=(), max_rows: int = 25, hidden=(), decimals: int = 2) -> dict:
+        """
+        Résultat compact pour un LLM : colonnes de 'hidden' retirées, flottants arrondis,
+        au plus max_rows lignes (fetchmany : le reste n'est jamais lu).
+        {"columns": [...], "rows": [[...], ...], "truncated": bool}
+        """
+        with span("sql", "compact"), self.connection() as con:
+            cursor = con.execute(sql, params)
+            columns = [c[0] for c in cursor.description or []]
+            rows = cursor.fetchmany(max_rows + 1)
+        keep = [i for i, c in enumerate(columns) if c not in hidden]
+        return {
+            "columns": [columns[i] for i in keep],
+            "rows": [[round(row[i], decimals) if isinstance(row[i], float) else row[i] for i in keep]
+                     for row in rows[:max_rows]],
+            "truncated": len(rows) > max_rows,
+        }
+
+    def reset(self):
+        """Ferme les connexions inactives ; celles en cours d'utilisation sont fermées à leur retour."""
+        with self._lock:
+            self._generation += 1
+        while True:
+            try:
+                _, con = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            con.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pools: Dict[str, ReadOnlyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path: str = DB_PATH) -> ReadOnlyPool:
+    """Un pool par fichier, créé à la première demande."""
+    key = os.path.abspath(path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(key, ReadOnlyPool(path))
+    return pool
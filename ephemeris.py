@@ -0,0 +1,207 @@
+"""
+Éphémérides du Système solaire pour get_visible_solar_system_objects.
+
+Deux modes :
+- 'builtin'  : éphéméride intégrée d'Astropy, mais tous les corps sont
+               concaténés et passés en AltAz en UNE seule transformation.
+- 'analytic' : éléments orbitaux moyens + perturbations principales
+               (méthode de P. Schlyter), entièrement en NumPy, précision
+               de l'ordre de la minute d'arc. Vectorisé sur corps x instants.
+"""
+import os
+import numpy as np
+
+EPHEMERIS_MODE = os.getenv("EPHEMERIS_MODE", "builtin")  # 'builtin' ou 'analytic'
+
+BODIES = ['sun', 'moon', 'mercury', 'venus', 'mars', 'jupiter', 'saturn', 'uranus', 'neptune']
+
+DELTA_T = 69.2               # TT - UTC (s), suffisant à l'échelle de la minute d'arc
+EARTH_RADIUS_AU = 4.26352e-5
+J2000 = 2451545.0
+
+# Éléments orbitaux : (N, i, w, a, e, M), chacun (valeur à d=0, dérive par jour)
+# a en UA (rayons terrestres pour la Lune), angles en degrés
+ELEMENTS = {
+    'sun':     ((0.0, 0.0), (0.0, 0.0), (282.9404, 4.70935e-5), (1.0, 0.0), (0.016709, -1.151e-9), (356.0470, 0.9856002585)),
+    'moon':    ((125.1228, -0.0529538083), (5.1454, 0.0), (318.0634, 0.1643573223), (60.2666, 0.0), (0.054900, 0.0), (115.3654, 13.0649929509)),
+    'mercury': ((48.3313, 3.24587e-5), (7.0047, 5.00e-8), (29.1241, 1.01444e-5), (0.387098, 0.0), (0.205635, 5.59e-10), (168.6562, 4.0923344368)),
+    'venus':   ((76.6799, 2.46590e-5), (3.3946, 2.75e-8), (54.8910, 1.38374e-5), (0.723330, 0.0), (0.006773, -1.302e-9), (48.0052, 1.6021302244)),
+    'mars':    ((49.5574, 2.11081e-5), (1.8497, -1.78e-8), (286.5016, 2.92961e-5), (1.523688, 0.0), (0.093405, 2.516e-9), (18.6021, 0.5240207766)),
+    'jupiter': ((100.4542, 2.76854e-5), (1.3030, -1.557e-7), (273.8777, 1.64505e-5), (5.20256, 0.0), (0.048498, 4.469e-9), (19.8950, 0.0830853001)),
+    'saturn':  ((113.6634, 2.38980e-5), (2.4886, -1.081e-7), (339.3939, 2.97661e-5), (9.55475, 0.0), (0.055546, -9.499e-9), (316.9670, 0.0334442282)),
+    'uranus':  ((74.0005, 1.3978e-5), (0.7733, 1.9e-8), (96.6612, 3.0565e-5), (19.18171, -1.55e-8), (0.047318, 7.45e-9), (142.5905, 0.011725806)),
+    'neptune': ((131.7806, 3.0173e-5), (1.7700, -2.55e-7), (272.8461, -6.027e-6), (30.05826, 3.313e-8), (0.008606, 2.15e-9), (260.2471, 0.005995147)),
+}
+
+
+def _sind(x):
+    return np.sin(np.radians(x))
+
+
+def _cosd(x):
+    return np.cos(np.radians(x))
+
+
+def _elements(name, d):
+    return [v0 + rate * d for v0, rate in ELEMENTS[name]]
+
+
+def _kepler(M, e):
+    """Résout E - e sin E = M (radians), Newton vectorisé."""
+    E = M + e * np.sin(M) * (1.0 + e * np.cos(M))
+    for _ in range(6):
+        E = E - (E - e * np.sin(E) - M) / (1.0 - e * np.cos(E))
+    return E
+
+
+def _ecliptic(name, d):
+    """Longitude, latitude (degrés) et distance écliptiques de date (héliocentriques, géocentriques pour Lune/Soleil)."""
+    N, i, w, a, e, M = _elements(name, d)
+    E = _kepler(np.radians(M % 360), e)
+    xv = a * (np.cos(E) - e)
+    yv = a * np.sqrt(1.0 - e * e) * np.sin(E)
+    v = np.degrees(np.arctan2(yv, xv))
+    r = np.hypot(xv, yv)
+
+    xh = r * (_cosd(N) * _cosd(v + w) - _sind(N) * _sind(v + w) * _cosd(i))
+    yh = r * (_sind(N) * _cosd(v + w) + _cosd(N) * _sind(v + w) * _cosd(i))
+    zh = r * (_sind(v + w) * _sind(i))
+    lon = np.degrees(np.arctan2(yh, xh))
+    lat = np.degrees(np.arctan2(zh, np.hypot(xh, yh)))
+    return lon, lat, r
+
+
+def _perturbations(name, lon, lat, r, d):
+    Mj = 19.8950 + 0.0830853001 * d
+    Ms = 316.9670 + 0.0334442282 * d
+    Mu = 142.5905 + 0.011725806 * d
+
+    if name == 'moon':
+        N, _, w, _, _, Mm = _elements('moon', d)
+        _, _, ws, _, _, Msun = _elements('sun', d)
+        Lm, Ls = Mm + w + N, Msun + ws
+        D, F = Lm - Ls, Lm - N
+        lon = lon + (-1.274 * _sind(Mm - 2 * D) + 0.658 * _sind(2 * D) - 0.186 * _sind(Msun)
+                     - 0.059 * _sind(2 * Mm - 2 * D) - 0.057 * _sind(Mm - 2 * D + Msun)
+                     + 0.053 * _sind(Mm + 2 * D) + 0.046 * _sind(2 * D - Msun) + 0.041 * _sind(Mm - Msun)
+                     - 0.035 * _sind(D) - 0.031 * _sind(Mm + Msun) - 0.015 * _sind(2 * F - 2 * D)
+                     + 0.011 * _sind(Mm - 4 * D))
+        lat = lat + (-0.173 * _sind(F - 2 * D) - 0.055 * _sind(Mm - F - 2 * D) - 0.046 * _sind(Mm + F - 2 * D)
+                     + 0.033 * _sind(F + 2 * D) + 0.017 * _sind(2 * Mm + F))
+        r = r + (-0.58 * _cosd(Mm - 2 * D) - 0.46 * _cosd(2 * D))
+    elif name == 'jupiter':
+        lon = lon + (-0.332 * _sind(2 * Mj - 5 * Ms - 67.6) - 0.056 * _sind(2 * Mj - 2 * Ms + 21)
+                     + 0.042 * _sind(3 * Mj - 5 * Ms + 21) - 0.036 * _sind(Mj - 2 * Ms)
+                     + 0.022 * _cosd(Mj - Ms) + 0.023 * _sind(2 * Mj - 3 * Ms + 52)
+                     - 0.016 * _sind(Mj - 5 * Ms - 69))
+    elif name == 'saturn':
+        lon = lon + (0.812 * _sind(2 * Mj - 5 * Ms - 67.6) - 0.229 * _cosd(2 * Mj - 4 * Ms - 2)
+                     + 0.119 * _sind(Mj - 2 * Ms - 3) + 0.046 * _sind(2 * Mj - 6 * Ms - 69)
+                     + 0.014 * _sind(Mj - 3 * Ms + 32))
+        lat = lat + (-0.020 * _cosd(2 * Mj - 4 * Ms - 2) + 0.018 * _sind(2 * Mj - 6 * Ms - 49))
+    elif name == 'uranus':
+        lon = lon + (0.040 * _sind(Ms - 2 * Mu + 6) + 0.035 * _sind(Ms - 3 * Mu + 33)
+                     - 0.015 * _sind(Mj - Mu + 20))
+    return lon, lat, r
+
+
+def _rect(lon, lat, r):
+    return np.stack([r * _cosd(lon) * _cosd(lat), r * _sind(lon) * _cosd(lat), r * _sind(lat)])
+
+
+def _rot_x(vec, angle_deg):
+    x, y, z = vec
+    c, s = _cosd(angle_deg), _sind(angle_deg)
+    return np.stack([x, y * c - z * s, y * s + z * c])
+
+
+def local_sidereal_degrees(jd_utc, lon):
+    """Temps sidéral local moyen (degrés), UT1 ~ UTC."""
+    t = (jd_utc - J2000) / 36525.0
+    gmst = 280.46061837 + 360.98564736629 * (jd_utc - J2000) + 0.000387933 * t * t
+    return (gmst + lon) % 360
+
+
+def analytic_positions(jd_utc, lat, lon, names=BODIES):
+    """
+    Positions topocentriques de plusieurs corps pour un ou plusieurs instants (JD UTC).
+    Renvoie un dict de tableaux (n_corps, n_instants) : ra, dec (J2000, degrés), alt, az (degrés).
+    """
+    jd_utc = np.atleast_1d(np.asarray(jd_utc, dtype=np.float64))
+    d = jd_utc + DELTA_T / 86400.0 - 2451543.5
+    ecl = 23.4393 - 3.563e-7 * d
+
+    sun_lon, _, sun_r = _ecliptic('sun', d)
+    sun_geo = _rect(sun_lon, np.zeros_like(d), sun_r)
+
+    vecs = []
+    for name in names:
+        lon_b, lat_b, r_b = _perturbations(name, *_ecliptic(name, d), d)
+        if name == 'sun':
+            vecs.append(sun_geo)
+        elif name == 'moon':
+            vecs.append(_rect(lon_b, lat_b, r_b * EARTH_RADIUS_AU))
+        else:
+            vecs.append(_rect(lon_b, lat_b, r_b) + sun_geo)
+    geo_ecl = np.stack(vecs, axis=1)                       # (3, n_corps, n_instants)
+    geo_eq = _rot_x(geo_ecl, ecl)
+
+    # Parallaxe : position de l'observateur (équatoriale de date, UA)
+    lst = local_sidereal_degrees(jd_utc, lon)
+    gclat = lat - 0.1924 * _sind(2 * lat)
+    rho = (0.99833 + 0.00167 * _cosd(2 * lat)) * EARTH_RADIUS_AU
+    obs = np.stack([rho * _cosd(gclat) * _cosd(lst), rho * _cosd(gclat) * _sind(lst),
+                    rho * _sind(gclat) * np.ones_like(lst)])
+    topo = geo_eq - obs[:, None, :]
+
+    x, y, z = topo
+    ra_date = np.degrees(np.arctan2(y, x)) % 360
+    dec_date = np.degrees(np.arctan2(z, np.hypot(x, y)))
+
+    ha = lst - ra_date
+    sin_alt = _sind(lat) * _sind(dec_date) + _cosd(lat) * _cosd(dec_date) * _cosd(ha)
+    alt = np.degrees(np.arcsin(np.clip(sin_alt, -1.0, 1.0)))
+    az = np.degrees(np.arctan2(-_cosd(dec_date) * _sind(ha),
+                               _sind(dec_date) * _cosd(lat) - _cosd(dec_date) * _sind(lat) * _cosd(ha))) % 360
+
+    # Retour à J2000 : précession en longitude écliptique (~1.4° par siècle)
+    topo_ecl = _rot_x(topo, -ecl)
+    lon_e = np.degrees(np.arctan2(topo_ecl[1], topo_ecl[0])) - 3.82394e-5 * d
+    lat_e = np.degrees(np.arctan2(topo_ecl[2], np.hypot(topo_ecl[0], topo_ecl[1])))
+    x2, y2, z2 = _rot_x(_rect(lon_e, lat_e, 1.0), 23.4393)
+    ra = np.degrees(np.arctan2(y2, x2)) % 360
+    dec = np.degrees(np.arctan2(z2, np.hypot(x2, y2)))
+
+    return {"names": list(names), "ra": ra, "dec": dec, "alt": alt, "az": az}
+
+
+def builtin_positions(t, location, names=BODIES):
+    """
+    Éphéméride intégrée d'Astropy, tous les corps en une seule transformation AltAz.
+    Renvoie les mêmes clés que analytic_positions (tableaux 1-D, un élément par corps).
+    """
+    from astropy.coordinates import AltAz, concatenate, get_body, solar_system_ephemeris
+
+    with solar_system_ephemeris.set('builtin'):
+        bodies = concatenate([get_body(name, t, location) for name in names])
+        altaz = bodies.transform_to(AltAz(obstime=t, location=location))
+
+    return {
+        "names": list(names),
+        "ra": np.asarray(bodies.ra.degree),
+        "dec": np.asarray(bodies.dec.degree),
+        "alt": np.asarray(altaz.alt.degree),
+        "az": np.asarray(altaz.az.degree),
+    }
+
+
+def solar_system_positions(t, lat, lon, names=BODIES, mode=None):
+    """Point d'entrée : positions de tous les corps demandés pour un instant (astropy Time)."""
+    mode = mode or EPHEMERIS_MODE
+    if mode == 'analytic':
+        pos = analytic_positions(t.utc.jd, lat, lon, names)
+        return {k: (v[:, 0] if k != "names" else v) for k, v in pos.items()}
+
+    from astropy import units as u
+    from astropy.coordinates import EarthLocation
+    return builtin_positions(t, EarthLocation(lat=lat * u.deg, lon=lon * u.deg), names)
@@ -0,0 +1,241 @@
+"""
+Chemin rapide déterministe : reconnaît les questions de visibilité les plus
+fréquentes et y répond sans passer par la boucle astronome -> outils -> astronome.
+Toute question qui sort des modèles ci-dessous retourne None et suit le chemin LLM.
+"""
+import json
+import os
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+import pytz
+from database import DB_PATH, get_pool
+from gazetteer import get_gazetteer
+from geocache import SEED_CITIES_PATH, normalize_city
+from sky_cache import sky_cache
+
+CALDWELL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Archive", "caldwell.json")
+FAST_PATH_LIMIT = 7
+TONIGHT_HOUR = 22 # "ce soir" sans heure précise -> 22h locale
+
+VISIBILITY = r"(voir|voi[st]|visible|observ|montr|tonight|see|what can|ce soir|cette nuit|maintenant|now|en ce moment|actuellement)"
+TONIGHT = r"(ce soir|cette nuit|tonight)"
+# Tout ce qui touche au temps autrement que "maintenant / ce soir" part au LLM
+OTHER_TIME = r"(\d+\s?h\b|\d{1,2}:\d{2}|demain|tomorrow|hier|yesterday|matin|morning|semaine|week|lundi|mardi|mercredi|jeudi|vendredi|samedi|dimanche|janvier|février|mars\b|avril|mai\b|juin|juillet|août|septembre|octobre|novembre|décembre|heure|hour)"
+# Planètes, Lune, Soleil : outil dédié via le LLM
+SOLAR_SYSTEM = r"(plan[eè]te|planet|lune|moon|soleil|sun\b|mercure|mercury|v[eé]nus|jupiter|saturne|saturn|uranus|neptune|mars\b)"
+EDUCATION = r"(c'est quoi|qu'est ce|qu'est-ce que c|expliqu|pourquoi|why|raconte|histoir|comment|how)"
+# Dénombrement et négation : le chemin rapide ne sait que lister des objets visibles
+COUNT_OR_NEGATION = r"(combien|how many|\bne\b.*\bpas\b|\bn'\w+\s+pas\b|\bnot\b|n't\b|invisible)"
+# Préposition de lieu suivie d'un nom propre (majuscule) ou, en minuscules, d'une ville connue
+LOCATION_PREPOSITION = r"\b(à|a|au|aux|en|in|at|depuis|from)\s+"
+ELSEWHERE = LOCATION_PREPOSITION + r"[A-ZÀ-Ý][\w\-']+"
+PLACE_WORDS = LOCATION_PREPOSITION + r"([\w\-']+(?:\s+[\w\-']+){0,2})"
+NOT_PLACES = {"mon", "ma", "mes", "ton", "ta", "tes", "son", "sa", "ses", "notre", "votre", "leur",
+              "my", "your", "our", "the", "le", "la", "les", "un", "une", "ce", "cette"}
+
+DISCOVER = r"(que (puis-je|peut-on|pourrais-je|voir)|qu'est-ce que (je peux|l'on peut|on peut) voir|quoi (voir|observer)|what can i see|what's visible|what is visible|que voir|les plus beaux|plus belles)"
+DESIGNATION = r"\b(m|ngc|ic|c)\s?(\d{1,4})\b"
+
+TYPES = [
+    (r"n[ée]buleuses? plan[ée]taires?|planetary nebula", ["Planetary_Nebula"]),
+    (r"n[ée]buleuses?|nebula[es]?|nebulas", ["Nebula", "Planetary_Nebula", "Reflection_Nebula", "HII_Ionized_region",
+                                             "Star_cluster_+_Nebula", "Supernova_remnant", "Dark_Nebula"]),
+    (r"galax", ["Galaxy"]),
+    (r"amas globulaires?|globular", ["Globular_Cluster"]),
+    (r"amas ouverts?|open clusters?", ["Open_Cluster"]),
+    (r"\bamas\b|clusters?", ["Open_Cluster", "Globular_Cluster", "Star_cluster_+_Nebula"]),
+]
+
+# Noms français courants -> nom latin stocké dans Celestial.constellation
+CONSTELLATIONS_FR = {
+    "cassiopee": "Cassiopeia", "sagittaire": "Sagittarius", "scorpion": "Scorpius", "taureau": "Taurus",
+    "gemeaux": "Gemini", "cygne": "Cygnus", "lyre": "Lyra", "grande ourse": "Ursa Major",
+    "vierge": "Virgo", "lion": "Leo", "verseau": "Aquarius", "capricorne": "Capricornus",
+    "cocher": "Auriga", "persee": "Perseus", "petit renard": "Vulpecula", "chevelure de berenice": "Coma Berenices",
+    "chiens de chasse": "Canes Venatici", "grand chien": "Canis Major", "licorne": "Monoceros",
+    "poissons": "Pisces", "baleine": "Cetus", "lievre": "Lepus", "dragon": "Draco", "hydre": "Hydra",
+    "ecu de sobieski": "Scutum", "serpent": "Serpens", "croix du sud": "Crux", "carene": "Carina",
+    "centaure": "Centaurus", "voiles": "Vela", "poupe": "Puppis", "cancer": "Cancer", "orion": "Orion",
+}
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def _load_caldwell():
+    try:
+        with open(CALDWELL_PATH) as f:
+            return {k.upper(): v for k, v in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+CALDWELL = _load_caldwell()
+
+
+@lru_cache(maxsize=1)
+def known_constellations():
+    return tuple(r[0] for r in get_pool().rows("SELECT DISTINCT constellation FROM Celestial WHERE constellation IS NOT NULL"))
+
+
+@lru_cache(maxsize=1)
+def _seed_places():
+    try:
+        with open(SEED_CITIES_PATH, encoding="utf-8") as f:
+            cities = json.load(f)
+    except (OSError, ValueError):
+        return frozenset()
+    return frozenset(normalize_city(n) for c in cities for n in [c["name"]] + c.get("aliases", []))
+
+
+def _place(words: str) -> Optional[str]:
+    """Ville connue (liste locale ou gazetteer) au début de 'words' : 'lyon', 'new york' dans 'new york ce soir'..."""
+    tokens = words.split()
+    if not tokens or tokens[0].casefold() in NOT_PLACES:
+        return None
+    gazetteer = get_gazetteer()
+    for n in range(len(tokens), 0, -1):
+        name = " ".join(tokens[:n])
+        if normalize_city(name) in _seed_places() or (gazetteer is not None and gazetteer.lookup(name)):
+            return name
+    return None
+
+
+def _designations(query: str) -> list:
+    """Désignations citées (M42, NGC 7000, C14 -> NGC869), sans doublons, dans l'ordre."""
+    names = []
+    for match in re.finditer(DESIGNATION, query, re.IGNORECASE):
+        prefix, number = match.group(1).upper(), match.group(2)
+        name = CALDWELL.get(f"C{number}") if prefix == "C" else f"{prefix}{number}"
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _designation(query: str) -> Optional[str]:
+    names = _designations(query)
+    return names[0] if names else None
+
+
+def _constellation(query: str, known) -> Optional[str]:
+    plain = _strip_accents(query.lower())
+    for name in sorted(known, key=len, reverse=True):
+        if re.search(rf"\b{re.escape(_strip_accents(name.lower()))}\b", plain):
+            return name
+    for fr, latin in CONSTELLATIONS_FR.items():
+        if re.search(rf"\b{fr}\b", plain):
+            return latin
+    return None
+
+
+def _types(query: str):
+    for pattern, types in TYPES:
+        if re.search(pattern, query):
+            return types
+    return None
+
+
+def match_fast_path(message: str, constellations=None) -> Optional[dict]:
+    """
+    Traduit la question en plan déterministe, ou None si elle doit passer par le LLM.
+    Plans : {"kind": "discover"|"object"|"constellation", "name", "types", "visible", "tonight"}
+    """
+    constellations = constellations if constellations is not None else known_constellations()
+    query = message.lower()
+    # "à Tokyo", "in Lyon", "depuis lyon"... : une autre ville que celle du navigateur -> LLM
+    candidates = [m.group(0).split(None, 1)[1] for m in re.finditer(ELSEWHERE, message)]
+    candidates += [place for m in re.finditer(PLACE_WORDS, query) for place in [_place(m.group(2))] if place]
+    elsewhere = [c for c in candidates if not _constellation(c, constellations) and not _designation(c)]
+    if elsewhere or re.search(OTHER_TIME, query) or re.search(SOLAR_SYSTEM, query) or re.search(EDUCATION, query) \
+            or re.search(COUNT_OR_NEGATION, query):
+        return None
+
+    visible = bool(re.search(VISIBILITY, query))
+    tonight = bool(re.search(TONIGHT, query))
+    names = _designations(message)
+    if len(names) > 1: # Comparaison ou liste d'objets : LLM
+        return None
+    name = names[0] if names else None
+    constellation = _constellation(message, constellations)
+    types = _types(query)
+
+    if name and not constellation and visible:
+        return {"kind": "object", "name": name, "types": None, "visible": True, "tonight": tonight}
+    if constellation and not name and re.search(r"\b(dans|in|de la constellation|objets?|objects?)\b", query):
+        return {"kind": "constellation", "name": constellation, "types": types, "visible": visible, "tonight": tonight}
+    if not name and not constellation and (re.search(DISCOVER, query) or (types and visible)):
+        return {"kind": "discover", "name": None, "types": types, "visible": True, "tonight": tonight}
+    return None
+
+
+def target_time_utc(plan: dict, location: dict, now_utc: Optional[datetime] = None) -> datetime:
+    now_utc = now_utc or datetime.now(pytz.utc)
+    if not plan["tonight"]:
+        return now_utc
+    tz = pytz.timezone(location["tz"])
+    local_now = now_utc.astimezone(tz)
+    tonight = tz.localize(datetime.combine(local_now.date(), datetime.min.time()) + timedelta(hours=TONIGHT_HOUR))
+    return max(now_utc, tonight.astimezone(pytz.utc))
+
+
+def run_fast_path(plan: dict, location: dict, compute_sky_state, now_utc: Optional[datetime] = None,
+                  db_path: str = DB_PATH) -> dict:
+    """Exécute le plan : état du ciel (sky_cache) puis une requête SQL paramétrée. Aucun appel LLM."""
+    time_utc = target_time_utc(plan, location, now_utc)
+    sky = sky_cache.get_or_compute(location["latitude"], location["longitude"], time_utc, compute_sky_state)
+    local_hour = time_utc.astimezone(pytz.timezone(location["tz"])).strftime("%Y-%m-%dT%H:%M:%S")
+    city = location.get("city") or "ta position"
+
+    if plan["visible"] and sky["sun_alt"] > -6:
+        return {"reply": f"Le Soleil est encore levé à {city} (altitude {sky['sun_alt']:.0f}°) : "
+                         f"aucun objet du ciel profond n'est observable pour l'instant.",
+                "targets": [], "hour": local_hour}
+
+    where, params = [], []
+    if plan["kind"] == "object":
+        where.append("name = ? COLLATE NOCASE")
+        params.append(plan["name"])
+    if plan["kind"] == "constellation":
+        where.append("constellation = ?")
+        params.append(plan["name"])
+    if plan["types"]:
+        where.append(f"type IN ({','.join('?' * len(plan['types']))})")
+        params += plan["types"]
+
+    rows = get_pool(db_path).rows(
+        "SELECT rowid, name, type, constellation, ra, dec, magnitude FROM Celestial"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY magnitude IS NULL, magnitude", params
+    )
+
+    visible_ids = set(sky["visible_ids"].tolist())
+    if plan["kind"] == "object":
+        if not rows:
+            return {"reply": f"Je ne trouve pas {plan['name']} dans le catalogue.", "targets": [], "hour": local_hour}
+        row = rows[0]
+        if row[0] not in visible_ids:
+            return {"reply": f"{row[1]} ({row[2].replace('_', ' ')}, {row[3]}) n'est pas visible depuis {city} "
+                             f"à {local_hour[11:16]} : il est sous l'horizon (ou trop bas).",
+                    "targets": [], "hour": local_hour}
+    elif plan["visible"]:
+        rows = [r for r in rows if r[0] in visible_ids]
+
+    rows = rows[:FAST_PATH_LIMIT]
+    targets = [{"label": r[1], "ra": r[4], "dec": r[5]} for r in rows]
+    if not rows:
+        return {"reply": f"Aucun objet correspondant n'est visible depuis {city} à {local_hour[11:16]}.",
+                "targets": [], "hour": local_hour}
+
+    lines = [f"- {r[1]} : {r[2].replace('_', ' ')} dans {r[3]}"
+             + (f", magnitude {r[6]:.1f}" if r[6] is not None else "") for r in rows]
+    if plan["kind"] == "object":
+        head = f"Oui, {rows[0][1]} est visible depuis {city} à {local_hour[11:16]} !"
+    elif plan["visible"]:
+        head = f"Visibles depuis {city} à {local_hour[11:16]} :"
+    else:
+        head = f"Objets du catalogue dans {plan['name']} :"
+    return {"reply": head + "\n" + "\n".join(lines), "targets": targets, "hour": local_hour}
@@ -0,0 +1,212 @@
+"""
+Géocodage inverse hors ligne : ville la plus proche, pays et fuseau horaire en quelques microsecondes.
+
+Gazetteer compact (data/gazetteer/, construit depuis un fichier GeoNames, villes au-dessus
+d'un seuil de population) stocké en tableaux NumPy .npy, ouverts en mmap : chargement
+instantané, pages partagées entre les workers. Recherche par KD-tree sur la sphère unité
+(vecteurs x, y, z : la distance de corde est monotone avec la distance orthodromique).
+
+Le KD-tree est implicite : points rangés dans l'ordre de l'arbre, nœud i -> enfants 2i+1 et
+2i+2, coupure au milieu de la plage [lo, hi) ; seuls l'axe et la valeur de coupure de chaque
+nœud interne sont stockés. Feuilles de LEAF_SIZE points comparées en une opération NumPy.
+
+Construction (données GeoNames CC BY 4.0, https://download.geonames.org/export/dump/) :
+  python gazetteer.py cities15000.txt [--min-population 15000] [--out data/gazetteer]
+"""
+import argparse
+import json
+import math
+import os
+import threading
+from typing import Optional
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+GAZETTEER_DIR = os.getenv("GAZETTEER_DIR", os.path.join(ROOT, "data", "gazetteer"))
+GAZETTEER_RADIUS_KM = float(os.getenv("GAZETTEER_RADIUS_KM", 20)) # Au-delà : pas de ville connue (campagne)
+
+EARTH_RADIUS_KM = 6371.0
+LEAF_SIZE = 16
+ARRAYS = ("points", "axis", "split", "population", "country", "tz", "names", "name_offsets")
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord(km: float) -> float:
+    """Distance orthodromique (km) -> corde sur la sphère unité."""
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def build_tree(points: np.ndarray, leaf_size: int = LEAF_SIZE):
+    """Ordre des points et (axe, coupure) des nœuds internes du KD-tree implicite."""
+    n = len(points)
+    depth, size = 0, n
+    while size > leaf_size:
+        size, depth = (size + 1) // 2, depth + 1
+    order = np.arange(n)
+    axis = np.zeros(2 ** depth - 1, dtype=np.int8)
+    split = np.zeros(2 ** depth - 1, dtype=points.dtype)
+
+    stack = [(0, 0, n)]
+    while stack:
+        node, lo, hi = stack.pop()
+        if hi - lo <= leaf_size:
+            continue
+        idx = order[lo:hi]
+        pts = points[idx]
+        ax = int(np.argmax(pts.max(axis=0) - pts.min(axis=0))) # Axe le plus étendu
+        mid = (lo + hi) // 2
+        order[lo:hi] = idx[np.argpartition(pts[:, ax], mid - lo)]
+        axis[node], split[node] = ax, points[order[mid], ax]
+        stack += [(2 * node + 1, lo, mid), (2 * node + 2, mid, hi)]
+    return order, axis, split
+
+
+class Gazetteer:
+    """Tableaux en mmap + requête du plus proche voisin ; forward (nom -> ville) indexé à la demande."""
+
+    def __init__(self, path: str = GAZETTEER_DIR):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        # Vue ndarray du mmap (sans copie) : découpages plus rapides qu'avec la sous-classe memmap
+        self.points = arrays["points"].view(np.ndarray)
+        self.population = arrays["population"]
+        self.country, self.tz = arrays["country"], arrays["tz"]
+        self.names, self.name_offsets = arrays["names"], arrays["name_offsets"]
+        # Nœuds internes : quelques milliers de valeurs, lues en Python pendant la descente
+        self.axis, self.split = arrays["axis"].tolist(), arrays["split"].tolist()
+        self.leaf_size = self.meta["leaf_size"]
+        self.timezones = self.meta["timezones"]
+        self._by_name = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def name(self, i: int) -> str:
+        return bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]]).decode("utf-8")
+
+    def entry(self, i: int, distance_km: Optional[float] = None) -> dict:
+        x, y, z = (float(v) for v in self.points[i])
+        return {
+            "name": self.name(i),
+            "country": self.country[i].decode(),
+            "tz": self.timezones[self.tz[i]],
+            "latitude": round(math.degrees(math.asin(max(-1.0, min(1.0, z)))), 5),
+            "longitude": round(math.degrees(math.atan2(y, x)), 5),
+            "population": int(self.population[i]),
+            "distance_km": distance_km,
+        }
+
+    def nearest_index(self, lat: float, lon: float, max_km: float = GAZETTEER_RADIUS_KM):
+        """(indice, distance km) de la ville la plus proche à moins de max_km, sinon (None, None)."""
+        lat_r, lon_r = math.radians(lat), math.radians(lon)
+        q = (math.cos(lat_r) * math.cos(lon_r), math.cos(lat_r) * math.sin(lon_r), math.sin(lat_r))
+        q_array = np.array(q)
+        best, best_d2 = None, chord(max_km) ** 2
+        stack = [(0, 0, len(self.points), 0.0)]
+        while stack:
+            node, lo, hi, bound = stack.pop()
+            if bound >= best_d2:
+                continue
+            if hi - lo <= self.leaf_size:
+                dots = self.points[lo:hi] @ q_array # Vecteurs unitaires : |p - q|² = 2 - 2 p.q
+                i = int(dots.argmax())
+                d2 = 2.0 - 2.0 * float(dots[i])
+                if d2 < best_d2:
+                    best, best_d2 = lo + i, max(0.0, d2)
+                continue
+            mid = (lo + hi) // 2
+            diff = q[self.axis[node]] - self.split[node]
+            near, far = ((2 * node + 1, lo, mid), (2 * node + 2, mid, hi))[::1 if diff < 0 else -1]
+            stack.append((*far, max(bound, diff * diff))) # Côté opposé : au moins |diff| de distance
+            stack.append((*near, bound))
+        if best is None:
+            return None, None
+        return best, 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(best_d2) / 2))
+
+    def nearest(self, lat: float, lon: float, max_km: float = GAZETTEER_RADIUS_KM) -> Optional[dict]:
+        i, distance = self.nearest_index(lat, lon, max_km)
+        return None if i is None else self.entry(i, round(distance, 2))
+
+    def lookup(self, name: str) -> Optional[dict]:
+        """Ville par nom (insensible à la casse), la plus peuplée en cas d'homonymes."""
+        if self._by_name is None:
+            by_name = {}
+            for i in np.argsort(self.population, kind="stable"): # Les plus peuplées écrasent les autres
+                by_name[self.name(i).casefold()] = int(i)
+            self._by_name = by_name
+        i = self._by_name.get(" ".join(name.split()).casefold())
+        return None if i is None else self.entry(i)
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """Gazetteer partagé, ouvert au premier besoin ; None si les données ne sont pas construites."""
+    global _gazetteer
+    if _gazetteer is None and os.path.exists(os.path.join(GAZETTEER_DIR, "meta.json")):
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+    return _gazetteer
+
+
+# --- Construction (au build) ---
+
+def read_geonames(path: str, min_population: int):
+    """Lignes d'un export GeoNames (cities*.txt, tabulé) : (nom, lat, lon, pays, population, fuseau)."""
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            col = line.rstrip("\n").split("\t")
+            if len(col) < 18 or int(col[14] or 0) < min_population:
+                continue
+            rows.append((col[1], float(col[4]), float(col[5]), col[8], int(col[14]), col[17]))
+    return rows
+
+
+def build(source: str, min_population: int = 15000, out: str = GAZETTEER_DIR) -> int:
+    rows = read_geonames(source, min_population)
+    if not rows:
+        raise ValueError(f"Aucune ville au-dessus de {min_population} habitants dans {source}")
+    # float64 : en float32, 2 - 2 p.q ne résout pas mieux que quelques km près de zéro
+    points = unit_vectors([r[1] for r in rows], [r[2] for r in rows])
+    order, axis, split = build_tree(points)
+    rows = [rows[i] for i in order]
+
+    timezones = sorted({r[5] for r in rows})
+    tz_index = {tz: i for i, tz in enumerate(timezones)}
+    encoded = [r[0].encode("utf-8") for r in rows]
+    arrays = {
+        "points": points[order],
+        "axis": axis,
+        "split": split,
+        "population": np.array([r[4] for r in rows], dtype=np.int32),
+        "country": np.array([r[3] for r in rows], dtype="S2"),
+        "tz": np.array([tz_index[r[5]] for r in rows], dtype=np.int16),
+        "names": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "name_offsets": np.concatenate([[0], np.cumsum([len(e) for e in encoded])]).astype(np.int32),
+    }
+    os.makedirs(out, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(out, f"{name}.npy"), array)
+    meta = {"count": len(rows), "min_population": min_population, "leaf_size": LEAF_SIZE,
+            "source": os.path.basename(source), "timezones": timezones}
+    with open(os.path.join(out, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("source", help="Export GeoNames : cities15000.txt, cities5000.txt...")
+    arg_parser.add_argument("--min-population", type=int, default=15000)
+    arg_parser.add_argument("--out", default=GAZETTEER_DIR)
+    args = arg_parser.parse_args()
+    count = build(args.source, args.min_population, args.out)
+    print(f"✅ {count} villes -> {os.path.relpath(args.out, ROOT)}")
@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+GEOCACHE_PATH = os.getenv("GEOCACHE_PATH", "Geocache.db")
+SEED_CITIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "major_cities.json")
+
+GEOCODE_TTL = float(os.getenv("GEOCODE_TTL", 30 * 24 * 3600))          # résultat trouvé : 30 jours
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", 600))   # échec / introuvable : 10 minutes
+REVERSE_PRECISION = int(os.getenv("REVERSE_GEOCODE_PRECISION", 2))     # 2 décimales ~ 1 km
+
+MISS = object()  # Sentinelle : rien en cache (différent d'un None mis en cache négatif)
+
+
+def normalize_city(city: str) -> str:
+    return " ".join(city.split()).casefold()
+
+
+def reverse_key(lat: float, lon: float, precision: int = REVERSE_PRECISION) -> str:
+    return f"{round(float(lat), precision)}:{round(float(lon), precision)}"
+
+
+class GeoCache:
+    """
+    Cache de géocodage partagé (tous les workers / redémarrages), stocké en SQLite.
+    - Entrées positives : expirent après GEOCODE_TTL.
+    - Entrées négatives (None) : expirent après GEOCODE_NEGATIVE_TTL, pour qu'une
+      coupure réseau n'empoisonne pas une ville jusqu'au prochain redémarrage.
+    - Les villes du fichier data/major_cities.json sont pré-chargées et n'expirent pas.
+    """
+
+    def __init__(self, path: str = GEOCACHE_PATH, ttl: float = GEOCODE_TTL,
+                 negative_ttl: float = GEOCODE_NEGATIVE_TTL, seed_path: Optional[str] = SEED_CITIES_PATH):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("""CREATE TABLE IF NOT EXISTS geocode(
+            key TEXT PRIMARY KEY, lat REAL, lon REAL, expires_at REAL)""")
+        self._con.execute("""CREATE TABLE IF NOT EXISTS reverse_geocode(
+            key TEXT PRIMARY KEY, city TEXT, expires_at REAL)""")
+        self._con.commit()
+        if seed_path and os.path.exists(seed_path):
+            self.seed(seed_path)
+
+    def seed(self, seed_path: str):
+        with open(seed_path, encoding="utf-8") as f:
+            cities = json.load(f)
+        rows = []
+        for c in cities:
+            for name in [c["name"]] + c.get("aliases", []):
+                rows.append((normalize_city(name), c["lat"], c["lon"], None))
+        with self._lock:
+            # Les entrées déjà présentes (éventuellement plus récentes) ne sont pas écrasées
+            self._con.executemany("INSERT OR IGNORE INTO geocode VALUES (?, ?, ?, ?)", rows)
+            self._con.commit()
+
+    def _expiry(self, found: bool) -> float:
+        return time.time() + (self.ttl if found else self.negative_ttl)
+
+    def get_coordinates(self, city: str):
+        """Renvoie (lat, lon), None (échec en cache négatif) ou MISS."""
+        with self._lock:
+            row = self._con.execute(
+                "SELECT lat, lon, expires_at FROM geocode WHERE key = ?", (normalize_city(city),)
+            ).fetchone()
+        if row is None or (row[2] is not None and row[2] < time.time()):
+            return MISS
+        return None if row[0] is None else (row[0], row[1])
+
+    def set_coordinates(self, city: str, coords: Optional[Tuple[float, float]]):
+        lat, lon = coords if coords else (None, None)
+        with self._lock:
+            self._con.execute("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?)",
+                              (normalize_city(city), lat, lon, self._expiry(coords is not None)))
+            self._con.commit()
+
+    def get_city(self, lat: float, lon: float):
+        """Renvoie le nom de ville, None (échec en cache négatif) ou MISS."""
+        with self._lock:
+            row = self._con.execute(
+                "SELECT city, expires_at FROM reverse_geocode WHERE key = ?", (reverse_key(lat, lon),)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return MISS
+        return row[0]
+
+    def set_city(self, lat: float, lon: float, city: Optional[str]):
+        with self._lock:
+            self._con.execute("INSERT OR REPLACE INTO reverse_geocode VALUES (?, ?, ?)",
+                              (reverse_key(lat, lon), city, self._expiry(city is not None)))
+            self._con.commit()
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            self._con.execute("DELETE FROM geocode WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+            self._con.execute("DELETE FROM reverse_geocode WHERE expires_at < ?", (now,))
+            self._con.commit()
+
+
+_geocache = None
+_geocache_lock = threading.Lock()
+
+
+def get_geocache() -> GeoCache:
+    """Ouvert (et pré-rempli) au premier besoin ou au warm-up, jamais à l'import."""
+    global _geocache
+    if _geocache is None:
+        with _geocache_lock:
+            if _geocache is None:
+                _geocache = GeoCache()
+    return _geocache
@@ -0,0 +1,312 @@
+"""
+Service de géocodage unique (ville -> coordonnées, coordonnées -> ville) pour toute l'application.
+
+  - backends interchangeables, essayés dans l'ordre de GEOCODE_BACKENDS :
+      local     : villes de data/major_cities.json (noms français), en mémoire, aucun appel réseau
+      gazetteer : villes GeoNames en mmap + KD-tree (gazetteer.py), hors ligne
+      nominatim : OpenStreetMap via geopy, avec timeout, relances et limite de débit
+  - backends locaux d'abord (quelques µs), puis cache persistant (geocache.py, échecs compris,
+    TTL court) devant les backends distants : seuls leurs résultats sont mis en cache
+  - compromis vitesse / précision des backends locaux :
+      inverse : la liste locale ne répond que dans LOCAL_REVERSE_RADIUS_KM (centre des grandes villes),
+        au-delà le gazetteer ou Nominatim nomment la commune (Versailles et non Paris)
+      direct  : un nom est résolu hors ligne si les backends locaux s'accordent ; s'ils désignent des
+        villes éloignées (Valence, Vienne, Saint-Denis...), c'est un homonyme et le backend distant
+        tranche (la première réponse locale sert de repli s'il échoue)
+  - single-flight : des recherches identiques simultanées partagent un seul appel sortant
+  - limite de débit globale au processus pour les backends distants (Nominatim : 1 requête/s)
+  - relances avec backoff exponentiel et jitter sur timeout / indisponibilité / 429
+  - méthodes asynchrones (aforward, areverse, areverse_place, aforward_many) via le pool de threads
+
+Un backend expose name, remote, forward(query) -> (lat, lon) | None et reverse(lat, lon) -> place() | None ;
+il lève une exception pour une erreur passagère (relancée si remote), renvoie None si introuvable.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
+from geopy.geocoders import Nominatim
+from gazetteer import GAZETTEER_RADIUS_KM, get_gazetteer
+from geocache import MISS, SEED_CITIES_PATH, get_geocache, normalize_city, reverse_key
+from telemetry import span
+
+log = logging.getLogger(__name__)
+
+GEOCODE_BACKENDS = os.getenv("GEOCODE_BACKENDS", "local,gazetteer,nominatim")
+GEOCODER_USER_AGENT = os.getenv("GEOCODER_USER_AGENT", "mon_astro_app_v1")
+GEOCODE_RATE = float(os.getenv("GEOCODE_RATE", 1.0))                # requêtes/s sortantes, 0 = sans limite
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", 5.0))          # secondes par requête
+GEOCODE_RETRIES = int(os.getenv("GEOCODE_RETRIES", 2))
+GEOCODE_BACKOFF = float(os.getenv("GEOCODE_BACKOFF", 0.5))          # secondes, doublé à chaque relance
+LOCAL_REVERSE_RADIUS_KM = float(os.getenv("LOCAL_REVERSE_RADIUS_KM", 5)) # Centre-ville ; au-delà, backend plus fin
+HOMONYM_KM = 50.0 # Deux réponses locales plus éloignées que ça : homonymes
+
+EARTH_RADIUS_KM = 6371.0
+RETRYABLE = (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited)
+
+
+def distance_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """Distance orthodromique (haversine) entre deux (lat, lon) en degrés."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def place(city: str, country: Optional[str] = None, tz: Optional[str] = None) -> dict:
+    """Résultat d'un géocodage inverse ; tz connu seulement des backends locaux (sinon TimezoneFinder)."""
+    return {"city": city, "country": country, "tz": tz}
+
+
+class RateLimiter:
+    """Espace les appels d'au moins 1/rate seconde, tous threads confondus (créneaux réservés sous verrou)."""
+
+    def __init__(self, rate: float = GEOCODE_RATE):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SingleFlight:
+    """Un seul calcul en vol par clé : les appelants concurrents attendent le résultat du premier."""
+
+    def __init__(self):
+        self._calls: Dict[tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = compute()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class CitiesBackend:
+    """Grandes villes de data/major_cities.json (noms et alias) : géocodage hors ligne instantané."""
+    name = "local"
+    remote = False
+
+    def __init__(self, path: str = SEED_CITIES_PATH, radius_km: float = LOCAL_REVERSE_RADIUS_KM):
+        with open(path, encoding="utf-8") as f:
+            self.cities = json.load(f)
+        self.by_name = {normalize_city(n): c for c in self.cities for n in [c["name"]] + c.get("aliases", [])}
+        self.lat = np.radians([c["lat"] for c in self.cities])
+        self.lon = np.radians([c["lon"] for c in self.cities])
+        self.radius_km = radius_km
+
+    def forward(self, query: str):
+        city = self.by_name.get(normalize_city(query))
+        return (city["lat"], city["lon"]) if city else None
+
+    def reverse(self, lat: float, lon: float):
+        # Haversine vectorisée : une centaine de villes, la force brute suffit
+        lat_r, lon_r = np.radians(lat), np.radians(lon)
+        h = np.sin((self.lat - lat_r) / 2) ** 2 + np.cos(lat_r) * np.cos(self.lat) * np.sin((self.lon - lon_r) / 2) ** 2
+        dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))
+        i = int(np.argmin(dist))
+        if dist[i] > self.radius_km:
+            return None
+        city = self.cities[i]
+        return place(city["name"], city.get("country"), city.get("tz"))
+
+
+class GazetteerBackend:
+    """Villes GeoNames au-dessus d'un seuil de population (gazetteer.py) ; inactif si les données manquent."""
+    name = "gazetteer"
+    remote = False
+
+    def __init__(self, radius_km: float = GAZETTEER_RADIUS_KM):
+        self.radius_km = radius_km
+
+    def forward(self, query: str):
+        gazetteer = get_gazetteer()
+        city = gazetteer.lookup(query) if gazetteer is not None else None
+        return (city["latitude"], city["longitude"]) if city else None
+
+    def reverse(self, lat: float, lon: float):
+        gazetteer = get_gazetteer()
+        if gazetteer is None:
+            return None
+        city = gazetteer.nearest(lat, lon, self.radius_km)
+        return None if city is None else place(city["name"], city["country"], city["tz"])
+
+
+class NominatimBackend:
+    """OpenStreetMap Nominatim (geopy). client remplaçable par tout objet ayant geocode() / reverse()."""
+    name = "nominatim"
+    remote = True
+
+    def __init__(self, client=None, user_agent: str = GEOCODER_USER_AGENT, timeout: float = GEOCODE_TIMEOUT):
+        self.client = client or Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def forward(self, query: str):
+        location = self.client.geocode(query)
+        return (location.latitude, location.longitude) if location else None
+
+    def reverse(self, lat: float, lon: float):
+        location = self.client.reverse((lat, lon), language='fr')
+        if location is None:
+            return None
+        address = location.raw.get('address', {})
+        city = address.get('city') or address.get('town') or address.get('village') or "Lieu Inconnu"
+        return place(city, (address.get('country_code') or "").upper() or None)
+
+
+BACKENDS = {"local": CitiesBackend, "gazetteer": GazetteerBackend, "nominatim": NominatimBackend}
+
+
+class Geocoder:
+    """Backends locaux -> cache -> single-flight -> backends distants (dans chaque groupe, le premier qui trouve gagne)."""
+
+    def __init__(self, backends: List, cache=None, rate: float = GEOCODE_RATE,
+                 retries: int = GEOCODE_RETRIES, backoff: float = GEOCODE_BACKOFF):
+        self.backends = backends
+        self.cache = cache if cache is not None else get_geocache()
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.flights = SingleFlight()
+
+    @classmethod
+    def from_env(cls, names: str = GEOCODE_BACKENDS):
+        return cls([BACKENDS[n.strip()]() for n in names.split(",") if n.strip()])
+
+    def _call(self, backend, direction: str, *args):
+        for attempt in range(self.retries + 1):
+            if backend.remote:
+                self.limiter.wait()
+            try:
+                with span("geocode", f"{backend.name}.{direction}"):
+                    return getattr(backend, direction)(*args)
+            except RETRYABLE as e:
+                if not backend.remote or attempt == self.retries:
+                    raise
+                delay = getattr(e, "retry_after", None) or self.backoff * 2 ** attempt
+                time.sleep(delay * random.uniform(0.5, 1.5)) # Jitter : pas de relances synchronisées
+                log.info("Géocodage %s %s : relance %d après %s", backend.name, direction, attempt + 1, e)
+
+    def _resolve(self, backends, direction: str, *args):
+        """Premier résultat non vide des backends ; None si introuvable ou si tous ont échoué."""
+        for backend in backends:
+            try:
+                result = self._call(backend, direction, *args)
+            except Exception as e:
+                log.warning("Erreur Geocoding (%s) : %s", backend.name, e)
+                continue
+            if result is not None:
+                return result
+        return None
+
+    def _local(self, direction: str, *args):
+        return self._resolve([b for b in self.backends if not b.remote], direction, *args)
+
+    def _remote(self, direction: str, *args):
+        return self._resolve([b for b in self.backends if b.remote], direction, *args)
+
+    def _local_forward(self, query: str):
+        """(coordonnées locales, homonyme ?) : homonyme si deux backends locaux désignent des villes éloignées."""
+        found = [coords for backend in self.backends if not backend.remote
+                 for coords in [self._resolve([backend], "forward", query)] if coords is not None]
+        if not found:
+            return None, False
+        ambiguous = any(distance_km(found[0], other) > HOMONYM_KM for other in found[1:])
+        return found[0], ambiguous and any(backend.remote for backend in self.backends)
+
+    def forward(self, query: str) -> Optional[Tuple[float, float]]:
+        """Nom de lieu -> (lat, lon), None si introuvable."""
+        if not query:
+            return None
+        local, ambiguous = self._local_forward(query)
+        if local is not None and not ambiguous:
+            return local
+        cached = self.cache.get_coordinates(query)
+        if cached is not MISS:
+            return cached or local
+
+        def compute():
+            coords = self._remote("forward", query)
+            self.cache.set_coordinates(query, coords)
+            return coords
+        return self.flights.do(("forward", normalize_city(query)), compute) or local
+
+    def _reverse_remote(self, lat: float, lon: float) -> Optional[dict]:
+        """Cache puis backends distants (single-flight) : appelé après un échec des backends locaux."""
+        cached = self.cache.get_city(lat, lon) # Clé = lat/lon arrondis
+        if cached is not MISS:
+            return place(cached) if cached else None
+
+        def compute():
+            found = self._remote("reverse", lat, lon)
+            self.cache.set_city(lat, lon, found["city"] if found else None)
+            return found
+        return self.flights.do(("reverse", reverse_key(lat, lon)), compute)
+
+    def reverse_place(self, lat: float, lon: float) -> Optional[dict]:
+        """(lat, lon) -> {"city", "country", "tz"} (pays / fuseau à None si inconnus), None si échec."""
+        return self._local("reverse", lat, lon) or self._reverse_remote(lat, lon)
+
+    def reverse(self, lat: float, lon: float) -> Optional[str]:
+        """(lat, lon) -> nom de ville, None si le géocodage a échoué."""
+        found = self.reverse_place(lat, lon)
+        return found["city"] if found else None
+
+    async def aforward(self, query: str):
+        return await asyncio.to_thread(self.forward, query)
+
+    async def areverse_place(self, lat: float, lon: float):
+        # Backends locaux (quelques µs) sur la boucle, une seule fois ; pool de threads pour cache et réseau
+        return self._local("reverse", lat, lon) or await asyncio.to_thread(self._reverse_remote, lat, lon)
+
+    async def areverse(self, lat: float, lon: float):
+        found = await self.areverse_place(lat, lon)
+        return found["city"] if found else None
+
+    async def aforward_many(self, queries: Iterable[str]) -> dict:
+        """Plusieurs lieux d'un coup : doublons fusionnés, appels sortants espacés par la limite de débit."""
+        unique = list(dict.fromkeys(q for q in queries if q))
+        results = await asyncio.gather(*(self.aforward(q) for q in unique))
+        return dict(zip(unique, results))
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder() -> Geocoder:
+    """Service partagé, construit (cache SQLite, villes locales) au premier besoin ou au warm-up."""
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = Geocoder.from_env()
+    return _geocoder
@@ -1,25 +1,35 @@
+import asyncio
 import json
+import logging
 import os
-import sqlite3
+from functools import lru_cache
 from typing import Annotated, Any, Dict, List, Optional
 from dotenv import load_dotenv
 from pydantic import Field
 import requests
-from sqlalchemy import create_engine, event
 from typing_extensions import TypedDict
-from langgraph.graph import StateGraph
+from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langchain_google_genai import ChatGoogleGenerativeAI
-from IPython.display import Image, display
-from langchain_community.utilities import SQLDatabase
-from astropy_function import get_ra_dec_constraint, maths_altitude, get_coordinates, get_visible_solar_system_objects
+from astropy_function import get_ra_dec_constraint, location_for, get_visible_solar_system_objects, get_night_visibility, compute_sky_state
+from catalogue import rewrite_visibility, join_targets
+from database import get_pool
+from fast_path import match_fast_path, run_fast_path
+from llm_cache import get_llm_cache, cache_scope
+from session import last_visibility, prune_history
+from telemetry import atool_span, timed, tool_span
 import re
 from langchain_core.tools import tool
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.messages import AIMessage
 
 load_dotenv()
+log = logging.getLogger(__name__)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# Chemin rapide : faire quand même rédiger la réponse par le vulgarisateur (1 appel LLM) ?
+FAST_PATH_PROSE = os.getenv("FAST_PATH_PROSE", "0") == "1"
+# Sortie de l'outil SQL renvoyée au LLM : nombre de lignes max et colonnes masquées (url rejointe côté serveur)
+SQL_TOOL_MAX_ROWS = int(os.getenv("SQL_TOOL_MAX_ROWS", "25"))
+SQL_TOOL_HIDDEN = ("url", "dec_band", "ra_zone")
 
 class AgentState(TypedDict):
     #city: str   # "Lyon", "Paris"
@@ -30,8 +40,12 @@ class AgentState(TypedDict):
     messages: Annotated[list, add_messages] # LISTE DES MESSAGES
     final_target: List[Dict[str, Any]] # JSON OBJETS TROUVES
     detected_city: Optional[str] = Field(description="Nom de la ville demandée par l'user, si différente de l'actuelle.")
+    location: Optional[Dict[str, Any]] # {"city", "latitude", "longitude", "tz"} résolu une fois par requête
     latitude: float
     longitude: float
+    plan: Optional[Dict[str, Any]] # Plan déterministe du chemin rapide (fast_path)
+    path: str # "fast" ou "llm"
+    sky: Optional[Dict[str, Any]] # Dernier résultat de get_ra_dec_constraint (gardé d'un tour à l'autre)
 graph_builder = StateGraph(AgentState)
 
 
@@ -43,72 +57,74 @@ KEYWORDS = {
     "education": ["c'est quoi", "expliqu.*", "pourquoi", "raconte", "histoir.*","qu'est ce"]
 }
 
-llm_pro = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        google_api_key=GOOGLE_API_KEY,
-        temperature=0
-)
-llm_lite = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash-lite",
-        google_api_key=GOOGLE_API_KEY,
-        temperature=0
-)
+# Clients Gemini créés au premier appel (ou au warm-up du serveur) : l'import du SDK coûte ~1,5 s
+llm_with_tools = None
+llm_lite = None
+
+def _gemini(model: str):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, google_api_key=GOOGLE_API_KEY, temperature=0)
+
+def get_llm_with_tools():
+    global llm_with_tools
+    if llm_with_tools is None:
+        llm_with_tools = _gemini("gemini-2.5-flash").bind_tools(tools)
+    return llm_with_tools
+
+def get_llm_lite():
+    global llm_lite
+    if llm_lite is None:
+        llm_lite = _gemini("gemini-2.5-flash-lite")
+    return llm_lite
 
 
 def create_sql_tool(db):
     @tool
-    def execute_sql(query: str) -> str:
+    def execute_sql(query: str):
         """
         Exécute une requête SQL SELECT sur la base de données Celestial.
-        Prend en entrée une requête SQL valide et renvoie les résultats formatés.
+        Prend en entrée une requête SQL valide et renvoie {"columns", "rows", "truncated"}.
         """
         try:
-            # db.run() s'occupe de tout : exécution et formatage en texte
-            return db.run(query)
+            # IS_VISIBLE est pré-calculé en une passe NumPy (rowids liés en paramètre) avant d'aller à SQLite
+            # JSON compact : colonnes utiles, valeurs arrondies, lignes plafonnées (moins de tokens au 2e appel)
+            sql, params = rewrite_visibility(query)
+            result = db.compact(sql, params, max_rows=SQL_TOOL_MAX_ROWS, hidden=SQL_TOOL_HIDDEN)
+            return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
         except Exception as e:
             return f"Erreur lors de l'exécution SQL : {e}"
             
     return execute_sql
 
 
-def _register_custom_functions(dbapi_connection, connection_record):
-    if isinstance(dbapi_connection, sqlite3.Connection):
-        dbapi_connection.create_function("IS_VISIBLE", 5, maths_altitude)
-
-engine = create_engine("sqlite:///Celestial.db")
-
-event.listen(engine, 'connect', _register_custom_functions)
-
-db = SQLDatabase(engine)
+db = get_pool()
 
-
-schema_brut = db.run("PRAGMA table_info(Celestial);")
+@lru_cache(maxsize=1)
+def get_schema() -> str:
+    return str(db.rows("PRAGMA table_info(Celestial);"))
 
 sql_tool = create_sql_tool(db)
-tools = [get_ra_dec_constraint, sql_tool, get_visible_solar_system_objects]
-tool_node = ToolNode(tools)
-llm_with_tools = llm_pro.bind_tools(tools)
+tools = [get_ra_dec_constraint, sql_tool, get_visible_solar_system_objects, get_night_visibility]
+tool_node = ToolNode(tools, wrap_tool_call=tool_span, awrap_tool_call=atool_span)
 
 def print_clean_debug(step_name, message_object):
-    """Affiche le contenu du LLM proprement en virant la signature Google."""
+    """Journalise (DEBUG) le contenu du LLM proprement en virant la signature Google."""
+    if not log.isEnabledFor(logging.DEBUG):
+        return
     content = message_object.content
-    
-    print(f"\n--- 🔍 DEBUG {step_name} ---")
-    
+
     # Cas 1 : Gemini renvoie une liste complexe (Text + Signature)
     if isinstance(content, list):
         full_text = ""
         for block in content:
             if isinstance(block, dict) and 'text' in block:
                 full_text += block['text']
-        print(f"📝 CONTENU : {full_text}")
-        
+        log.debug("%s contenu : %s", step_name, full_text)
+
     # Cas 3 : Appel d'outil (Tool Call)
     if hasattr(message_object, 'tool_calls') and message_object.tool_calls:
         for tool in message_object.tool_calls:
-            print(f"🛠️ APPEL OUTIL : {tool['name']} avec args={tool['args']}")
-
-    print("-" * 30)
+            log.debug("%s appel outil : %s avec args=%s", step_name, tool['name'], tool['args'])
 
 UNIVERSAL_ASTRONOMER_PROMPT = """Tu es un Assistant Astronome Expert connecté à une base de données.
 
@@ -126,6 +142,7 @@ UNIVERSAL_ASTRONOMER_PROMPT = """Tu es un Assistant Astronome Expert connecté 
 *** TA MÉTHODOLOGIE (DYNAMIQUE) ***
 Etape 1 : Analyse la demande.
 Etape 2 : Appelle TOUJOURS 'get_ra_dec_constraint' SAUF POUR LES PLANETES pour connaître le ciel visible à {city} et l'heure {hour}.
+          Exception : si le DERNIER CALCUL DE VISIBILITÉ ci-dessous porte sur la même ville et la même heure, réutilise-le sans rappeler l'outil.
 Etape 3 : N'EXECUTE AUCUNE REQUETE SQL SI LE SOLEIL EST VISIBLE (voir erreur renvoyé par get_ra_dec_constraint : "error":)
 Etape 4 : Adapte ta stratégie SQL selon le cas :
 
@@ -135,7 +152,7 @@ N'UTILISE PAS la base de données, utilise uniquement l'outil : get_visible_sola
 --- STRATÉGIE B : VISIBILITÉ D'UN OBJET PRÉCIS ---
 (Ex: "Est-ce que M8 est visible ?")
 -> Récupère l'intervalle RA de l'outil 1.
--> SQL : SELECT * FROM Celestial WHERE name = 'M8' AND IS_VISIBLE(ra,dec,lat,lst,5)
+-> SQL : SELECT * FROM Celestial WHERE name = 'M8' AND <sql_where> (copie sql_where tel quel : bornes dec/ra puis IS_VISIBLE)
 
 --- STRATÉGIE C : RECOMMANDATION / DÉCOUVERTE ---
 (Ex: "Que puis-je voir de beau ce soir ?", "Les plus belles nébuleuses visibles")
@@ -149,6 +166,11 @@ en combinant strictement la contrainte sql_where fournie par l'outil de calcul e
 -> Ici, la visibilité n'est pas forcément le critère principal, sauf si précisé.
 -> SQL : SELECT * FROM Celestial WHERE constellation = 'Orion' (Pas besoin de contrainte RA si on ne demande pas si c'est visible maintenant).
 
+--- STRATÉGIE E : MEILLEUR MOMENT DANS LA NUIT ---
+(Ex: "Quand M31 est-il le plus haut ce soir ?", "Jusqu'à quelle heure voit-on M42 ?")
+-> N'appelle PAS get_ra_dec_constraint plusieurs fois à des heures différentes.
+-> Appelle UNE fois get_night_visibility(city, date, names) : lever, passage au méridien, coucher, altitude max.
+
 *** RÈGLE D'OR ***
 - Quand il est question de planète, INTERDICTION d'utiliser les outils liés au SQL
 - Ne parle PAS avant d'avoir interrogé le SQL.
@@ -166,12 +188,16 @@ Lorsque tu as trouvé les informations :
   "detected_city": N'invente pas, récupère la ville de l'utilisateur si il l'a évoqué précédemment,
   "hour": N'invente pas, récupère l'heure voulue par l'utilisateur (Déduis le sinon :"ce soir" -> 18h ou 20h), la forme : "2050-01-01T22:53:00" en LOCAL
   "targets": [
-    "label": "Nom Objet", "ra": 123.45, "dec": -12.34
+    "label": "Nom Objet" (valeur exacte de la colonne name ; ra/dec/url sont complétés par le serveur),
+    "label": "Jupiter", "ra": 123.45, "dec": -12.34 (ra/dec seulement pour les planètes, absentes de la base)
   ]
   "bool_sun" : Boolean si le soleil est présent (basé sur le retour de get_ra_dec_constraint : champ "error")
 
 Si tu n'as pas d'objets à afficher, laisse la liste "targets" vide.
 
+*** DERNIER CALCUL DE VISIBILITÉ (tour précédent) ***
+{last_sky}
+
 *** OBJECTIF ACTUEL DE L'UTILISATEUR ***
 "{mission}"
 """
@@ -180,22 +206,44 @@ VULGARISATION_PROMPT = """ Tu es un agent vulgarisateur d'astronomie ayant des i
 sur les objets Messier/Caldwell, Vulgarise ces données astronomiques pour un débutant en étant très concis sur ce texte 
 (15 phrase maximales) : {last_message} """
 
-def orchestrateur(state = AgentState):
+async def orchestrateur(state = AgentState):
     infos = state.get("infos")
     query = infos.lower()
-    print("orchestrateur: Message recu -> ", query)
+    log.debug("orchestrateur: Message recu -> %s", query)
+
+    # Session : historique borné avant d'appeler un LLM (étapes d'outils des tours précédents, puis plus anciens échanges)
+    trimmed = {"messages": prune_history(state.get("messages", []))}
+
+    # Questions types ("que voir ce soir", "M42 est visible ?") : pas de LLM pour trouver les cibles
+    plan = match_fast_path(infos) if state.get("location") else None
+    if plan:
+        log.info("chemin rapide %s", plan)
+        return {**trimmed, "intent": "fast", "plan": plan, "path": "fast"}
 
     for word in KEYWORDS["observation"]:
         if re.search(word, query):
-            print("observation")
-            return {"intent": "observation"}
+            log.debug("intent : observation")
+            return {**trimmed, "intent": "observation", "path": "llm"}
     for word in KEYWORDS["education"]:
         if re.search(word, query):
-            print("education")
-            return {"intent": "education"}
+            log.debug("intent : education")
+            return {**trimmed, "intent": "education", "path": "llm"}
+    return {**trimmed, "path": "llm"}
 
 
-def astronomer(state = AgentState):
+async def chemin_rapide(state = AgentState):
+    res = await asyncio.to_thread(run_fast_path, state["plan"], state["location"], compute_sky_state)
+    update = {
+        "messages": [AIMessage(content=res["reply"])],
+        "final_target": await asyncio.to_thread(join_targets, res["targets"]),
+        "hour": res["hour"],
+    }
+    if not FAST_PATH_PROSE:
+        update["vulgarisation_output"] = res["reply"]
+    return update
+
+
+async def astronomer(state = AgentState):
 
     # print("Astronomer : ", state)
 
@@ -204,15 +252,21 @@ def astronomer(state = AgentState):
     system_message = {
         "role": "system",
         "content": UNIVERSAL_ASTRONOMER_PROMPT.format(
-            schema=schema_brut,
+            schema=get_schema(),
             city=state.get("detected_city"),
             hour=state.get("hour"),
-            mission=state.get("infos")
+            mission=state.get("infos"),
+            last_sky=json.dumps(state.get("sky"), ensure_ascii=False) if state.get("sky") else "Aucun"
         )
     }
     final_message = [system_message] + history
+    sky = last_visibility(history) or state.get("sky")
 
-    res = llm_with_tools.invoke(final_message)
+    # Cache : le prompt système (ville, heure) est résumé par la portée lieu + tranche de temps
+    scope = cache_scope(state.get("location"), state.get("hour"))
+    question = state.get("infos") if len(history) == 1 else None
+    res = await get_llm_cache().ainvoke(get_llm_with_tools(), "astronomer", final_message,
+                                  key_messages=history, scope=scope, question=question)
     print_clean_debug("Astro", res)
     raw_content = res.content
     
@@ -223,16 +277,21 @@ def astronomer(state = AgentState):
     clean_text = raw_content.replace("```json", "").replace("```", "").strip()
     hour = state.get("hour")
     detected_city = state.get("detected_city")
+    location = state.get("location")
 
     try:
         data = json.loads(clean_text)
 
-        final_target = data.get("targets", [])
+        # Le LLM choisit les noms, la base fournit ra/dec/url/magnitude
+        final_target = await asyncio.to_thread(join_targets, data.get("targets", []))
         chat_reply = data.get("chat_reply", "Voici les résultats.")
         hour = data.get("hour")
         detected_city = data.get("detected_city")
-        lat,lon = get_coordinates(detected_city)
-        print("LLM : VILLE =", data.get("detected_city"), " LAT=", lat, " LON=", lon)
+        # Ne re-géocode que si le LLM a changé de ville
+        location = await asyncio.to_thread(location_for, detected_city, location) or location
+        lat = location["latitude"] if location else state.get("latitude")
+        lon = location["longitude"] if location else state.get("longitude")
+        log.debug("LLM : VILLE = %s LAT= %s LON= %s", data.get("detected_city"), lat, lon)
 
 
         final_msg = AIMessage(content=chat_reply)
@@ -243,9 +302,11 @@ def astronomer(state = AgentState):
             "messages": [final_msg], 
             "final_target": final_target,
             "detected_city": detected_city,
+            "location": location,
             "latitude": lat,
             "longitude": lon,
-            "hour": hour
+            "hour": hour,
+            "sky": sky
         }
 
     except json.JSONDecodeError:
@@ -253,10 +314,11 @@ def astronomer(state = AgentState):
             "messages": [res], 
             "final_target": [],
             "detected_city": detected_city,
-            "hour": hour
+            "hour": hour,
+            "sky": sky
         }
 
-def vulgarisation(state = AgentState):
+async def vulgarisation(state = AgentState):
     last_message = state["messages"][-1].content
 
     # print(state.get('final_target'))
@@ -265,12 +327,14 @@ def vulgarisation(state = AgentState):
             last_message=last_message,
         )
 
-    res = llm_lite.invoke(prompt)
+    res = await get_llm_cache().ainvoke(get_llm_lite(), "vulgarisation", prompt)
 
     return {"vulgarisation_output": res.content}
 
 
 def orchestr_switch(state = AgentState):
+    if state.get("intent") == "fast":
+        return "rapide"
     if state.get("intent") == "education":
         return "vulgaris"
     else:
@@ -280,17 +344,25 @@ dict_ = {'astronome':'astro', 'vulgaris':'vulga'}
 
 
 
-graph_builder.add_node("orchest", orchestrateur)
-graph_builder.add_node("astro", astronomer)
+# Durée de chaque nœud -> cosmic_stage_seconds{stage="node"} (les outils ont leur propre span)
+graph_builder.add_node("orchest", timed("node", "orchest")(orchestrateur))
+graph_builder.add_node("astro", timed("node", "astro")(astronomer))
 graph_builder.add_node("tools", tool_node)
-graph_builder.add_node("vulga", vulgarisation)
+graph_builder.add_node("vulga", timed("node", "vulga")(vulgarisation))
+graph_builder.add_node("rapide", timed("node", "rapide")(chemin_rapide))
 
 graph_builder.set_entry_point("orchest")
-graph_builder.add_conditional_edges("orchest", orchestr_switch, {"astronome": "astro", "vulgaris": "vulga"})
+graph_builder.add_conditional_edges("orchest", orchestr_switch, {"astronome": "astro", "vulgaris": "vulga", "rapide": "rapide"})
+graph_builder.add_conditional_edges("rapide", lambda state: "vulga" if FAST_PATH_PROSE else "__end__", {"vulga": "vulga", "__end__": END})
 graph_builder.add_conditional_edges("astro", tools_condition, {"tools": "tools", "__end__": "vulga"})
 
 graph_builder.add_edge("tools", "astro")
 graph_builder.set_finish_point("vulga")
 
 
-graph = graph_builder.compile()
\ No newline at end of file
+def build_graph(checkpointer=None):
+    """Graphe compilé ; avec un checkpointer (session.open_checkpointer), l'état est gardé par session_id."""
+    return graph_builder.compile(checkpointer=checkpointer)
+
+
+graph = build_graph()
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+Configuration IERS d'Astropy : aucun téléchargement sur le chemin des requêtes.
+
+- auto_download désactivé : table IERS-A du paquet astropy-iers-data (version épinglée dans
+  requirements.txt), ou fichiers plus récents récupérés au build dans IERS_DIR (voir plus bas).
+- IERS_MODE=exact : UT1 - UTC et mouvement du pôle interpolés dans la table. Le premier appel
+  paie la lecture de la table ASCII (~1-3 s), au warm-up plutôt que sur une requête.
+- IERS_MODE=fast  : table IERS nulle (UT1 = UTC, pôle fixe), rien à lire. |UT1 - UTC| < 0,9 s,
+  soit moins de 14" sur le temps sidéral : négligeable devant la marge de 5° de la visibilité.
+
+Usage (build / image Docker) : python iers_config.py  -> télécharge finals2000A.all et Leap_Second.dat
+"""
+import os
+import shutil
+import numpy as np
+from astropy import units as u
+from astropy.table import QTable
+from astropy.utils import iers
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IERS_MODE = os.getenv("IERS_MODE", "exact")
+IERS_DIR = os.getenv("IERS_DIR", os.path.join(ROOT, "data", "iers"))
+FINALS_FILE = "finals2000A.all"
+LEAP_SECOND_FILE = "Leap_Second.dat"
+
+
+def configure(mode: str = None):
+    """Appliqué à l'import (un mode par processus : le benchmark lance un processus par mode)."""
+    global IERS_MODE
+    mode = mode or IERS_MODE
+    if mode not in ("exact", "fast"):
+        raise ValueError(f"IERS_MODE inconnu : {mode} (exact ou fast)")
+    IERS_MODE = mode
+
+    iers.conf.auto_download = False
+    iers.conf.auto_max_age = None  # Table figée : pas d'erreur quand elle vieillit
+    iers.conf.iers_degraded_accuracy = "warn" if IERS_MODE == "exact" else "ignore"
+
+    leap = os.path.join(IERS_DIR, LEAP_SECOND_FILE)
+    if os.path.exists(leap):
+        iers.conf.system_leap_second_file = leap
+
+    if IERS_MODE == "fast":
+        iers.earth_orientation_table.set(zero_table())
+    # En exact, la table par défaut reste ouverte au premier besoin (ou par load_tables au warm-up)
+
+
+def load_tables():
+    """
+    Lit la table (fichier de IERS_DIR s'il existe, sinon celle du paquet) : à appeler au warm-up,
+    pour que la première requête ne paie pas la lecture. Sans effet en mode fast.
+    """
+    if IERS_MODE == "fast":
+        return
+    finals = os.path.join(IERS_DIR, FINALS_FILE)
+    if os.path.exists(finals):
+        iers.earth_orientation_table.set(iers.IERS_A.open(finals))
+    else:
+        iers.earth_orientation_table.get()
+
+
+def zero_table() -> iers.IERS:
+    """Table IERS couvrant 1858-2132 avec UT1 - UTC, mouvement du pôle et corrections CIP nuls."""
+    zeros = np.zeros(2)
+    return iers.IERS(QTable({
+        "MJD": np.array([0.0, 100000.0]) * u.d,
+        "UT1_UTC": zeros * u.s,
+        "PM_x": zeros * u.arcsec,
+        "PM_y": zeros * u.arcsec,
+        "dX_2000A": zeros * u.marcsec,
+        "dY_2000A": zeros * u.marcsec,
+    }))
+
+
+def prefetch(directory: str = IERS_DIR):
+    """Télécharge les tables à jour (à lancer au build, jamais au runtime)."""
+    from astropy.utils.data import download_file
+    os.makedirs(directory, exist_ok=True)
+    sources = {
+        FINALS_FILE: [iers.conf.iers_auto_url, iers.conf.iers_auto_url_mirror],
+        LEAP_SECOND_FILE: [iers.conf.iers_leap_second_auto_url],
+    }
+    for name, urls in sources.items():
+        for url in urls:
+            try:
+                shutil.copy(download_file(url, cache=False, timeout=30), os.path.join(directory, name))
+                print(f"✅ {name} <- {url}")
+                break
+            except Exception as e:
+                print(f"⚠️ {url} : {e}")
+        else:
+            raise SystemExit(f"❌ Impossible de récupérer {name}")
+
+
+configure()
+
+
+if __name__ == "__main__":
+    prefetch()
@@ -0,0 +1,299 @@
+"""
+Ingestion du catalogue complet OpenNGC (pyongc) dans Celestial, en remplacement de Archive/peuple_base.py.
+
+  1. catalogue : tous les objets OpenNGC (+ étoiles brillantes d'un CSV HYG en option), insérés en
+     un seul executemany dans une transaction. Upsert sur name : rowid et url existants conservés.
+  2. images    : URL d'image Wikipédia, 50 titres par requête (titles=A|B|...), requêtes concurrentes
+     bornées par un sémaphore. Chaque lot est commité avec son point de reprise (ingest_checkpoint),
+     une relance reprend donc là où elle s'était arrêtée.
+
+Usage : python ingest.py [--db Celestial.db] [--stars hygdata.csv] [--no-images] [--force] [--refresh-images]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import random
+import re
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+import httpx
+from schema import create_schema, migrate
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CALDWELL_PATH = os.path.join(ROOT, "Archive", "caldwell.json")
+
+WIKI_API = "https://en.wikipedia.org/w/api.php"
+WIKI_HEADERS = {"User-Agent": "AstroSQLBot/1.0 (educational project; contact@univ.fr)"}
+WIKI_BATCH = 50            # Maximum de titres par requête pour l'API MediaWiki
+WIKI_CONCURRENCY = 4       # Requêtes simultanées (rester poli avec Wikipédia)
+WIKI_RETRIES = 3
+THUMBNAIL_WIDTH = 1000
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+STAR_MAX_MAG = 6.5         # Étoiles visibles à l'oeil nu
+SKIPPED_TYPES = {"Duplicated record", "Nonexistent object"}
+
+# Mapping officiel IAU (3 lettres -> Nom complet)
+IAU_CONSTELLATIONS = {
+    "AND": "Andromeda", "ANT": "Antlia", "APS": "Apus", "AQR": "Aquarius",
+    "AQL": "Aquila", "ARA": "Ara", "ARI": "Aries", "AUR": "Auriga",
+    "BOO": "Bootes", "CAE": "Caelum", "CAM": "Camelopardalis", "CNC": "Cancer",
+    "CVN": "Canes Venatici", "CMA": "Canis Major", "CMI": "Canis Minor", "CAP": "Capricornus",
+    "CAR": "Carina", "CAS": "Cassiopeia", "CEN": "Centaurus", "CEP": "Cepheus",
+    "CET": "Cetus", "CHA": "Chamaeleon", "CIR": "Circinus", "COL": "Columba",
+    "COM": "Coma Berenices", "CRA": "Corona Australis", "CRB": "Corona Borealis", "CRV": "Corvus",
+    "CRT": "Crater", "CRU": "Crux", "CYG": "Cygnus", "DEL": "Delphinus",
+    "DOR": "Dorado", "DRA": "Draco", "EQU": "Equuleus", "ERI": "Eridanus",
+    "FOR": "Fornax", "GEM": "Gemini", "GRU": "Grus", "HER": "Hercules",
+    "HOR": "Horologium", "HYA": "Hydra", "HYI": "Hydrus", "IND": "Indus",
+    "LAC": "Lacerta", "LEO": "Leo", "LMI": "Leo Minor", "LEP": "Lepus",
+    "LIB": "Libra", "LUP": "Lupus", "LYN": "Lynx", "LYR": "Lyra",
+    "MEN": "Mensa", "MIC": "Microscopium", "MON": "Monoceros", "MUS": "Musca",
+    "NOR": "Norma", "OCT": "Octans", "OPH": "Ophiuchus", "ORI": "Orion",
+    "PAV": "Pavo", "PEG": "Pegasus", "PER": "Perseus", "PHE": "Phoenix",
+    "PIC": "Pictor", "PSC": "Pisces", "PSA": "Piscis Austrinus", "PUP": "Puppis",
+    "PYX": "Pyxis", "RET": "Reticulum", "SGE": "Sagitta", "SGR": "Sagittarius",
+    "SCO": "Scorpius", "SCL": "Sculptor", "SCT": "Scutum", "SE1": "Serpens", "SE2": "Serpens",
+    "SER": "Serpens", "SEX": "Sextans", "TAU": "Taurus", "TEL": "Telescopium", "TRI": "Triangulum",
+    "TRA": "Triangulum Australe", "TUC": "Tucana", "UMA": "Ursa Major", "UMI": "Ursa Minor",
+    "VEL": "Vela", "VIR": "Virgo", "VOL": "Volans", "VUL": "Vulpecula"
+}
+
+# Objets Caldwell absents d'OpenNGC (repris de peuple_base.py)
+MANUAL_OBJECTS = [
+    ("Mel25", "Open_Cluster", "Taurus", 66.79, 15.87, 0.5,
+     "https://en.wikipedia.org/wiki/Hyades_(star_cluster)", "Caldwell"),
+    ("Coalsack_Nebula", "Dark_Nebula", "Crux", 192.45, -62.50, 99.9,
+     "https://en.wikipedia.org/wiki/Coalsack_Nebula", "Caldwell"),
+    ("Sh2-155", "Nebula", "Cepheus", 343.95, 62.62, 7.7,
+     "https://en.wikipedia.org/wiki/Cave_Nebula", "Caldwell"),
+]
+
+UPSERT = """
+INSERT INTO Celestial(name, type, constellation, ra, dec, magnitude, url, catalogue)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(name) DO UPDATE SET
+    type = excluded.type, constellation = excluded.constellation, ra = excluded.ra, dec = excluded.dec,
+    magnitude = excluded.magnitude, url = COALESCE(Celestial.url, excluded.url), catalogue = excluded.catalogue
+"""
+
+
+def get_constellation_name(abbr: Optional[str]) -> str:
+    return IAU_CONSTELLATIONS.get((abbr or "").upper(), "Inconnue")
+
+
+def get_best_mag(mag_tuple) -> Optional[float]:
+    """Magnitude V en priorité, sinon B (les autres bandes sont infrarouges)."""
+    for i in (1, 0):
+        if len(mag_tuple) > i and mag_tuple[i] is not None:
+            return float(mag_tuple[i])
+    return None
+
+
+def normalize_designation(name: str) -> str:
+    """'NGC0188' -> 'NGC188', 'M042' -> 'M42' : même forme que la base historique."""
+    return re.sub(r"^(NGC|IC|Mel|M)0+(?=\d)", r"\1", name)
+
+
+def load_caldwell(path: str = CALDWELL_PATH) -> set:
+    with open(path) as f:
+        return set(json.load(f).values())
+
+
+def openngc_rows(objects: Optional[Iterable] = None, caldwell: Optional[set] = None) -> List[tuple]:
+    """
+    Lignes Celestial à partir des objets pyongc. Un objet Messier est nommé 'M42'
+    (et non 'NGC1976') comme dans la base historique ; doublons et objets inexistants écartés.
+    """
+    if objects is None:
+        from pyongc.ongc import listObjects
+        objects = listObjects()
+    caldwell = load_caldwell() if caldwell is None else caldwell
+
+    rows = {}
+    for obj in objects:
+        if obj.type in SKIPPED_TYPES:
+            continue
+        messier = obj.identifiers[0] if obj.identifiers else None
+        name = normalize_designation(messier or obj.name)
+        if messier:
+            catalogue = "Messier"
+        elif name in caldwell:
+            catalogue = "Caldwell"
+        else:
+            catalogue = "OpenNGC"
+        ra_rad, dec_rad = obj.rad_coords
+        rows[name] = (name, obj.type.replace(" ", "_"), get_constellation_name(obj.constellation),
+                      math.degrees(ra_rad) % 360, math.degrees(dec_rad), get_best_mag(obj.magnitudes),
+                      None, catalogue)
+    return list(rows.values())
+
+
+def star_rows(path: str, max_mag: float = STAR_MAX_MAG) -> List[tuple]:
+    """Étoiles brillantes d'un CSV au format HYG (ra en heures, dec en degrés, mag, proper, hr, hip, con)."""
+    rows = []
+    with open(path, newline="") as f:
+        for rec in csv.DictReader(f):
+            try:
+                mag = float(rec["mag"])
+                ra, dec = float(rec["ra"]) * 15 % 360, float(rec["dec"])
+            except (KeyError, ValueError):
+                continue
+            if mag > max_mag or rec.get("proper") == "Sol":
+                continue
+            name = rec.get("proper") or (f"HR{rec['hr']}" if rec.get("hr") else f"HIP{rec.get('hip')}")
+            rows.append((name, "Star", get_constellation_name(rec.get("con")), ra, dec, mag, None, "HYG"))
+    return rows
+
+
+def open_database(path: str):
+    con = sqlite3.connect(path, isolation_level=None)
+    exists = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Celestial'").fetchone()
+    if exists:
+        migrate(con)
+    else:
+        create_schema(con)
+    con.execute("""CREATE TABLE IF NOT EXISTS ingest_checkpoint(
+        step TEXT NOT NULL, name TEXT NOT NULL, done_at REAL, PRIMARY KEY (step, name))""")
+    return con
+
+
+def is_done(con, step: str, name: str) -> bool:
+    return con.execute("SELECT 1 FROM ingest_checkpoint WHERE step = ? AND name = ?", (step, name)).fetchone() is not None
+
+
+def upsert_rows(con, rows: List[tuple], source: str):
+    """Un seul executemany dans une transaction, point de reprise compris."""
+    con.execute("BEGIN")
+    try:
+        con.executemany(UPSERT, rows)
+        con.execute("INSERT OR REPLACE INTO ingest_checkpoint VALUES ('catalogue', ?, ?)", (source, time.time()))
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    print(f"✅ {source} : {len(rows)} objets")
+
+
+def wiki_title(name: str) -> str:
+    if re.fullmatch(r"M\d+", name):
+        return f"Messier {name[1:]}"
+    return re.sub(r"(\D)(\d)", r"\1 \2", name, count=1).replace("_", " ")
+
+
+def _resolve_images(data: dict, titles: List[str]) -> Dict[str, Optional[str]]:
+    """Titre demandé -> URL de vignette, en suivant 'normalized' puis 'redirects'."""
+    query = data.get("query", {})
+    normalized = {n["from"]: n["to"] for n in query.get("normalized", [])}
+    redirects = {r["from"]: r["to"] for r in query.get("redirects", [])}
+    images = {}
+    for page in query.get("pages", []):
+        source = page.get("thumbnail", {}).get("source")
+        if "missing" not in page and source and source.lower().endswith(IMAGE_EXTENSIONS):
+            images[page["title"]] = source
+    out = {}
+    for title in titles:
+        final = normalized.get(title, title)
+        final = redirects.get(final, final)
+        out[title] = images.get(final)
+    return out
+
+
+async def fetch_image_batch(client: httpx.AsyncClient, titles: List[str]) -> Dict[str, Optional[str]]:
+    params = {
+        "action": "query", "format": "json", "prop": "pageimages", "pithumbsize": THUMBNAIL_WIDTH,
+        "pilimit": WIKI_BATCH, "titles": "|".join(titles), "redirects": 1, "formatversion": 2,
+    }
+    for attempt in range(WIKI_RETRIES):
+        try:
+            response = await client.get(WIKI_API, params=params)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise httpx.HTTPStatusError("réessai", request=response.request, response=response)
+            response.raise_for_status()
+            return _resolve_images(response.json(), titles)
+        except (httpx.HTTPError, ValueError) as e:
+            if attempt == WIKI_RETRIES - 1:
+                raise
+            delay = 2 ** attempt + random.random()
+            print(f"⚠️ Lot Wikipédia en échec ({e}), nouvel essai dans {delay:.1f} s")
+            await asyncio.sleep(delay)
+
+
+async def enrich_images(con, concurrency: int = WIKI_CONCURRENCY, client: Optional[httpx.AsyncClient] = None) -> int:
+    """
+    Complète url pour les objets qui n'en ont pas et qui ne sont pas déjà passés par cette étape.
+    Les lots sont lancés en parallèle (sémaphore) et commités un par un dès leur retour.
+    """
+    pending = [r[0] for r in con.execute(
+        "SELECT name FROM Celestial WHERE url IS NULL AND name NOT IN "
+        "(SELECT name FROM ingest_checkpoint WHERE step = 'images') ORDER BY magnitude IS NULL, magnitude")]
+    batches = [pending[i:i + WIKI_BATCH] for i in range(0, len(pending), WIKI_BATCH)]
+    print(f"Images : {len(pending)} objets, {len(batches)} lots")
+
+    own_client = client is None
+    client = client or httpx.AsyncClient(headers=WIKI_HEADERS, timeout=20)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(names):
+        async with slots:
+            titles = {name: wiki_title(name) for name in names}
+            try:
+                return names, titles, await fetch_image_batch(client, list(titles.values()))
+            except (httpx.HTTPError, ValueError) as e:
+                print(f"❌ Lot abandonné ({names[0]}...): {e}")
+                return names, titles, None
+
+    found = 0
+    try:
+        for done, task in enumerate(asyncio.as_completed([run(b) for b in batches]), 1):
+            names, titles, images = await task
+            if images is None:
+                continue # Pas de point de reprise : le lot sera retenté à la prochaine exécution
+            now = time.time()
+            con.execute("BEGIN")
+            con.executemany("UPDATE Celestial SET url = ? WHERE name = ? AND url IS NULL",
+                            [(images[titles[n]], n) for n in names if images[titles[n]]])
+            con.executemany("INSERT OR REPLACE INTO ingest_checkpoint VALUES ('images', ?, ?)",
+                            [(n, now) for n in names])
+            con.execute("COMMIT")
+            found += sum(1 for n in names if images[titles[n]])
+            print(f"  lot {done}/{len(batches)} : {found} images trouvées")
+    finally:
+        if own_client:
+            await client.aclose()
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestion OpenNGC -> Celestial.db")
+    parser.add_argument("--db", default="Celestial.db")
+    parser.add_argument("--stars", help="CSV d'étoiles au format HYG (optionnel)")
+    parser.add_argument("--star-mag", type=float, default=STAR_MAX_MAG)
+    parser.add_argument("--no-images", action="store_true", help="Ne pas interroger Wikipédia")
+    parser.add_argument("--concurrency", type=int, default=WIKI_CONCURRENCY)
+    parser.add_argument("--force", action="store_true", help="Recharger les catalogues déjà ingérés")
+    parser.add_argument("--refresh-images", action="store_true", help="Oublier le point de reprise des images")
+    args = parser.parse_args(argv)
+
+    con = open_database(args.db)
+    try:
+        if args.force or not is_done(con, "catalogue", "openngc"):
+            upsert_rows(con, openngc_rows() + MANUAL_OBJECTS, "openngc")
+        if args.stars and (args.force or not is_done(con, "catalogue", f"stars:{os.path.basename(args.stars)}")):
+            upsert_rows(con, star_rows(args.stars, args.star_mag), f"stars:{os.path.basename(args.stars)}")
+        if args.refresh_images:
+            con.execute("DELETE FROM ingest_checkpoint WHERE step = 'images'")
+        if not args.no_images:
+            asyncio.run(enrich_images(con, args.concurrency))
+        con.execute("ANALYZE")
+        print(f"Total : {con.execute('SELECT COUNT(*) FROM Celestial').fetchone()[0]} objets")
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Cache des réponses Gemini (astronome et vulgarisateur), stocké en SQLite.
+
+Clé exacte = nom du LLM + portée (cellule de lieu + tranche de temps) + conversation normalisée.
+Niveau sémantique optionnel (LLM_CACHE_SEMANTIC=1) : pour une question isolée, une
+question proche dans la même portée (cosinus sur n-grammes de caractères hachés)
+réutilise la réponse, à condition de citer exactement les mêmes nombres (M42 != M43).
+"""
+import asyncio
+import calendar
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import uuid
+from typing import Optional
+import numpy as np
+from dateutil import parser
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+from telemetry import record_tokens, span
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "LLMcache.db")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+LLM_CACHE_BUCKET = int(os.getenv("LLM_CACHE_BUCKET", 900))       # secondes
+LLM_CACHE_CELL = float(os.getenv("LLM_CACHE_CELL", 0.1))          # degrés
+LLM_CACHE_SEMANTIC = os.getenv("LLM_CACHE_SEMANTIC", "0") == "1"
+LLM_CACHE_SIMILARITY = float(os.getenv("LLM_CACHE_SIMILARITY", 0.92))
+
+VECTOR_DIM = 1024
+HIT_FLUSH_EVERY = 64 # last_hit (éviction LRU) écrit par lots, pas à chaque succès
+
+
+def normalize_prompt(text: str) -> str:
+    text = unicodedata.normalize("NFD", text.casefold())
+    text = "".join(c for c in text if unicodedata.category(c) != "Mn")
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def embed(text: str) -> np.ndarray:
+    """Vectoriseur par hachage de trigrammes de caractères, normalisé L2 (aucun modèle à charger)."""
+    text = f"  {normalize_prompt(text)}  "
+    vec = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for i in range(len(text) - 2):
+        h = int.from_bytes(hashlib.blake2b(text[i:i + 3].encode(), digest_size=4).digest(), "little")
+        vec[h % VECTOR_DIM] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def _numbers(text: str) -> str:
+    return ",".join(sorted(set(re.findall(r"\d+", text))))
+
+
+def cache_scope(location: Optional[dict], hour: Optional[str]) -> str:
+    """Portée d'une réponse : cellule lat/lon quantifiée + tranche de temps de l'heure demandée."""
+    cell = "-"
+    if location and location.get("latitude") is not None:
+        cell = f"{round(location['latitude'] / LLM_CACHE_CELL)}:{round(location['longitude'] / LLM_CACHE_CELL)}"
+    bucket = hour or "-"
+    if hour:
+        try:
+            bucket = str(calendar.timegm(parser.parse(hour).timetuple()) // LLM_CACHE_BUCKET)
+        except (ValueError, OverflowError):
+            pass
+    return f"{cell}|{bucket}"
+
+
+def _conversation_text(messages) -> str:
+    parts = []
+    for m in messages:
+        if isinstance(m, BaseMessage):
+            content = m.content if isinstance(m.content, str) else json.dumps(m.content, sort_keys=True)
+            calls = json.dumps(getattr(m, "tool_calls", None) or [], sort_keys=True, default=str)
+            parts.append(f"{m.type}:{normalize_prompt(content)}:{calls}")
+        else:
+            role, content = m if isinstance(m, tuple) else (m.get("role"), m.get("content"))
+            parts.append(f"{role}:{normalize_prompt(str(content))}")
+    return "\n".join(parts)
+
+
+class LLMCache:
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES, semantic: bool = LLM_CACHE_SEMANTIC,
+                 similarity: float = LLM_CACHE_SIMILARITY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity = similarity
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._pending_hits = {}
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("""CREATE TABLE IF NOT EXISTS responses(
+            key TEXT PRIMARY KEY, llm TEXT, scope TEXT, numbers TEXT, vector BLOB,
+            message TEXT, expires_at REAL, last_hit REAL)""")
+        self._con.execute("CREATE INDEX IF NOT EXISTS responses_scope ON responses(llm, scope)")
+        self._con.commit()
+
+    @staticmethod
+    def _key(llm_name: str, scope: str, conversation: str) -> str:
+        return hashlib.sha256(f"{llm_name}\x00{scope}\x00{conversation}".encode()).hexdigest()
+
+    def get(self, llm_name: str, scope: str, messages, question: Optional[str] = None):
+        """Réponse en cache (AIMessage) ou None. 'question' active le niveau sémantique (question isolée)."""
+        now = time.time()
+        key = self._key(llm_name, scope, _conversation_text(messages))
+        with self._lock:
+            row = self._con.execute(
+                "SELECT message, key FROM responses WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            if row is None and self.semantic and question:
+                row = self._semantic_lookup(llm_name, scope, question, now)
+                if row is not None:
+                    self.semantic_hits += 1
+            elif row is not None:
+                self.hits += 1
+            if row is None:
+                self.misses += 1
+                return None
+            self._pending_hits[row[1]] = now
+            if len(self._pending_hits) >= HIT_FLUSH_EVERY:
+                self._flush_hits()
+                self._con.commit()
+        message = messages_from_dict([json.loads(row[0])])[0]
+        # Nouvel id : un message rejoué ne doit pas remplacer (add_messages) celui d'une autre conversation
+        message.id = str(uuid.uuid4())
+        return message
+
+    def _flush_hits(self):
+        """Reporte en base les last_hit accumulés (appelé sous self._lock, avant un commit)."""
+        if self._pending_hits:
+            self._con.executemany("UPDATE responses SET last_hit = ? WHERE key = ?",
+                                  [(t, k) for k, t in self._pending_hits.items()])
+            self._pending_hits.clear()
+
+    def _semantic_lookup(self, llm_name, scope, question, now):
+        rows = self._con.execute(
+            "SELECT message, key, vector FROM responses WHERE llm = ? AND scope = ? AND numbers = ? "
+            "AND vector IS NOT NULL AND expires_at > ?", (llm_name, scope, _numbers(question), now)).fetchall()
+        if not rows:
+            return None
+        vectors = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+        scores = vectors @ embed(question)
+        best = int(np.argmax(scores))
+        return rows[best] if scores[best] >= self.similarity else None
+
+    def put(self, llm_name: str, scope: str, messages, response: BaseMessage, question: Optional[str] = None):
+        now = time.time()
+        key = self._key(llm_name, scope, _conversation_text(messages))
+        vector = embed(question).tobytes() if question else None
+        payload = json.dumps(messages_to_dict([response])[0], default=str)
+        with self._lock:
+            self._con.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (key, llm_name, scope, _numbers(question or ""), vector, payload, now + self.ttl, now))
+            self._flush_hits()
+            self._evict(now)
+            self._con.commit()
+
+    def _evict(self, now):
+        self._con.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        count = self._con.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._con.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                              "ORDER BY last_hit LIMIT ?)", (count - self.max_entries,))
+
+    async def ainvoke(self, llm, llm_name: str, prompt, key_messages=None, scope: str = "",
+                      question: Optional[str] = None):
+        """
+        llm.ainvoke(prompt) derrière le cache. 'key_messages' (par défaut le prompt) sert à
+        construire la clé : on y met la conversation sans le prompt système, dont le contenu
+        (ville, heure exacte) est déjà résumé par 'scope'.
+        """
+        key_messages = prompt if key_messages is None else key_messages
+        if isinstance(key_messages, str):
+            key_messages = [("user", key_messages)]
+
+        # SQLite (lecture, scan sémantique, écriture) dans le pool de threads : la boucle reste libre
+        cached = await asyncio.to_thread(self.get, llm_name, scope, key_messages, question)
+        if cached is not None:
+            return cached
+
+        with span("llm", llm_name):
+            response = await llm.ainvoke(prompt)
+        record_tokens(llm_name, response)
+        if response.content or getattr(response, "tool_calls", None):
+            await asyncio.to_thread(self.put, llm_name, scope, key_messages, response, question)
+        return response
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.semantic_hits + self.misses
+            size = self._con.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.semantic_hits) / total if total else 0.0,
+        }
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """Ouvert au premier besoin ou au warm-up, jamais à l'import."""
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMCache()
+    return _llm_cache
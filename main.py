@@ -1,34 +1,140 @@
+import os
 import sys
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+import json
+import logging
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+load_dotenv() # Avant les imports locaux : ils lisent leur configuration dans l'environnement
+from telemetry import TraceMiddleware, configure_logging, metrics_payload
+configure_logging()
+log = logging.getLogger("main")
 from langchain_core.messages import HumanMessage
-from geopy.geocoders import Nominatim
-from astropy_function import get_target_utc_date, format_utc_to_local_display
+from astropy_function import get_target_utc_date, format_utc_to_local_display, resolve_location, MIN_ALTITUDE, \
+    get_timezone_finder, compute_sky_state
+from catalogue import get_engine
+from fast_path import known_constellations
+from night import night_visibility
+from batch import BATCH_MAX_SITES, batch_visibility, visibility_matrix
+from sky_tiles import bucket_end, data_version as sky_data_version, sky_payload, tile_cache
+from dateutil import parser
+from geocoding import get_geocoder
+from gazetteer import get_gazetteer
+from sky_cache import sky_cache
+from llm_cache import get_llm_cache
+from static_assets import PrecompressedStaticFiles, index_path
+from session import keep_latest_checkpoint, open_checkpointer, previous_state, session_config
 
-geolocator = Nominatim(user_agent="mon_astro_app_v1")
+# Nombre max de graphes exécutés en parallèle (les suivants attendent leur tour)
+MAX_CONCURRENT_GRAPHS = int(os.getenv("MAX_CONCURRENT_GRAPHS", "8"))
+# Taille du pool de threads pour les appels bloquants (géocodage, Astropy, SQLite, outils)
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "16"))
 
-def get_city_from_latlon(lat, lon):
-    try:
-        location = geolocator.reverse((lat, lon), language='fr')
-        address = location.raw.get('address', {})
-        return address.get('city') or address.get('town') or address.get('village') or "Lieu Inconnu"
-    except:
-        return None
+graph_slots = asyncio.Semaphore(MAX_CONCURRENT_GRAPHS)
+
+# Compression gzip à la volée des réponses (JSON de /api/...) au-delà de cette taille, en octets.
+# Les fichiers statiques précompressés (static_assets.py) et le SSE ne sont pas recompressés.
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1000"))
+SKY_MAX_AGE = 86400 # /api/sky avec une heure explicite
+
+# Préchargement au démarrage : "background" (le serveur répond tout de suite, /healthz passe à prêt ensuite),
+# "blocking" (le démarrage attend la fin) ou "off"
+WARMUP = os.getenv("WARMUP", "background")
+
+# Budget de latence par chemin (ms), renvoyé avec chaque réponse
+LATENCY_BUDGETS_MS = {
+    "fast": float(os.getenv("LATENCY_BUDGET_FAST_MS", "250")),
+    "llm": float(os.getenv("LATENCY_BUDGET_LLM_MS", "8000")),
+}
 
 # --- IMPORT DU CERVEAU ---
 # On part du principe que ton fichier s'appelle graph.py
 try:
+    import graph as graph_module
     from graph import graph
 except ImportError:
-    print("⚠️ ERREUR CRITIQUE : Impossible d'importer 'graph' depuis 'graph.py'")
-    graph = None
+    log.critical("Impossible d'importer 'graph' depuis 'graph.py'")
+    graph = graph_module = None
+
+readiness = {"status": "starting", "steps": {}}
+
+def warmup_steps():
+    """
+    Tout ce qui est paresseux, à charger hors du chemin des requêtes : catalogue NumPy, polygones
+    de fuseaux horaires, tables IERS / éphémérides Astropy, caches SQLite, pool SQLite, clients Gemini.
+    """
+    import iers_config
+    from astropy.time import Time
+    from ephemeris import BODIES, solar_system_positions
+
+    steps = [
+        ("catalogue", get_engine),
+        ("sky_tiles", sky_data_version), # Étoiles, lignes et empreinte des données (ETag)
+        ("iers", iers_config.load_tables),
+        ("timezones", get_timezone_finder),
+        ("gazetteer", lambda: get_gazetteer() and get_gazetteer().lookup("Paris")), # mmap + index des noms
+        ("astropy", lambda: compute_sky_state(48.85, 2.35, datetime.now(timezone.utc))),
+        ("ephemeris", lambda: solar_system_positions(Time.now(), 48.85, 2.35, BODIES)),
+        ("database", known_constellations),
+        ("geocoder", get_geocoder),   # Cache SQLite des géocodages + villes locales
+        ("llm_cache", get_llm_cache),
+    ]
+    if graph:
+        steps += [("schema", graph_module.get_schema),
+                  ("llm", lambda: (graph_module.get_llm_with_tools(), graph_module.get_llm_lite()))]
+    return steps
 
-app = FastAPI()
+def warm_up():
+    """Exécute les étapes de warmup_steps() et tient readiness à jour (lu par /healthz)."""
+    readiness["status"] = "warming"
+    for name, step in warmup_steps():
+        started = time.perf_counter()
+        try:
+            step()
+            readiness["steps"][name] = {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1)}
+        except Exception as e:
+            log.warning("Warm-up %s : %s", name, e)
+            readiness["steps"][name] = {"ok": False, "error": str(e)}
+    failed = [name for name, step in readiness["steps"].items() if not step["ok"]]
+    readiness["status"] = "degraded" if failed or not graph else "ready"
 
-# Servir les fichiers statiques (JS, CSS, HTML)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global graph
+    # Executor borné par défaut : asyncio.to_thread et le ToolNode (outils synchrones) passent par lui
+    executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="astro-blocking")
+    asyncio.get_running_loop().set_default_executor(executor)
+    warmup_task = None
+    if WARMUP == "blocking":
+        await asyncio.to_thread(warm_up)
+    elif WARMUP == "background":
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    else:
+        readiness["status"] = "ready" if graph else "degraded"
+    # Mémoire des conversations : même graphe, compilé avec le checkpointer SQLite
+    async with open_checkpointer() as checkpointer:
+        if graph_module:
+            graph = graph_module.build_graph(checkpointer)
+        yield
+        if warmup_task:
+            await warmup_task
+    executor.shutdown(wait=False)
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(TraceMiddleware)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+
+# Servir les fichiers statiques (JS, CSS, HTML) : variantes précompressées de static/dist si construites
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 class UserRequest(BaseModel): # Verification Typage et Init qui sera envoyé juste en bas
     message: str
@@ -36,68 +142,272 @@ class UserRequest(BaseModel): # Verification Typage et Init qui sera envoyé jus
     hour: str 
     latitude: float
     longitude: float
+    session_id: Optional[str] = None # Absent : nouvelle conversation (l'identifiant est renvoyé)
+
+class Site(BaseModel):
+    latitude: float
+    longitude: float
+    utc: str # ISO 8601, UTC
+
+class BatchRequest(BaseModel):
+    sites: List[Site]
+    min_alt: float = MIN_ALTITUDE
+    top: Optional[int] = Field(10, ge=1) # None : tous les objets visibles
+    output: Literal["top", "ids"] = "top" # "ids" : rowids de tous les objets visibles par site
 
 
 @app.get("/")
 async def read_index():
-    return FileResponse('static/index.html')
+    # Toujours revalidée : c'est elle qui pointe vers les fichiers à empreinte (immutables)
+    return FileResponse(index_path(), headers={"Cache-Control": "no-cache"})
 
-@app.post("/api/chat")
-async def chat_endpoint(request: UserRequest):
-    print(f"📩 Message reçu : {request.message}")
+@app.get("/healthz")
+async def healthz():
+    """Prêt (200) quand le préchargement est terminé sans erreur, sinon 503 avec le détail des étapes."""
+    code = 200 if readiness["status"] == "ready" else 503
+    return JSONResponse(status_code=code, content=readiness)
 
-    if not graph:
-        return {"reply": "Erreur : Le graphe n'est pas chargé côté serveur.", "targets": []}
-    
-    print("HEURE DONNE DES LE DEBUT : ", request.hour)
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Histogrammes de durée par étape et compteurs de tokens, au format Prometheus."""
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
+
+@app.get("/api/stats")
+async def stats_endpoint():
+    """Taux de succès des caches (ciel, réponses LLM)."""
+    return {"sky_cache": sky_cache.stats(), "sky_tiles": tile_cache.stats(),
+            "llm_cache": await asyncio.to_thread(lambda: get_llm_cache().stats())}
+
+@app.get("/api/night")
+async def night_endpoint(latitude: float, longitude: float, date: str = "", names: str = "",
+                         min_alt: float = MIN_ALTITUDE, limit: int = 20):
+    """Fenêtres de visibilité de la nuit (lever / méridien / coucher / altitude max) pour un site."""
+    location = await asyncio.to_thread(resolve_location, None, (latitude, longitude))
+    try:
+        night = parser.parse(date).date() if date else None
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=422, detail=f"Date invalide : {date}")
+    wanted = [n for n in names.split(",") if n.strip()] or None
+    return await asyncio.to_thread(night_visibility, latitude, longitude, location["tz"], night,
+                                   min_alt, wanted, None if wanted else limit)
+
+@app.post("/api/visibility/batch")
+async def batch_visibility_endpoint(request: BatchRequest):
+    """
+    Visibilité de tout le catalogue pour de nombreux sites x instants en un appel
+    (tâches planifiées : sélections nocturnes par abonné). Voir batch.py.
+    """
+    if len(request.sites) > BATCH_MAX_SITES:
+        raise HTTPException(status_code=422, detail=f"Au plus {BATCH_MAX_SITES} sites par appel")
+    if not request.sites:
+        return {"results": []}
+    from astropy.time import Time
+    lat = [s.latitude for s in request.sites]
+    lon = [s.longitude for s in request.sites]
+    try:
+        utc = Time([s.utc for s in request.sites], scale="utc")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Date invalide : {e}")
+
+    if request.output == "ids":
+        engine = get_engine()
+        matrix = await asyncio.to_thread(visibility_matrix, lat, lon, utc, request.min_alt)
+        return {"results": [{"ids": engine.ids[row].tolist()} for row in matrix]}
+    results = await asyncio.to_thread(batch_visibility, lat, lon, utc, request.min_alt, request.top)
+    return {"results": results}
+
+@app.get("/api/sky")
+async def sky_endpoint(http_request: Request, latitude: float, longitude: float, hour: str = ""):
+    """
+    Ciel pré-projeté (objets, étoiles, lignes de constellations, planètes) pour la carte.
+    Même réponse pour toute la cellule et la tranche de temps (voir sky_tiles.py) : ETag + max-age.
+    """
+    try:
+        when = parser.parse(hour) if hour else datetime.now(timezone.utc)
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=422, detail=f"Date invalide : {hour}")
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+
+    key = tile_cache.key(latitude, longitude, when)
+    version = await asyncio.to_thread(sky_data_version) # Calculée une fois : catalogue lu au premier appel
+    etag = '"sky-%s-%d-%d-%d"' % (version, *key)
+    # Heure explicite : réponse figée pour cette clé. Sans heure ("maintenant") : valable jusqu'à la tranche suivante
+    max_age = SKY_MAX_AGE if hour else max(0, int(bucket_end(key) - time.time()))
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if http_request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    _, payload = await asyncio.to_thread(sky_payload, latitude, longitude, when)
+    return JSONResponse(content=payload, headers=headers)
+
+def same_place(previous, request: UserRequest):
+    return (previous.get("location") is not None and previous.get("latitude") is not None
+            and abs(previous["latitude"] - request.latitude) < 1e-6
+            and abs(previous["longitude"] - request.longitude) < 1e-6)
+
+async def build_initial_state(request: UserRequest, session_id: str):
+    log.info("Message reçu : %s", request.message)
+    log.debug("Heure donnée dès le début : %s", request.hour)
 
-    detected_city = get_city_from_latlon(request.latitude, request.longitude)
+    # Suite de conversation au même endroit : ville et lieu déjà résolus au tour précédent
+    previous = await previous_state(graph, session_id)
+    if same_place(previous, request):
+        detected_city, location = previous.get("detected_city"), previous["location"]
+    else:
+        # Contexte de localisation résolu une seule fois (ville -> coords -> fuseau) pour toute la requête
+        found = await get_geocoder().areverse_place(request.latitude, request.longitude)
+        detected_city, tz = (found["city"], found["tz"]) if found else (None, None)
+        coords = (request.latitude, request.longitude)
+        # Fuseau fourni par le gazetteer : pas de TimezoneFinder (polygones), résolution immédiate
+        location = resolve_location(detected_city, coords, tz) if tz else \
+            await asyncio.to_thread(resolve_location, detected_city, coords)
 
     try:
-        initial_local_hour = format_utc_to_local_display(detected_city, request.hour)
+        initial_local_hour = await asyncio.to_thread(format_utc_to_local_display, detected_city, request.hour, location)
     except Exception as e:
-        print(f"⚠️ Erreur conversion init: {e}")
+        log.warning("Erreur conversion init: %s", e)
         initial_local_hour = request.hour
 
-    # 1. Préparer l'état pour LangGraph
-    initial_state = {
+    return {
         "infos": request.message,
         "latitude": request.latitude,
         "longitude": request.longitude,
         "hour": initial_local_hour,
         "final_target": [],
         "messages": [("user", request.message)] ,
-        "detected_city": get_city_from_latlon(request.latitude, request.longitude)
+        "detected_city": detected_city,
+        "location": location,
+        # Champs propres à un tour : remis à zéro quand la session reprend un état sauvegardé
+        "intent": "",
+        "plan": None,
+        "path": "",
+        "vulgarisation_output": ""
+    }
+
+async def display_hour(detected_city, hour, location):
+    """Heure locale (LLM ou état) -> chaîne ISO avec décalage, comme attendu par VirtualSky."""
+    dt_utc = await asyncio.to_thread(get_target_utc_date, detected_city, hour, location)
+    return await asyncio.to_thread(format_utc_to_local_display, detected_city, dt_utc, location)
+
+async def end_turn(session_id):
+    """Un seul checkpoint gardé par session."""
+    if graph.checkpointer is not None:
+        await keep_latest_checkpoint(graph.checkpointer, session_id)
+
+async def build_response(result, started, session_id):
+    reply = result.get("vulgarisation_output", "Pas de réponse générée.")
+    targets = result.get("final_target", [])
+    latitude = result.get("latitude")
+    longitude = result.get("longitude")
+    hour = result.get("hour")
+    detected_city = result.get("detected_city")
+    location = result.get("location")
+
+    log.debug("Résultats : ville= %s heure= %s lat= %s lon= %s", detected_city, hour, latitude, longitude)
+
+    final_local_hour_str = await display_hour(detected_city, hour, location)
+
+    path = result.get("path") or "llm"
+    latency_ms = (time.perf_counter() - started) * 1000
+    if latency_ms > LATENCY_BUDGETS_MS[path]:
+        log.warning("Budget dépassé (%s) : %.0f ms > %.0f ms", path, latency_ms, LATENCY_BUDGETS_MS[path])
+
+    return {
+        "reply": reply,
+        "targets": targets,
+        "latitude": latitude,
+        "longitude": longitude,
+        "hour": final_local_hour_str,
+        "detected_city": detected_city,
+        "path": path,
+        "latency_ms": round(latency_ms, 1),
+        "latency_budget_ms": LATENCY_BUDGETS_MS[path],
+        "session_id": session_id
     }
 
+@app.post("/api/chat")
+async def chat_endpoint(request: UserRequest):
+    started = time.perf_counter()
+
+    if not graph:
+        return {"reply": "Erreur : Le graphe n'est pas chargé côté serveur.", "targets": []}
+
+    # 1. Préparer l'état pour LangGraph
+    session_id = request.session_id or uuid.uuid4().hex
+    initial_state = await build_initial_state(request, session_id)
 
-    # 2. Lancer l'IA
+    # 2. Lancer l'IA (état sauvegardé en fin de tour seulement)
     try:
-        result = graph.invoke(initial_state)
-        
+        async with graph_slots:
+            result = await graph.ainvoke(initial_state, config=session_config(session_id), durability="exit")
+        await end_turn(session_id)
+
         # 3. Récupérer les résultats
-        reply = result.get("vulgarisation_output", "Pas de réponse générée.")
-        targets = result.get("final_target", [])
-        latitude = result.get("latitude")
-        longitude = result.get("longitude")
-        hour = result.get("hour")
-        detected_city = result.get("detected_city")
-
-        print("🔥 RESULTATS BACKEND OBTENUS : Ville detectée= ", detected_city, "Heure : ", hour ," Latitude= ", latitude, " Longitude= ", longitude)
-
-        dt_utc = get_target_utc_date(detected_city, result.get("hour"))
-        final_local_hour_str = format_utc_to_local_display(detected_city, dt_utc)
-
-        return {
-            "reply": reply,
-            "targets": targets,
-            "latitude": latitude,
-            "longitude": longitude,
-            "hour": final_local_hour_str,
-            "detected_city": detected_city
-        }
-        
+        return await build_response(result, started, session_id)
 
     except Exception as e:
-        print(f"🔥 Erreur : {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        log.exception("Erreur : %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def chunk_text(content):
+    # Gemini peut renvoyer une liste de blocs au lieu d'une chaîne
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return content or ""
+
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: UserRequest):
+    """
+    Même graphe que /api/chat, en Server-Sent Events :
+      - "targets" dès que l'astronome (ou le chemin rapide) a ses cibles, pour tracer la carte tout de suite
+      - "token" pour chaque morceau de texte du vulgarisateur
+      - "done" avec la réponse complète (même format que /api/chat), ou "error"
+    """
+    started = time.perf_counter()
+
+    if not graph:
+        raise HTTPException(status_code=503, detail="Le graphe n'est pas chargé côté serveur.")
+
+    session_id = request.session_id or uuid.uuid4().hex
+    initial_state = await build_initial_state(request, session_id)
+
+    async def events():
+        result = dict(initial_state)
+        try:
+            async with graph_slots:
+                async for mode, chunk in graph.astream(initial_state, config=session_config(session_id),
+                                                      stream_mode=["updates", "messages"], durability="exit"):
+                    if mode == "messages":
+                        token, metadata = chunk
+                        text = chunk_text(token.content)
+                        if metadata.get("langgraph_node") == "vulga" and text:
+                            yield sse("token", {"text": text})
+                        continue
+
+                    for node, update in chunk.items():
+                        if not isinstance(update, dict):
+                            continue
+                        result.update(update)
+                        if update.get("final_target"):
+                            hour = await display_hour(result.get("detected_city"), result.get("hour"), result.get("location"))
+                            yield sse("targets", {
+                                "targets": update["final_target"],
+                                "latitude": result.get("latitude"),
+                                "longitude": result.get("longitude"),
+                                "hour": hour,
+                                "detected_city": result.get("detected_city"),
+                            })
+
+            await end_turn(session_id)
+            yield sse("done", await build_response(result, started, session_id))
+
+        except Exception as e:
+            log.exception("Erreur : %s", e)
+            yield sse("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
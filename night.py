@@ -0,0 +1,105 @@
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+import numpy as np
+import pytz
+from catalogue import get_engine
+from ephemeris import analytic_positions, local_sidereal_degrees
+
+NIGHT_STEP_MINUTES = 5
+SUN_LIMIT = -6 # Même seuil que get_ra_dec_constraint : au-dessus, il fait jour
+
+
+def _crossing_times(alt, t_hours, threshold, rising):
+    """
+    Premier franchissement de 'threshold' (montant ou descendant) pour chaque ligne de alt,
+    interpolé linéairement entre deux points de grille. NaN si aucun franchissement.
+    Un objet déjà levé à midi peut donc avoir un coucher antérieur à son lever.
+    """
+    above = alt > threshold
+    edge = (~above[:, :-1] & above[:, 1:]) if rising else (above[:, :-1] & ~above[:, 1:])
+    has = edge.any(axis=1)
+    i = np.argmax(edge, axis=1)
+    rows = np.arange(alt.shape[0])
+    a0, a1 = alt[rows, i], alt[rows, i + 1]
+    frac = np.where(a1 != a0, (threshold - a0) / (a1 - a0), 0.0)
+    t = t_hours[i] + frac * (t_hours[i + 1] - t_hours[i])
+    return np.where(has, t, np.nan)
+
+
+def night_visibility(lat: float, lon: float, tz_name: str, night: Optional[date] = None,
+                     min_alt: float = 5, names: Optional[List[str]] = None, limit: Optional[int] = None,
+                     step_minutes: int = NIGHT_STEP_MINUTES):
+    """
+    Fenêtres de visibilité de la nuit pour tout le catalogue, en une passe :
+    grille de temps (midi local -> midi local), Soleil calculé une fois sur la grille,
+    altitude de tous les objets en tableau 2-D (objets x instants).
+
+    Renvoie la nuit (début/fin de l'obscurité) et, par objet : lever, passage au
+    méridien, coucher, altitude max pendant la nuit et heures au-dessus de min_alt.
+    """
+    tz = pytz.timezone(tz_name)
+    night = night or datetime.now(tz).date()
+    start_local = tz.localize(datetime.combine(night, time(12, 0)))
+    start_utc = start_local.astimezone(pytz.utc)
+
+    n = 24 * 60 // step_minutes + 1
+    t_hours = np.arange(n) * step_minutes / 60.0
+    jd = start_utc.timestamp() / 86400.0 + 2440587.5 + t_hours / 24.0
+
+    sun_alt = analytic_positions(jd, lat, lon, ['sun'])["alt"][0]
+    dark = sun_alt < SUN_LIMIT
+
+    engine = get_engine()
+    lst_hours = local_sidereal_degrees(jd, lon) / 15.0
+    alt = engine.altitude_grid(lat, lst_hours)                     # (n_objets, n_instants)
+
+    if names:
+        wanted = {x.strip().casefold() for x in names}
+        rows = np.array([i for i, name in enumerate(engine.names) if name.casefold() in wanted], dtype=int)
+    else:
+        rows = np.arange(len(engine.names))
+    alt = alt[rows]
+
+    step_h = step_minutes / 60.0
+    up_dark = (alt > min_alt) & dark
+    hours_above = up_dark.sum(axis=1) * step_h
+    alt_dark = np.where(dark, alt, -90.0)
+    max_alt = alt_dark.max(axis=1)
+    best = t_hours[np.argmax(alt_dark, axis=1)]
+    transit = t_hours[np.argmax(alt, axis=1)]
+    rise = _crossing_times(alt, t_hours, min_alt, rising=True)
+    set_ = _crossing_times(alt, t_hours, min_alt, rising=False)
+
+    order = np.lexsort((-max_alt, -hours_above))
+    if not names:
+        order = order[hours_above[order] > 0]
+    if limit:
+        order = order[:limit]
+
+    def _fmt(h):
+        if np.isnan(h):
+            return None
+        return (start_local + timedelta(hours=float(h))).astimezone(tz).isoformat(timespec="minutes")
+
+    dark_idx = np.flatnonzero(dark)
+    objects = []
+    for k in order:
+        objects.append({
+            "name": engine.names[rows[k]],
+            "rise": _fmt(rise[k]),
+            "transit": _fmt(transit[k]),
+            "set": _fmt(set_[k]),
+            "best_time": _fmt(best[k]) if hours_above[k] > 0 else None,
+            "max_alt": round(float(max_alt[k]), 1) if dark.any() else None,
+            "hours_above": round(float(hours_above[k]), 2),
+        })
+
+    return {
+        "night": night.isoformat(),
+        "timezone": tz_name,
+        "min_alt": min_alt,
+        "dark_start": _fmt(t_hours[dark_idx[0]]) if len(dark_idx) else None,
+        "dark_end": _fmt(t_hours[dark_idx[-1]]) if len(dark_idx) else None,
+        "dark_hours": round(float(dark.sum() * step_h), 2),
+        "objects": objects,
+    }
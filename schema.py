@@ -0,0 +1,111 @@
+"""
+Schéma versionné de Celestial.db (PRAGMA user_version).
+
+Version 1 : colonnes typées, clé primaire sur name, index sur type / constellation /
+catalogue / magnitude, et deux colonnes calculées de découpage du ciel :
+  - dec_band : bande de déclinaison de DEC_BAND_DEG degrés (0 = pôle sud)
+  - ra_zone  : zone d'ascension droite de RA_ZONE_DEG degrés (0 = 0h)
+pour écarter les objets hors de portée de l'observateur avant tout calcul trigonométrique.
+
+Les rowid sont conservés par la migration (catalogue.py et le chemin rapide s'en servent).
+
+Usage : python schema.py [chemin/vers/Celestial.db]
+"""
+import sqlite3
+import sys
+
+SCHEMA_VERSION = 1
+DEC_BAND_DEG = 10
+RA_ZONE_DEG = 15
+DEC_BANDS = 180 // DEC_BAND_DEG
+RA_ZONES = 360 // RA_ZONE_DEG
+
+CELESTIAL_DDL = f"""
+CREATE TABLE {{table}}(
+    name TEXT NOT NULL PRIMARY KEY,
+    type TEXT NOT NULL,
+    constellation TEXT,
+    ra REAL NOT NULL CHECK (ra >= 0 AND ra < 360),
+    dec REAL NOT NULL CHECK (dec BETWEEN -90 AND 90),
+    magnitude REAL,
+    url TEXT,
+    catalogue TEXT NOT NULL,
+    dec_band INTEGER GENERATED ALWAYS AS (MIN(CAST((dec + 90) / {DEC_BAND_DEG} AS INTEGER), {DEC_BANDS - 1})) STORED,
+    ra_zone INTEGER GENERATED ALWAYS AS (CAST(ra / {RA_ZONE_DEG} AS INTEGER)) STORED
+)"""
+
+CELESTIAL_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS celestial_type ON Celestial(type)",
+    "CREATE INDEX IF NOT EXISTS celestial_constellation ON Celestial(constellation)",
+    "CREATE INDEX IF NOT EXISTS celestial_catalogue ON Celestial(catalogue)",
+    "CREATE INDEX IF NOT EXISTS celestial_magnitude ON Celestial(magnitude)",
+    "CREATE INDEX IF NOT EXISTS celestial_dec ON Celestial(dec)",
+    "CREATE INDEX IF NOT EXISTS celestial_zone ON Celestial(dec_band, ra_zone)",
+]
+
+
+def dec_band(dec: float) -> int:
+    """Même découpage que la colonne calculée dec_band."""
+    return min(int((dec + 90) // DEC_BAND_DEG), DEC_BANDS - 1)
+
+
+def ra_zone(ra: float) -> int:
+    """Même découpage que la colonne calculée ra_zone."""
+    return int((ra % 360) // RA_ZONE_DEG)
+
+
+def schema_version(con) -> int:
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+def create_schema(con):
+    """Crée directement une base vide à la dernière version (utilisé par les scripts d'ingestion)."""
+    con.execute(CELESTIAL_DDL.format(table="Celestial"))
+    for statement in CELESTIAL_INDEXES:
+        con.execute(statement)
+    con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _migrate_v1(con):
+    """Table sans types d'origine -> table typée. Les url 'None' (texte) deviennent NULL."""
+    con.execute(CELESTIAL_DDL.format(table="Celestial_v1"))
+    con.execute("""
+        INSERT INTO Celestial_v1(rowid, name, type, constellation, ra, dec, magnitude, url, catalogue)
+        SELECT rowid, name, type, constellation, CAST(ra AS REAL), CAST(dec AS REAL),
+               CAST(magnitude AS REAL), NULLIF(url, 'None'), catalogue
+        FROM Celestial
+    """)
+    con.execute("DROP TABLE Celestial")
+    con.execute("ALTER TABLE Celestial_v1 RENAME TO Celestial")
+    for statement in CELESTIAL_INDEXES:
+        con.execute(statement)
+
+
+MIGRATIONS = {1: _migrate_v1}
+
+
+def migrate(con) -> int:
+    """Applique les migrations manquantes, chacune dans sa transaction. Renvoie la version finale."""
+    version = schema_version(con)
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        con.execute("BEGIN")
+        try:
+            MIGRATIONS[target](con)
+            con.execute(f"PRAGMA user_version = {target}")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        print(f"✅ Celestial.db migrée en version {target}")
+    con.execute("ANALYZE")
+    return schema_version(con)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "Celestial.db"
+    con = sqlite3.connect(path, isolation_level=None)
+    try:
+        print(f"Version du schéma : {migrate(con)}")
+        con.execute("VACUUM") # Récupère les pages de l'ancienne table
+    finally:
+        con.close()
@@ -0,0 +1,88 @@
+"""
+Mémoire de conversation : un fil LangGraph par session_id, sauvegardé en SQLite (Sessions.db).
+
+- L'état complet est repris à chaque tour : ville détectée, lieu résolu (pas de nouveau géocodage
+  si les coordonnées n'ont pas changé), heure, dernier calcul de visibilité ('sky').
+- Historique borné : les étapes intermédiaires des tours précédents (appels d'outils et leurs
+  résultats) sont retirées, puis les plus anciens échanges tant que l'historique dépasse
+  HISTORY_MAX_TOKENS (estimation approximative, sans tokenizer).
+- Un seul checkpoint conservé par session (le dernier), la base ne grossit pas à chaque tour.
+"""
+import json
+import os
+from typing import List, Optional
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "Sessions.db")
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", 2000))
+
+
+def session_config(session_id: str) -> dict:
+    return {"configurable": {"thread_id": session_id}}
+
+
+def open_checkpointer(path: str = SESSION_DB_PATH):
+    """Context manager asynchrone : AsyncSqliteSaver ouvert pour la durée de vie du serveur."""
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    return AsyncSqliteSaver.from_conn_string(path)
+
+
+async def previous_state(graph, session_id: Optional[str]) -> dict:
+    """État sauvegardé de la session ({} si nouvelle session ou graphe sans checkpointer)."""
+    if not session_id or graph is None or graph.checkpointer is None:
+        return {}
+    snapshot = await graph.aget_state(session_config(session_id))
+    return dict(snapshot.values or {})
+
+
+async def keep_latest_checkpoint(checkpointer, session_id: str):
+    """Supprime les checkpoints antérieurs au dernier (tables de AsyncSqliteSaver)."""
+    if checkpointer is None or not hasattr(checkpointer, "conn"):
+        return
+    latest = await checkpointer.aget_tuple(session_config(session_id))
+    if latest is None:
+        return
+    checkpoint_id = latest.config["configurable"]["checkpoint_id"]
+    async with checkpointer.lock:
+        for table in ("checkpoints", "writes"):
+            await checkpointer.conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id != ?", (session_id, checkpoint_id))
+        await checkpointer.conn.commit()
+
+
+def prune_history(messages: list, max_tokens: int = HISTORY_MAX_TOKENS) -> List[RemoveMessage]:
+    """
+    Messages à retirer de l'état avant un nouveau tour (le tour courant commence au dernier
+    HumanMessage et n'est jamais touché). L'historique gardé commence toujours par une question.
+    """
+    starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if not starts:
+        return []
+    past, current = messages[:starts[-1]], messages[starts[-1]:]
+
+    def intermediate(m):
+        return isinstance(m, ToolMessage) or (isinstance(m, AIMessage) and m.tool_calls)
+
+    removed = [m for m in past if intermediate(m)]
+    kept = [m for m in past if not intermediate(m)]
+    budget = max_tokens - count_tokens_approximately(current)
+    while kept and count_tokens_approximately(kept) > budget:
+        removed.append(kept.pop(0))
+        while kept and not isinstance(kept[0], HumanMessage):
+            removed.append(kept.pop(0))
+    return [RemoveMessage(id=m.id) for m in removed if m.id]
+
+
+def last_visibility(messages: list) -> Optional[dict]:
+    """Dernier résultat de get_ra_dec_constraint du tour, avec la ville et l'heure demandées."""
+    calls = {c["id"]: c["args"] for m in messages if isinstance(m, AIMessage) for c in m.tool_calls}
+    for m in reversed(messages):
+        if isinstance(m, ToolMessage) and m.name == "get_ra_dec_constraint":
+            try:
+                result = json.loads(m.content)
+            except (TypeError, ValueError):
+                return None
+            args = calls.get(m.tool_call_id, {})
+            return {"city": args.get("city"), "hour": args.get("time_input"), **result}
+    return None
@@ -0,0 +1,91 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+SKY_CACHE_SIZE = int(os.getenv("SKY_CACHE_SIZE", 4096))
+SKY_CACHE_BUCKET = int(os.getenv("SKY_CACHE_BUCKET", 300))        # secondes (5 min)
+SKY_CACHE_CELL = float(os.getenv("SKY_CACHE_CELL", 0.1))          # degrés (~11 km)
+
+
+def twilight_state(sun_alt: float) -> str:
+    if sun_alt > -0.833:
+        return "day"
+    if sun_alt > -6:
+        return "civil"
+    if sun_alt > -12:
+        return "nautical"
+    if sun_alt > -18:
+        return "astronomical"
+    return "night"
+
+
+class SkyCache:
+    """
+    Cache LRU de l'état du ciel, indexé par (cellule lat/lon quantifiée, tranche de temps).
+    Tous les utilisateurs d'une même ville dans la même tranche de 5 minutes
+    partagent le même calcul (LST, soleil, liste des objets visibles).
+    """
+
+    def __init__(self, maxsize: int = SKY_CACHE_SIZE, bucket_seconds: int = SKY_CACHE_BUCKET,
+                 cell_deg: float = SKY_CACHE_CELL):
+        self.maxsize = maxsize
+        self.bucket_seconds = bucket_seconds
+        self.cell_deg = cell_deg
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, lat: float, lon: float, time_utc: datetime):
+        return (round(lat / self.cell_deg), round(lon / self.cell_deg),
+                int(time_utc.timestamp() // self.bucket_seconds))
+
+    def representative(self, key):
+        """Point de calcul d'une entrée : centre de la cellule, milieu de la tranche de temps."""
+        lat_i, lon_i, bucket = key
+        t = datetime.fromtimestamp((bucket + 0.5) * self.bucket_seconds, tz=timezone.utc)
+        return round(lat_i * self.cell_deg, 6), round(lon_i * self.cell_deg, 6), t
+
+    def get_or_compute(self, lat: float, lon: float, time_utc: datetime, compute):
+        """
+        Renvoie l'entrée en cache ou appelle compute(lat, lon, time_utc) sur le point
+        représentatif de la cellule (pour que l'entrée soit la même quel que soit le demandeur).
+        """
+        key = self.key(lat, lon, time_utc)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Calcul hors verrou : deux requêtes simultanées peuvent calculer la même entrée, c'est sans risque
+        entry = compute(*self.representative(key))
+
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return entry
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+sky_cache = SkyCache()
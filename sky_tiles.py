@@ -0,0 +1,228 @@
+"""
+Ciel pré-projeté pour la carte (GET /api/sky) : le navigateur n'a plus qu'à dessiner.
+
+Pour un site et un instant : objets du catalogue, étoiles brillantes, segments des lignes de
+constellations et corps du système solaire au-dessus de l'horizon, en altitude / azimut et en
+coordonnées (x, y) d'une projection stéréographique centrée sur le zénith (horizon sur le cercle
+de rayon 1, Nord en haut, Est à gauche comme sur un planisphère). Format en colonnes, compact.
+
+Calcul vectorisé (NumPy, temps sidéral et éphémérides analytiques de ephemeris.py) et mis en
+cache par (cellule de SKY_TILE_CELL degrés, tranche de SKY_TILE_BUCKET secondes) : tous les
+utilisateurs d'une même ville reçoivent la même réponse, cacheable aussi côté HTTP (ETag).
+
+Données (au build) : python sky_tiles.py [--lines lines_latin.json | constellationship.fab]
+  - data/bright_stars.json : étoiles de magnitude < 4.5 et sommets de lignes, extraites de
+    static/virtualsky.js [hip, mag, ra, dec]
+  - data/constellation_lines.json : lignes (format VirtualSky ou Stellarium, numéros Hipparcos)
+    résolues en segments [ra1, dec1, ra2, dec2]. Sans ce fichier, 'lines' est vide.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+import numpy as np
+from catalogue import get_engine
+from ephemeris import BODIES, analytic_positions, local_sidereal_degrees
+from sky_cache import SkyCache
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STARS_PATH = os.path.join(ROOT, "data", "bright_stars.json")
+LINES_PATH = os.path.join(ROOT, "data", "constellation_lines.json")
+VIRTUALSKY_PATH = os.path.join(ROOT, "static", "virtualsky.js")
+
+SKY_TILE_CELL = float(os.getenv("SKY_TILE_CELL", 0.25))          # degrés (~28 km)
+SKY_TILE_BUCKET = int(os.getenv("SKY_TILE_BUCKET", 120))          # secondes : le ciel tourne de 0,5° en 2 min
+SKY_TILE_CACHE_SIZE = int(os.getenv("SKY_TILE_CACHE_SIZE", 1024))
+
+tile_cache = SkyCache(maxsize=SKY_TILE_CACHE_SIZE, bucket_seconds=SKY_TILE_BUCKET, cell_deg=SKY_TILE_CELL)
+
+_data = None
+_data_lock = threading.Lock()
+_version = None
+
+
+def horizontal(lat: float, lst_deg: float, ra_deg, dec_deg):
+    """(altitude, azimut) en degrés, azimut compté du Nord vers l'Est (même formule que CatalogueEngine)."""
+    lat_r, ha = np.radians(lat), np.radians(lst_deg - np.asarray(ra_deg, dtype=np.float64))
+    dec = np.radians(np.asarray(dec_deg, dtype=np.float64))
+    sin_alt = np.sin(lat_r) * np.sin(dec) + np.cos(lat_r) * np.cos(dec) * np.cos(ha)
+    alt = np.degrees(np.arcsin(np.clip(sin_alt, -1.0, 1.0)))
+    az = np.degrees(np.arctan2(-np.cos(dec) * np.sin(ha),
+                               np.sin(dec) * np.cos(lat_r) - np.cos(dec) * np.sin(lat_r) * np.cos(ha))) % 360
+    return alt, az
+
+
+def stereographic(alt, az):
+    """Projection stéréographique zénithale : r = tan((90 - alt) / 2), horizon à r = 1."""
+    r = np.tan(np.radians(90 - np.asarray(alt)) / 2)
+    az = np.radians(az)
+    return -r * np.sin(az), r * np.cos(az)
+
+
+def _columns(alt, az, **extra):
+    x, y = stereographic(alt, az)
+    return {**extra, "alt": np.round(alt, 2).tolist(), "az": np.round(az, 2).tolist(),
+            "x": np.round(x, 4).tolist(), "y": np.round(y, 4).tolist()}
+
+
+def load_data():
+    """Étoiles et lignes chargées une fois par processus (tableaux NumPy)."""
+    global _data
+    if _data is None:
+        with _data_lock:
+            if _data is None:
+                stars = np.array(_read_json(STARS_PATH, []), dtype=np.float64).reshape(-1, 4)
+                lines = _read_json(LINES_PATH, [])
+                segments = [s for _, segs in lines for s in segs]
+                _data = {
+                    "hip": stars[:, 0].astype(np.int64), "mag": stars[:, 1],
+                    "ra": stars[:, 2], "dec": stars[:, 3],
+                    "line_names": [name for name, segs in lines],
+                    "line_index": np.repeat(np.arange(len(lines)), [len(segs) for _, segs in lines]),
+                    "segments": np.array(segments, dtype=np.float64).reshape(-1, 4),
+                }
+    return _data
+
+
+def data_version() -> str:
+    """
+    Empreinte courte des données servies (catalogue, étoiles, lignes), calculée une fois par
+    processus : mêlée à l'ETag, elle change quand la base ou les fichiers de data/ changent.
+    """
+    global _version
+    if _version is None:
+        engine, data = get_engine(), load_data()
+        digest = hashlib.blake2b(digest_size=6)
+        for array in (engine.ids, engine.ra_rad, engine.sin_dec, data["hip"], data["mag"],
+                      data["ra"], data["dec"], data["segments"]):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        digest.update("\n".join(engine.names + data["line_names"]).encode("utf-8"))
+        _version = digest.hexdigest()
+    return _version
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compute_payload(lat: float, lon: float, time_utc: datetime) -> dict:
+    """Ciel au-dessus de l'horizon pour un point et un instant (appelé sur un défaut de tile_cache)."""
+    jd = time_utc.timestamp() / 86400.0 + 2440587.5
+    lst = float(local_sidereal_degrees(jd, lon))
+    data = load_data()
+
+    engine = get_engine()
+    alt, az = engine.altaz(lat, lst / 15)
+    up = np.flatnonzero(alt > 0)
+    objects = _columns(alt[up], az[up], name=[engine.names[i] for i in up])
+
+    alt, az = horizontal(lat, lst, data["ra"], data["dec"])
+    up = alt > 0
+    stars = _columns(alt[up], az[up], hip=data["hip"][up].tolist(), mag=data["mag"][up].tolist())
+
+    seg = data["segments"]
+    alt1, az1 = horizontal(lat, lst, seg[:, 0], seg[:, 1])
+    alt2, az2 = horizontal(lat, lst, seg[:, 2], seg[:, 3])
+    up = (alt1 > 0) | (alt2 > 0) # Segment à moitié levé : gardé, le client coupe à l'horizon
+    x1, y1 = stereographic(alt1[up], az1[up])
+    x2, y2 = stereographic(alt2[up], az2[up])
+    lines = {
+        "names": data["line_names"],
+        "constellation": data["line_index"][up].tolist(),
+        "xy": np.round(np.stack([x1, y1, x2, y2], axis=1), 4).tolist(),
+    }
+
+    bodies = analytic_positions(jd, lat, lon, BODIES)
+    alt, az = bodies["alt"][:, 0], bodies["az"][:, 0]
+    up = np.flatnonzero(alt > 0)
+    planets = _columns(alt[up], az[up], name=[bodies["names"][i] for i in up])
+
+    return {
+        "latitude": lat,
+        "longitude": lon,
+        "time": time_utc.isoformat(),
+        "lst_deg": round(lst, 4),
+        "sun_alt": round(float(bodies["alt"][BODIES.index("sun"), 0]), 2),
+        "objects": objects,
+        "stars": stars,
+        "lines": lines,
+        "planets": planets,
+    }
+
+
+def sky_payload(lat: float, lon: float, time_utc: datetime):
+    """(clé de cache, payload) : même entrée pour tout le monde dans la cellule et la tranche de temps."""
+    key = tile_cache.key(lat, lon, time_utc)
+    return key, tile_cache.get_or_compute(lat, lon, time_utc, compute_payload)
+
+
+def bucket_end(key) -> float:
+    """Fin (timestamp UTC) de la tranche de temps d'une clé : durée de validité côté HTTP."""
+    return (key[2] + 1) * tile_cache.bucket_seconds
+
+
+# --- Construction des données (au build) ---
+
+def extract_stars(js_path: str = VIRTUALSKY_PATH):
+    """Liste d'étoiles intégrée à virtualsky.js ; les entrées incomplètes (sans ra/dec) sont ignorées."""
+    with open(js_path, encoding="utf-8") as f:
+        match = re.search(r"this\.stars = this\.convertStarsToRadians\((\[\[.*?\]\])\);", f.read(), re.S)
+    if not match:
+        raise ValueError(f"Liste d'étoiles introuvable dans {js_path}")
+    return [s for s in json.loads(match.group(1)) if len(s) == 4]
+
+
+def parse_lines(path: str):
+    """
+    Lignes de constellations -> [(abréviation, [hip1, hip2, hip3, hip4, ...])], par paires.
+    Formats : VirtualSky (JSON, [abr, x, y, hip...]) ou Stellarium constellationship.fab (abr n hip...).
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        data = json.loads(text)
+        entries = data["lines"] if isinstance(data, dict) else data
+        return [(e[0], [int(h) for h in e[3:]]) for e in entries]
+    lines = []
+    for row in text.splitlines():
+        parts = row.split()
+        if len(parts) > 2 and not row.startswith("#"):
+            lines.append((parts[0], [int(h) for h in parts[2:2 + 2 * int(parts[1])]]))
+    return lines
+
+
+def resolve_lines(lines, stars):
+    """Paires de numéros Hipparcos -> segments [ra1, dec1, ra2, dec2] ; étoiles inconnues ignorées."""
+    coords = {int(s[0]): (s[2], s[3]) for s in stars}
+    resolved = []
+    for name, hips in lines:
+        segments = [[*coords[a], *coords[b]] for a, b in zip(hips[::2], hips[1::2]) if a in coords and b in coords]
+        if segments:
+            resolved.append([name, segments])
+    return resolved
+
+
+def build(lines_path: str = None):
+    stars = extract_stars()
+    with open(STARS_PATH, "w", encoding="utf-8") as f:
+        json.dump(stars, f, separators=(",", ":"))
+    print(f"✅ {len(stars)} étoiles -> {os.path.relpath(STARS_PATH, ROOT)}")
+    if lines_path:
+        lines = resolve_lines(parse_lines(lines_path), stars)
+        with open(LINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(lines, f, separators=(",", ":"))
+        print(f"✅ {len(lines)} constellations, {sum(len(s) for _, s in lines)} segments -> "
+              f"{os.path.relpath(LINES_PATH, ROOT)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", help="lines_latin.json (VirtualSky) ou constellationship.fab (Stellarium)")
+    args = parser.parse_args()
+    build(args.lines)
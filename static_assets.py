@@ -0,0 +1,130 @@
+"""
+Fichiers statiques (VirtualSky, jQuery, langues) : précompression et cache HTTP.
+
+Au build : python static_assets.py  -> static/dist/
+  - chaque fichier copié sous son nom (chargements dynamiques de VirtualSky : lang/fr.json,
+    virtualsky-planets.js) et sous un nom à empreinte de contenu (virtualsky.3f2a9c1b0d.js)
+  - variantes .gz (gzip -9) et .br (brotli 11, si le paquet brotli est installé)
+  - dist/index.html : références /static/... remplacées par les noms à empreinte
+  - dist/manifest.json : nom d'origine -> nom à empreinte
+
+Au runtime, PrecompressedStaticFiles sert la variante .br / .gz acceptée par le client,
+avec Cache-Control immutable pour les noms à empreinte et no-cache (revalidation ETag) sinon.
+Sans build, tout fonctionne comme avant depuis static/.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import stat
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError: # Optionnel : sans lui, seules les variantes gzip sont produites
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+HASH_LENGTH = 10
+COMPRESSIBLE = (".js", ".json", ".css", ".html", ".svg", ".txt")
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE = "public, max-age=31536000, immutable"
+HASHED_NAME = re.compile(rf"\.[0-9a-f]{{{HASH_LENGTH}}}\.\w+$")
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def hashed_name(rel_path: str, content: bytes) -> str:
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def _write(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    if path.endswith(COMPRESSIBLE) and len(content) >= MIN_COMPRESS_SIZE:
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0)) # mtime=0 : sortie reproductible
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(content, quality=11))
+
+
+def build(static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR) -> dict:
+    """Régénère dist_dir ; renvoie le manifeste {nom d'origine: nom à empreinte}."""
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    manifest = {}
+    for folder, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(folder, d) != dist_dir]
+        for name in sorted(files):
+            rel = os.path.relpath(os.path.join(folder, name), static_dir).replace(os.sep, "/")
+            if rel == "index.html":
+                continue
+            with open(os.path.join(folder, name), "rb") as f:
+                content = f.read()
+            manifest[rel] = hashed_name(rel, content)
+            _write(os.path.join(dist_dir, rel), content)
+            _write(os.path.join(dist_dir, manifest[rel]), content)
+
+    with open(os.path.join(static_dir, "index.html"), encoding="utf-8") as f:
+        html = f.read()
+    for rel, hashed in manifest.items():
+        html = html.replace(f'"/static/{rel}"', f'"/static/dist/{hashed}"')
+    _write(os.path.join(dist_dir, "index.html"), html.encode("utf-8"))
+    _write(os.path.join(dist_dir, "manifest.json"), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def index_path() -> str:
+    """Page d'accueil construite (références à empreinte) si elle existe, sinon la source."""
+    built = os.path.join(DIST_DIR, "index.html")
+    return built if os.path.exists(built) else os.path.join(STATIC_DIR, "index.html")
+
+
+def _accepted_encodings(scope) -> set:
+    accepted = set()
+    for token in Headers(scope=scope).get("accept-encoding", "").split(","):
+        name, _, params = token.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles + variantes .br / .gz précompressées + Cache-Control selon le nom du fichier."""
+
+    async def get_response(self, path: str, scope):
+        response = None
+        if scope["method"] in ("GET", "HEAD") and path.endswith(COMPRESSIBLE):
+            accepted = _accepted_encodings(scope)
+            for encoding, suffix in PRECOMPRESSED:
+                if encoding not in accepted:
+                    continue
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                if stat_result and stat.S_ISREG(stat_result.st_mode):
+                    response = FileResponse(full_path, stat_result=stat_result,
+                                            media_type=mimetypes.guess_type(path)[0],
+                                            headers={"Content-Encoding": encoding})
+                    break
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        response.headers["Cache-Control"] = IMMUTABLE if HASHED_NAME.search(path) else "no-cache"
+        if path.endswith(COMPRESSIBLE):
+            response.headers["Vary"] = "Accept-Encoding"
+        if "content-encoding" in response.headers and self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+if __name__ == "__main__":
+    built = build()
+    print(f"✅ {len(built)} fichiers dans {os.path.relpath(DIST_DIR, ROOT)} (brotli : {'oui' if brotli else 'non'})")
@@ -0,0 +1,135 @@
+"""
+Observabilité : logs à niveaux, identifiant de trace par requête et histogrammes Prometheus.
+
+- span(stage, name) / timed(stage, name) : durée d'une étape (requête, nœud du graphe, outil,
+  appel LLM, géocodage, fuseau horaire, Astropy, SQL) -> histogramme cosmic_stage_seconds.
+- record_tokens : tokens d'entrée / sortie de Gemini (usage_metadata) -> cosmic_llm_tokens_total.
+- TraceMiddleware : un trace_id par requête HTTP (repris de l'en-tête TRACE_HEADER s'il est
+  fourni), présent dans chaque ligne de log et renvoyé dans l'en-tête de réponse.
+- LOG_LEVEL=WARNING coupe les logs du chemin des requêtes (tous en DEBUG / INFO).
+"""
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+TRACE_HEADER = os.getenv("TRACE_HEADER", "X-Trace-Id") # Vide : pas d'en-tête de trace
+
+log = logging.getLogger(__name__)
+trace_id_var = contextvars.ContextVar("trace_id", default="-")
+
+STAGE_SECONDS = Histogram(
+    "cosmic_stage_seconds", "Durée des étapes d'une requête", ["stage", "name"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+STAGE_ERRORS = Counter("cosmic_stage_errors_total", "Étapes terminées par une exception", ["stage", "name"])
+LLM_TOKENS = Counter("cosmic_llm_tokens_total", "Tokens consommés par les appels Gemini", ["llm", "kind"])
+
+
+class _TraceFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def configure_logging(level: str = LOG_LEVEL):
+    """Format commun avec le trace_id ; appelé une fois au démarrage du serveur."""
+    handler = logging.StreamHandler()
+    handler.addFilter(_TraceFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    for noisy in ("aiosqlite", "httpx", "httpcore", "urllib3"): # Bibliothèques très bavardes en DEBUG
+        logging.getLogger(noisy).setLevel(max(logging.getLevelName(level), logging.WARNING))
+
+
+@contextmanager
+def span(stage: str, name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage, name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage, name).observe(elapsed)
+        log.debug("%s %s : %.1f ms", stage, name, elapsed * 1000)
+
+
+def timed(stage: str, name: str = None):
+    """Décorateur : span autour d'une fonction synchrone ou asynchrone (signature conservée)."""
+    def decorator(func):
+        label = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage, label):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_tokens(llm_name: str, message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    for kind in ("input_tokens", "output_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.labels(llm_name, kind.split("_")[0]).inc(usage[kind])
+
+
+def tool_span(request, execute):
+    """wrap_tool_call du ToolNode : un span par appel d'outil."""
+    with span("tool", request.tool_call["name"]):
+        return execute(request)
+
+
+async def atool_span(request, execute):
+    with span("tool", request.tool_call["name"]):
+        return await execute(request)
+
+
+def metrics_payload():
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class TraceMiddleware:
+    """Middleware ASGI : trace_id de la requête et durée totale (jusqu'au dernier octet pour le SSE)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.header = TRACE_HEADER.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        trace_id = (headers.get(self.header) or b"").decode("latin-1")[:64] if TRACE_HEADER else ""
+        token = trace_id_var.set(trace_id or uuid.uuid4().hex[:16])
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start" and TRACE_HEADER:
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (self.header, trace_id_var.get().encode())]}
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            route = getattr(scope.get("route"), "path", "other") # Chemin déclaré, pas l'URL (cardinalité bornée)
+            STAGE_SECONDS.labels("request", route).observe(time.perf_counter() - started)
+            trace_id_var.reset(token)